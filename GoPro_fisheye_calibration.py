@@ -1,18 +1,254 @@
-#This script performs fisheye lens calibration for a GoPro camera using a checkerboard pattern. 
+#This script performs fisheye lens calibration for a GoPro camera using a checkerboard pattern.
 #It detects and refines checkerboard corners from calibration images, computes the camera matrix and distortion coefficients, and saves the calibration data in an .npz file.
 #The calibration process uses OpenCV's fisheye model and requires a minimum of five valid images with detected corners.
 #The resulting calibration parameters are essential for undistorting images or correcting fisheye distortions in further processing.
+#Corner detection runs in a process pool (optionally on downscaled images, refined at full resolution) and the corners of
+#every image are cached by content hash, so recalibrating with other flags skips detection entirely.
+#With --video the calibration frames are picked from a calibration video: frames are scored on thumbnails (board found,
+#sharpness) and a sharp subset covering different board poses is saved and calibrated on.
+
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import cv2
 import numpy as np
 import glob
-import os
+
+from frame_source import open_source, read_frame_at, BACKENDS
+
+# Termination criteria for corner sub-pix refinement
+SUBPIX_CRITERIA = (
+    cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER,
+    30,
+    1e-6
+)
+
+CHESSBOARD_FLAGS = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_FAST_CHECK + cv2.CALIB_CB_NORMALIZE_IMAGE
+
+def detect_corners(fname, grid_size, detect_scale=None):
+    """
+    Find and refine the checkerboard corners of one image.
+    :param detect_scale: if < 1, search the board on an image downscaled by this factor first and only refine the
+                         corners at full resolution (falls back to a full-resolution search if the board is not found).
+    :return: (corners or None, image size (width, height) or None if unreadable, seconds spent).
+    """
+    start = time.perf_counter()
+    gray = cv2.imread(fname, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None, None, time.perf_counter() - start
+    size = gray.shape[::-1]  # (width, height)
+
+    corners = None
+    win = 3
+    if detect_scale and detect_scale < 1:
+        small = cv2.resize(gray, None, fx=detect_scale, fy=detect_scale, interpolation=cv2.INTER_AREA)
+        ret, found = cv2.findChessboardCorners(small, grid_size, CHESSBOARD_FLAGS)
+        if ret:
+            # Back to full-resolution pixel coordinates; the refinement window covers the upscaling error
+            scale = np.array([size[0] / small.shape[1], size[1] / small.shape[0]], dtype=np.float32)
+            corners = ((found + 0.5) * scale - 0.5).astype(np.float32)
+            win = max(3, int(np.ceil(scale.max())) + 1)
+    if corners is None:
+        ret, found = cv2.findChessboardCorners(gray, grid_size, CHESSBOARD_FLAGS)
+        if ret:
+            corners = found
+            win = 3
+
+    if corners is not None:
+        # Refine corner positions
+        cv2.cornerSubPix(gray, corners, (win, win), (-1, -1), SUBPIX_CRITERIA)
+    return corners, size, time.perf_counter() - start
+
+def file_digest(fname):
+    """Content hash of an image file (the cache key does not depend on its name or modification time)."""
+    h = hashlib.sha1()
+    with open(fname, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _cache_key(digest, grid_size, detect_scale):
+    return f"{digest}_{grid_size[0]}x{grid_size[1]}_{detect_scale or 1}".replace('.', 'p')
+
+def load_corner_cache(cache_file):
+    """{key: (corners or None, (width, height))} from a corner cache file (empty if missing or unreadable)."""
+    cache = {}
+    if not cache_file or not os.path.exists(cache_file):
+        return cache
+    try:
+        with np.load(cache_file) as X:
+            for name in X.files:
+                if name.endswith('__size'):
+                    key = name[:-len('__size')]
+                    corners = X[key + '__corners']
+                    cache[key] = (corners if corners.size else None, tuple(int(v) for v in X[name]))
+    except Exception as e:
+        print(f"Ignoring unreadable corner cache '{cache_file}': {e}")
+    return cache
+
+def save_corner_cache(cache_file, cache):
+    arrays = {}
+    for key, (corners, size) in cache.items():
+        arrays[key + '__corners'] = corners if corners is not None else np.empty((0, 1, 2), dtype=np.float32)
+        arrays[key + '__size'] = np.array(size)
+    # Write to a temporary file first so an interrupted run never leaves a half-written cache
+    directory = os.path.dirname(os.path.abspath(cache_file))
+    fd, tmp_path = tempfile.mkstemp(suffix='.npz', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, cache_file)
+    except OSError as e:
+        print(f"Could not write corner cache '{cache_file}': {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def find_all_corners(images, grid_size, detect_scale=None, workers=None, cache_file=None):
+    """
+    Detect the checkerboard in all images, in parallel and using the corner cache.
+    :return: list of (fname, corners or None, size or None) in the order of images.
+    """
+    cache = load_corner_cache(cache_file)
+    keys = {fname: _cache_key(file_digest(fname), grid_size, detect_scale) for fname in images}
+    results = {fname: cache[keys[fname]] for fname in images if keys[fname] in cache}
+    todo = [fname for fname in images if fname not in results]
+    print(f"{len(images)} images: {len(results)} cached, {len(todo)} to detect")
+
+    start = time.perf_counter()
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(detect_corners, fname, grid_size, detect_scale): fname for fname in todo}
+            for done, future in enumerate(as_completed(futures), 1):
+                fname = futures[future]
+                corners, size, seconds = future.result()
+                status = 'unreadable' if size is None else 'found' if corners is not None else 'no chessboard'
+                print(f"[{done}/{len(todo)}] {os.path.basename(fname)}: {status} ({seconds:.2f} s)")
+                results[fname] = (corners, size)
+                if size is not None:
+                    cache[keys[fname]] = (corners, size)
+        print(f"Corner detection took {time.perf_counter() - start:.1f} s")
+        if cache_file:
+            save_corner_cache(cache_file, cache)
+
+    return [(fname,) + results[fname] for fname in images]
+
+def board_pose(corners, grid_size, image_size):
+    """
+    Cheap descriptor of where and how the board appears in an image: center (x, y) and size as fractions of the
+    image, and the perspective tilt in both directions (log ratio of the lengths of opposite board edges).
+    """
+    w, h = image_size
+    grid = corners.reshape(grid_size[1], grid_size[0], 2)
+    center = grid.reshape(-1, 2).mean(axis=0) / (w, h)
+    area = cv2.contourArea(cv2.convexHull(grid.reshape(-1, 1, 2).astype(np.float32)))
+    size = np.sqrt(area / (w * h))
+    edge = lambda a, b: np.linalg.norm(a - b) + 1e-6
+    tilt_x = np.log(edge(grid[0, 0], grid[-1, 0]) / edge(grid[0, -1], grid[-1, -1]))   # left vs right edge
+    tilt_y = np.log(edge(grid[0, 0], grid[0, -1]) / edge(grid[-1, 0], grid[-1, -1]))   # top vs bottom edge
+    return np.array([center[0], center[1], size, tilt_x, tilt_y])
+
+def score_video_frames(video, grid_size, sample_every=None, thumb_width=640, backend='auto'):
+    """
+    Stream a calibration video at thumbnail size and score every sample_every-th frame.
+    :return: (candidates, fps, native size) where candidates is a list of (frame index, sharpness, pose) of the
+             frames in which the board was found on the thumbnail.
+    """
+    with open_source(video, backend) as probe:
+        native_size, fps = probe.native_size, probe.fps
+    scale = min(1.0, thumb_width / native_size[0])
+    if sample_every is None:
+        sample_every = max(1, int(round(fps / 5)))  # About 5 frames per second are plenty of poses
+
+    candidates = []
+    sampled = 0
+    start = time.perf_counter()
+    # The backend decodes straight to the thumbnail size, no full-resolution frame is ever converted
+    with open_source(video, backend, scale=scale) as source:
+        while True:
+            frame = source.read()
+            if frame is None:
+                break
+            index = source.position - 1
+            if index % sample_every:
+                continue
+            sampled += 1
+            thumb = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            ret, corners = cv2.findChessboardCorners(thumb, grid_size, CHESSBOARD_FLAGS)
+            if not ret:
+                continue
+            # Blur score (variance of the Laplacian) on the board region only, the background does not matter
+            x, y, bw, bh = cv2.boundingRect(corners.astype(np.float32))
+            sharpness = cv2.Laplacian(thumb[y:y + bh, x:x + bw], cv2.CV_64F).var()
+            candidates.append((index, sharpness, board_pose(corners, grid_size, source.size)))
+            if sampled % 100 == 0:
+                print(f"Scored {sampled} frames ({index + 1} decoded), board found in {len(candidates)}")
+    print(f"Scored {sampled} frames in {time.perf_counter() - start:.1f} s, board found in {len(candidates)}")
+    return candidates, fps, native_size
+
+def select_diverse_frames(candidates, max_frames=40, min_sharpness_ratio=0.5):
+    """
+    Keep sharp frames with diverse board poses: frames much blurrier than the median candidate are dropped, then the
+    frames are picked greedily, each one the farthest (in pose) from the frames picked so far, starting from the
+    sharpest one. Returns the selected frame indices in video order.
+    """
+    if not candidates:
+        return []
+    sharpness = np.array([c[1] for c in candidates])
+    keep = sharpness >= min_sharpness_ratio * np.median(sharpness)
+    indices = np.array([c[0] for c in candidates])[keep]
+    sharpness = sharpness[keep]
+    poses = np.array([c[2] for c in candidates])[keep]
+    # Equalize the descriptor dimensions so position, size and tilt weigh about the same
+    poses = (poses - poses.mean(axis=0)) / (poses.std(axis=0) + 1e-9)
+
+    selected = [int(np.argmax(sharpness))]
+    distance = np.linalg.norm(poses - poses[selected[0]], axis=1)
+    while len(selected) < min(max_frames, len(indices)):
+        # Prefer the sharper frame among nearly equally distant ones
+        nxt = int(np.argmax(distance * (1 + 0.1 * sharpness / sharpness.max())))
+        if distance[nxt] <= 0:
+            break  # Only duplicates of selected poses are left
+        selected.append(nxt)
+        distance = np.minimum(distance, np.linalg.norm(poses - poses[nxt], axis=1))
+    return sorted(int(indices[i]) for i in selected)
+
+def extract_calibration_frames(video, output_folder, grid_size=(6, 8), max_frames=40, sample_every=None,
+                               thumb_width=640, backend='auto'):
+    """
+    Pick a sharp, diverse subset of the frames of a calibration video and save them as PNG to output_folder.
+    :return: scale of the thumbnails the board was found on (usable as detect_scale), or None if no frame was kept.
+    """
+    candidates, fps, native_size = score_video_frames(video, grid_size, sample_every, thumb_width, backend)
+    selected = select_diverse_frames(candidates, max_frames)
+    if not selected:
+        print(f"Chessboard not found in any frame of {video}")
+        return None
+
+    os.makedirs(output_folder, exist_ok=True)
+    # Frames of a previous extraction would otherwise be calibrated on as well
+    for old in glob.glob(os.path.join(output_folder, 'frame_*.png')):
+        os.remove(old)
+    for index in selected:
+        frame = read_frame_at(video, index, backend)
+        if frame is None:
+            print(f"Could not read frame {index} of {video}, skipping.")
+            continue
+        cv2.imwrite(os.path.join(output_folder, f"frame_{index:06d}.png"), frame)
+    print(f"Saved {len(selected)} of {len(candidates)} candidate frames ({fps:.0f} FPS video) to {output_folder}")
+    return min(1.0, thumb_width / native_size[0])
 
 def calibrate_fisheye(
     images_folder,
     grid_size=(6, 8),           # Checkerboard corners (width=9, height=6 commonly)
     square_size=0.019,          # Real-world size of each square in meters (example 2.5 cm)
-    output_file='gopro_calibration.npz'
+    output_file='gopro_calibration.npz',
+    workers=None,
+    detect_scale=None,
+    cache_file=None
 ):
     """
     Perform fisheye calibration using images of a checkerboard pattern.
@@ -20,15 +256,11 @@ def calibrate_fisheye(
     :param grid_size: Number of internal corners (columns, rows) in the checkerboard pattern.
     :param square_size: Physical size of each checkerboard square (in meters).
     :param output_file: Output file name to store the calibration data (K, D, DIM).
+    :param workers: Number of detection processes (None = one per CPU).
+    :param detect_scale: Search the board at this fraction of the resolution, refine at full resolution (None = full).
+    :param cache_file: Corner cache (None = corner_cache.npz in images_folder, '' to disable).
     """
 
-    # Termination criteria for corner sub-pix refinement
-    subpix_criteria = (
-        cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER,
-        30,
-        1e-6
-    )
-
     # Flags for fisheye calibration
     calibration_flags = (
         cv2.fisheye.CALIB_RECOMPUTE_EXTRINSIC +
@@ -52,46 +284,34 @@ def calibrate_fisheye(
     images = glob.glob(os.path.join(images_folder, '*.jpg'))
     images += glob.glob(os.path.join(images_folder, '*.png'))
     images += glob.glob(os.path.join(images_folder, '*.jpeg'))
+    images.sort()
 
     if not images:
         print(f"No images found in folder: {images_folder}")
         return
 
+    if cache_file is None:
+        cache_file = os.path.join(images_folder, 'corner_cache.npz')
+
     # For dimension checking
     used_img_shape = None
 
-    for fname in images:
-        img = cv2.imread(fname)
-        if img is None:
+    for fname, corners, size in find_all_corners(images, grid_size, detect_scale, workers, cache_file):
+        if size is None:
             print(f"Could not read image {fname}, skipping.")
             continue
-
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        # Find checkerboard corners
-        ret, corners = cv2.findChessboardCorners(
-            gray,
-            grid_size,
-            cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_FAST_CHECK + cv2.CALIB_CB_NORMALIZE_IMAGE
-        )
-        if ret:
-            # Refine corner positions
-            cv2.cornerSubPix(gray, corners, (3,3), (-1,-1), subpix_criteria)
-
-            # Store results
-            objpoints.append(objp)
-            imgpoints.append(corners)
-
-            if used_img_shape is None:
-                used_img_shape = gray.shape[::-1]  # (width, height)
-            
-            # Optionally visualize
-            cv2.drawChessboardCorners(img, grid_size, corners, ret)
-            # cv2.imshow('Corners', img)
-            # cv2.waitKey(100)
-        else:
+        if corners is None:
             print(f"Chessboard not found in {fname}")
+            continue
+        if used_img_shape is None:
+            used_img_shape = size  # (width, height)
+        elif size != used_img_shape:
+            print(f"Image {fname} is {size[0]}x{size[1]}, expected {used_img_shape[0]}x{used_img_shape[1]}, skipping.")
+            continue
 
-    # cv2.destroyAllWindows()
+        # Store results
+        objpoints.append(objp)
+        imgpoints.append(corners)
 
     # Now we have collected (objectPoints, imagePoints). Let's calibrate in fisheye mode.
     N_OK = len(objpoints)
@@ -109,6 +329,7 @@ def calibrate_fisheye(
     tvecs = []
 
     # Perform calibration
+    start = time.perf_counter()
     rms, _, _, _, _ = cv2.fisheye.calibrate(
         objectPoints=objpoints,
         imagePoints=imgpoints,
@@ -118,16 +339,16 @@ def calibrate_fisheye(
         rvecs=rvecs,
         tvecs=tvecs,
         flags=calibration_flags,
-        criteria=subpix_criteria
+        criteria=SUBPIX_CRITERIA
     )
 
     # K is our camera matrix; D is our fisheye distortion coefficients
-    print("Fisheye calibration done.")
+    print(f"Fisheye calibration done in {time.perf_counter() - start:.1f} s.")
     print(f"Number of images used for calibration: {N_OK}")
     print(f"RMS error: {rms}")
     print("Camera matrix (K):\n", K)
     print("Distortion (D):\n", D)
-    
+
     # "Exact" focal length from K
     # Typically, fx = K[0,0], fy = K[1,1] in a pinhole model.
     # For the fisheye model, K still contains fx, fy in these elements.
@@ -147,16 +368,48 @@ def calibrate_fisheye(
     )
     print(f"Calibration data saved to {output_file}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fisheye calibration from checkerboard images.")
+    parser.add_argument("--images", default="Images", help="Folder with the calibration images")
+    parser.add_argument("--video", help="Calibration video to pick the frames from (saved to --images)")
+    parser.add_argument("--max-frames", type=int, default=40, help="Frames kept from the video")
+    parser.add_argument("--sample-every", type=int, help="Score every n-th frame of the video (default: ~5 per second)")
+    parser.add_argument("--thumb-width", type=int, default=640, help="Width of the thumbnails frames are scored on")
+    parser.add_argument("--backend", default="auto", choices=['auto'] + sorted(BACKENDS), help="Video decoder")
+    parser.add_argument("--grid", type=int, nargs=2, default=(6, 8), metavar=('COLS', 'ROWS'),
+                        help="Number of internal checkerboard corners")
+    parser.add_argument("--square-size", type=float, default=0.019, help="Size of a checkerboard square (m)")
+    parser.add_argument("--output", default="gopro_calibration_fisheye.npz", help="Calibration output file")
+    parser.add_argument("--workers", type=int, help="Detection processes (default: one per CPU)")
+    parser.add_argument("--detect-scale", type=float,
+                        help="Search the board at this fraction of the resolution (e.g. 0.25 for 12MP images), "
+                             "then refine the corners at full resolution")
+    parser.add_argument("--cache", help="Corner cache file (default: corner_cache.npz in the images folder)")
+    parser.add_argument("--no-cache", action="store_true", help="Always detect the corners again")
+    return parser.parse_args()
+
 if __name__ == '__main__':
     # Example usage:
     # 1) Place your checkerboard images in a folder like "calibration_images"
     # 2) Adjust grid_size to match your checkerboard
     # 3) Adjust square_size if each square is a different dimension
-    # 4) Run the script: python calibrate_fisheye.py
-    images_folder = 'Images'  # your folder with images
+    # 4) Run the script: python GoPro_fisheye_calibration.py --images Images --grid 6 8 --square-size 0.019
+    #    or pick the frames from a video: python GoPro_fisheye_calibration.py --video calib.MP4 --images calib_frames
+    args = parse_args()
+    if args.video:
+        thumb_scale = extract_calibration_frames(args.video, args.images, tuple(args.grid), args.max_frames,
+                                                 args.sample_every, args.thumb_width, args.backend)
+        if thumb_scale is None:
+            raise SystemExit(1)
+        if args.detect_scale is None:
+            # The board was already found at thumbnail size, only the refinement needs the full resolution
+            args.detect_scale = thumb_scale
     calibrate_fisheye(
-        images_folder=images_folder,
-        grid_size=(6, 8),        # or whatever your checkerboard corners are
-        square_size=0.019,        # 2 cm squares, for example
-        output_file='gopro_calibration_fisheye.npz'
-    )
\ No newline at end of file
+        images_folder=args.images,
+        grid_size=tuple(args.grid),
+        square_size=args.square_size,
+        output_file=args.output,
+        workers=args.workers,
+        detect_scale=args.detect_scale,
+        cache_file='' if args.no_cache else args.cache
+    )
@@ -0,0 +1,2 @@
+#Benchmarks for the hot paths of the tracking pipeline, run on synthetic data (no model or GPU needed).
+#Run them from the repository root with: python -m benchmarks.run
@@ -0,0 +1,56 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+from data_export import CSVExporter, ColumnarExporter
+
+HEADER = ['frame', 'id', 'x', 'y', 'width', 'real_width'] + \
+    [f'kp{i}_{c}' for i in range(10) for c in ('x', 'y', 'conf')]
+
+ROWS_PER_CALL = 1000
+
+def _rows():
+    rng = np.random.default_rng(0)
+    rows = rng.uniform(0, 1920, (ROWS_PER_CALL, len(HEADER)))
+    rows[:, 0] = np.arange(ROWS_PER_CALL) // 20
+    rows[:, 1] = np.arange(ROWS_PER_CALL) % 20
+    return rows
+
+@contextmanager
+def _csv_export(kind):
+    rows = _rows()
+    list_rows = [[int(r[0]), int(r[1])] + r[2:].tolist() for r in rows]
+    with tempfile.TemporaryDirectory(prefix='bench_export_') as directory:
+        exporter = CSVExporter(os.path.join(directory, 'tracking_data.csv'), HEADER,
+                               index_column='id' if kind == 'indexed' else None)
+        try:
+            if kind == 'write_row':
+                yield lambda: [exporter.write_row(row) for row in list_rows]
+            else:
+                yield lambda: exporter.write_rows(list_rows)
+        finally:
+            exporter.close()
+
+@contextmanager
+def _columnar_export(backend):
+    rows = _rows()
+    with tempfile.TemporaryDirectory(prefix='bench_export_') as directory:
+        exporter = ColumnarExporter(os.path.join(directory, 'tracking_data'), HEADER, backend=backend)
+        try:
+            yield lambda: exporter.write_rows(rows)
+        finally:
+            exporter.close()
+
+def _available_columnar():
+    try:
+        import pyarrow  # noqa: F401
+        return ['npz', 'parquet']
+    except ImportError:
+        return ['npz']
+
+BENCHMARKS = [
+    (f'csv_export_{ROWS_PER_CALL}_rows', ['write_row', 'write_rows', 'indexed'], _csv_export),
+    (f'columnar_export_{ROWS_PER_CALL}_rows', _available_columnar(), _columnar_export),
+]
@@ -0,0 +1,20 @@
+from coordinate_transformer import CoordinateTransformer, calculate_real_world_coordinates, calculate_real_box_widths
+from . import synthetic
+
+def _transform(n):
+    transformer = CoordinateTransformer(synthetic.MAPPING_FILE)
+    pts = synthetic.points(n)
+    return lambda: transformer.transform(pts)
+
+def _box_world_and_width(n):
+    transformer = CoordinateTransformer(synthetic.MAPPING_FILE)
+    boxes = synthetic.boxes(n)
+    def run():
+        calculate_real_world_coordinates(boxes, transformer)
+        calculate_real_box_widths(boxes, transformer)
+    return run
+
+BENCHMARKS = [
+    ('homography_points', [10_000, 100_000, 1_000_000], _transform),
+    ('homography_boxes', [50, 500, 10_000], _box_world_and_width),
+]
@@ -0,0 +1,65 @@
+import cv2
+
+from buffer_pool import BufferPool
+from preprocess import Undistorter, preprocess_frame
+from . import synthetic
+
+def _undistort(resolution):
+    size = synthetic.RESOLUTIONS[resolution]
+    K, D, DIM = synthetic.calibration()
+    undistorter = Undistorter(K, D, DIM)
+    img = synthetic.frame(size)
+    return lambda: undistorter.undistort(img)
+
+def _build_maps(resolution):
+    # Cost paid once per run (or never, with the disk cache)
+    size = synthetic.RESOLUTIONS[resolution]
+    K, D, DIM = synthetic.calibration()
+    def run():
+        Undistorter(K, D, DIM).maps(size)
+    return run
+
+def _preprocess_frame(resolution):
+    size = synthetic.RESOLUTIONS[resolution]
+    K, D, DIM = synthetic.calibration()
+    undistorter = Undistorter(K, D, DIM)
+    img = synthetic.frame(size)
+    return lambda: preprocess_frame(img, K, D, DIM, (640, 640), (1920, 1080), undistorter=undistorter)
+
+def _preprocess_frame_pooled(resolution):
+    # Same as preprocess_frame, with the outputs recycled through a BufferPool
+    size = synthetic.RESOLUTIONS[resolution]
+    K, D, DIM = synthetic.calibration()
+    undistorter = Undistorter(K, D, DIM)
+    pool = BufferPool()
+    img = synthetic.frame(size)
+    def run():
+        recognition, display = preprocess_frame(img, K, D, DIM, (640, 640), (1920, 1080),
+                                                undistorter=undistorter, pool=pool)
+        pool.release(recognition, display)
+    return run
+
+def _remap_then_resize(resolution):
+    # Reference: the previous remap -> resize -> resize path
+    size = synthetic.RESOLUTIONS[resolution]
+    K, D, DIM = synthetic.calibration()
+    undistorter = Undistorter(K, D, DIM)
+    img = synthetic.frame(size)
+    def run():
+        undistorted = undistorter.undistort(img)
+        cv2.resize(undistorted, (640, 640), interpolation=cv2.INTER_AREA)
+        cv2.resize(undistorted, (1920, 1080), interpolation=cv2.INTER_AREA)
+    return run
+
+BENCHMARKS = [
+    ('undistort', ['1080p', '4k'], _undistort),
+    ('build_remap_maps', ['1080p', '4k'], _build_maps),
+    ('preprocess_frame', ['1080p', '4k'], _preprocess_frame),
+    ('preprocess_frame_pooled', ['1080p', '4k'], _preprocess_frame_pooled),
+    ('remap_then_resize', ['1080p', '4k'], _remap_then_resize),
+]
+
+# The single-remap preprocessing must never fall behind the reference path
+CHECKS = [
+    ('preprocess_frame', 'remap_then_resize'),
+]
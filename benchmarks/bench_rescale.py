@@ -0,0 +1,32 @@
+from preprocess import rescale_coordinates, rescale_boxes, rescale_keypoints
+from . import synthetic
+
+def _rescale_boxes(n):
+    boxes = synthetic.boxes(n, (640, 640))
+    return lambda: [rescale_coordinates(box.tolist(), (640, 640), (1920, 1080)) for box in boxes]
+
+def _rescale_keypoints(n):
+    keypoints = synthetic.keypoints(n)
+    return lambda: [
+        [
+            rescale_coordinates(kp[:2], (640, 640), (1920, 1080)) + [kp[2]]
+            if len(kp) == 3 and kp[2] > 0 else [0, 0, 0]
+            for kp in obj_kps
+        ]
+        for obj_kps in keypoints
+    ]
+
+def _rescale_boxes_batched(n):
+    boxes = synthetic.boxes(n, (640, 640))
+    return lambda: rescale_boxes(boxes, (640, 640), (1920, 1080))
+
+def _rescale_keypoints_batched(n):
+    keypoints = synthetic.keypoints(n)
+    return lambda: rescale_keypoints(keypoints, (640, 640), (1920, 1080))
+
+BENCHMARKS = [
+    ('rescale_boxes', [10, 50, 200], _rescale_boxes),
+    ('rescale_keypoints', [10, 50, 200], _rescale_keypoints),
+    ('rescale_boxes_batched', [10, 50, 200], _rescale_boxes_batched),
+    ('rescale_keypoints_batched', [10, 50, 200], _rescale_keypoints_batched),
+]
@@ -0,0 +1,26 @@
+import numpy as np
+
+from kalman import KalmanTracker
+from speed_utils import SpeedTracker
+
+def _get_speeds(n_tracks, tracker_class=SpeedTracker):
+    # One call per frame with n_tracks concurrent vehicles moving ~0.3 m per frame
+    rng = np.random.default_rng(0)
+    track_ids = list(range(1, n_tracks + 1))
+    start = rng.uniform(-20, 20, (n_tracks, 2))
+    step = rng.uniform(0.1, 0.5, (n_tracks, 2))
+    tracker = tracker_class()
+    state = {'frame': 0}
+    def run():
+        state['frame'] += 1
+        coords = start + step * state['frame']
+        tracker.get_speeds(track_ids, coords, state['frame'], 60.0)
+    return run
+
+def _kalman_get_speeds(n_tracks):
+    return _get_speeds(n_tracks, KalmanTracker)
+
+BENCHMARKS = [
+    ('speed_tracker_get_speeds', [10, 50, 200, 500], _get_speeds),
+    ('kalman_tracker_get_speeds', [10, 50, 200, 500], _kalman_get_speeds),
+]
@@ -0,0 +1,23 @@
+import os
+import tempfile
+from contextlib import contextmanager, redirect_stdout
+import io
+
+from visualization import create_visualization
+from . import synthetic
+
+@contextmanager
+def _create_visualization(size):
+    n_tracks, frames = size
+    data = synthetic.trajectories(n_tracks, frames)
+    with tempfile.TemporaryDirectory(prefix='bench_vis_') as directory:
+        output = os.path.join(directory, 'tracks.mp4')
+        def run():
+            # create_visualization releases its video writer itself, also on errors
+            with redirect_stdout(io.StringIO()):  # silence the progress messages
+                create_visualization(data, output, (1280, 720))
+        yield run
+
+BENCHMARKS = [
+    ('create_visualization', [(20, 300), (100, 600)], _create_visualization),
+]
@@ -0,0 +1,77 @@
+#Minimal timing harness used by the benchmark modules.
+#Every benchmark module exposes BENCHMARKS: a list of (name, params, setup) where setup(param) returns
+#the zero-argument callable to time, or a context manager yielding it when the benchmark has to clean up
+#(temporary files, open exporters). A module may also define CHECKS: (fast, reference) pairs of benchmark names
+#where fast must not be slower than reference for any parameter. Results are plain dicts so they can be saved as JSON and compared across commits.
+
+import gc
+import time
+from contextlib import ExitStack
+
+def measure(fn, repeat=5, min_time=0.2):
+    """
+    Time fn: calibrate the number of calls so one repeat takes at least min_time,
+    then run `repeat` repeats. Returns per-call times in seconds (min, median, mean).
+    """
+    fn()  # warm-up (caches, lazy allocations)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    times = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    times.sort()
+    return {
+        'min_s': times[0],
+        'median_s': times[len(times) // 2],
+        'mean_s': sum(times) / len(times),
+        'calls_per_repeat': number,
+        'repeat': repeat,
+    }
+
+def run_benchmarks(benchmarks, repeat=5, min_time=0.2, name_filter=None):
+    """Run (name, params, setup) benchmarks and return {"name[param]": result}."""
+    results = {}
+    for name, params, setup in benchmarks:
+        for param in params:
+            key = f"{name}[{param}]"
+            if name_filter and name_filter not in key:
+                continue
+            with ExitStack() as stack:
+                fn = setup(param)
+                if hasattr(fn, '__enter__'):
+                    fn = stack.enter_context(fn)
+                result = measure(fn, repeat=repeat, min_time=min_time)
+            results[key] = result
+            print(f"{key:<45} {result['median_s'] * 1e3:10.3f} ms  (min {result['min_s'] * 1e3:.3f} ms)")
+    return results
+
+def check_results(results, checks, tolerance=0.0):
+    """Return the failed (fast, reference) checks as messages; pairs not present in results are skipped."""
+    failures = []
+    for fast, reference in checks:
+        for key, result in results.items():
+            name, _, param = key.partition('[')
+            ref_key = f"{reference}[{param}"
+            if name != fast or ref_key not in results:
+                continue
+            t_fast, t_ref = result['median_s'], results[ref_key]['median_s']
+            if t_fast > t_ref * (1 + tolerance):
+                failures.append(f"{key} ({t_fast * 1e3:.3f} ms) is slower than {ref_key} ({t_ref * 1e3:.3f} ms)")
+    return failures
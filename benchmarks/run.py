@@ -0,0 +1,100 @@
+#Runs the benchmark suite and saves the results to benchmarks/results/<timestamp>_<commit>.json,
+#or compares two saved result files.
+#   python -m benchmarks.run [--filter homography] [--repeat 7]
+#   python -m benchmarks.run --compare benchmarks/results/old.json benchmarks/results/new.json
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from .harness import run_benchmarks, check_results
+from . import bench_export, bench_homography, bench_preprocess, bench_rescale, bench_speed, bench_visualization
+
+MODULES = [bench_preprocess, bench_rescale, bench_homography, bench_speed, bench_export, bench_visualization]
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(RESULTS_DIR),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def machine_info():
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+    }
+
+def compare(old_file, new_file, threshold=0.05):
+    """Print the median time of every benchmark in both files and the relative change."""
+    with open(old_file) as f:
+        old = json.load(f)
+    with open(new_file) as f:
+        new = json.load(f)
+    print(f"old: {old.get('commit')} {old.get('timestamp')}")
+    print(f"new: {new.get('commit')} {new.get('timestamp')}")
+    print(f"{'benchmark':<45} {'old (ms)':>10} {'new (ms)':>10} {'change':>8}")
+    for key in sorted(set(old['results']) | set(new['results'])):
+        if key not in old['results'] or key not in new['results']:
+            side = 'new' if key in new['results'] else 'old'
+            print(f"{key:<45} only in {side}")
+            continue
+        t_old = old['results'][key]['median_s']
+        t_new = new['results'][key]['median_s']
+        change = t_new / t_old - 1
+        flag = '  faster' if change < -threshold else '  SLOWER' if change > threshold else ''
+        print(f"{key:<45} {t_old * 1e3:10.3f} {t_new * 1e3:10.3f} {change:+8.1%}{flag}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths of the tracking pipeline.")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repeats per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum duration of one repeat (s)")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>_<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=('OLD', 'NEW'), help="Compare two result files and exit")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    benchmarks = [bench for module in MODULES for bench in module.BENCHMARKS]
+    results = run_benchmarks(benchmarks, repeat=args.repeat, min_time=args.min_time, name_filter=args.filter)
+
+    timestamp = time.strftime('%Y%m%d-%H%M%S')
+    commit = git_commit()
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{timestamp}_{commit}.json")
+    with open(output, 'w') as f:
+        json.dump({'timestamp': timestamp, 'commit': commit, 'machine': machine_info(), 'results': results},
+                  f, indent=4)
+    print(f"Results saved to {output}")
+
+    # 5% margin for timing noise between two runs of the same work
+    failures = check_results(results, [check for module in MODULES for check in getattr(module, 'CHECKS', [])],
+                             tolerance=0.05)
+    for failure in failures:
+        print(f"CHECK FAILED: {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
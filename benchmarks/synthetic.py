@@ -0,0 +1,57 @@
+#Synthetic inputs shared by the benchmarks.
+
+import os
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAPPING_FILE = os.path.join(ROOT, 'coordinate_mapping_2030.json')
+
+RESOLUTIONS = {'1080p': (1920, 1080), '4k': (3840, 2160)}
+
+def calibration(dim=(1920, 1080)):
+    """Plausible GoPro-like fisheye calibration for the given image size."""
+    w, h = dim
+    K = np.array([[0.47 * w, 0, w / 2], [0, 0.47 * w, h / 2], [0, 0, 1]], dtype=np.float64)
+    D = np.array([[0.05], [-0.02], [0.01], [-0.003]], dtype=np.float64)
+    return K, D, np.array(dim)
+
+def frame(size, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+
+def boxes(n, size=(1920, 1080), seed=0):
+    """(n, 4) xywh boxes inside an image of the given size."""
+    rng = np.random.default_rng(seed)
+    w = rng.uniform(40, 300, n)
+    h = rng.uniform(30, 200, n)
+    x = rng.uniform(w / 2, size[0] - w / 2)
+    y = rng.uniform(h / 2, size[1] - h / 2)
+    return np.column_stack((x, y, w, h))
+
+def keypoints(n, k=10, size=(640, 640), seed=0):
+    """(n, k, 3) keypoints with roughly 20% zero-confidence points."""
+    rng = np.random.default_rng(seed)
+    kps = np.empty((n, k, 3))
+    kps[..., 0] = rng.uniform(0, size[0], (n, k))
+    kps[..., 1] = rng.uniform(0, size[1], (n, k))
+    kps[..., 2] = np.where(rng.random((n, k)) < 0.2, 0.0, rng.uniform(0.3, 1.0, (n, k)))
+    return kps
+
+def points(n, size=(1920, 1080), seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform((0, 0), size, (n, 2))
+
+def trajectories(n_tracks, frames, frame_size=(1280, 720), seed=0):
+    """{track_id: [(frame, x, y), ...]} of vehicles crossing the image, like visualization.read_tracking_data."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for track_id in range(1, n_tracks + 1):
+        start = int(rng.integers(0, max(1, frames // 2)))
+        length = int(rng.integers(frames // 4, frames // 2 + 1))
+        f = np.arange(start, min(frames, start + length))
+        x = np.linspace(0, frame_size[0] - 1, len(f)) if rng.random() < 0.5 else \
+            np.linspace(frame_size[0] - 1, 0, len(f))
+        y = np.full(len(f), rng.uniform(0.2, 0.8) * frame_size[1]) + rng.normal(0, 2, len(f))
+        data[track_id] = [(int(a), int(b), int(c)) for a, b, c in zip(f, x, y)]
+    return data
@@ -0,0 +1,48 @@
+#Pool of reusable image buffers for the frame pipeline.
+#Decoding, cv2.remap and cv2.resize write into buffers taken from the pool (dst=...), and the stages that consume the
+#frames hand them back once they are done, so after the first few frames no large arrays are allocated any more.
+#The pipeline queues bound the number of frames in flight, which bounds the number of buffers the pool ever creates.
+
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+class BufferPool:
+    """
+    Thread-safe free lists of NumPy arrays keyed by (shape, dtype).
+    :param max_free: free buffers kept per shape; buffers released beyond that are left to the garbage collector.
+    """
+
+    def __init__(self, max_free=32):
+        self.max_free = max_free
+        self._free = defaultdict(list)
+        self._lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """A buffer of the given shape and dtype; its content is undefined."""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free[key]
+            if free:
+                self.reused += 1
+                return free.pop()
+            self.allocated += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, *buffers):
+        """Return buffers to the pool (None entries are ignored). A buffer must not be used after its release."""
+        with self._lock:
+            for buffer in buffers:
+                if buffer is None or not isinstance(buffer, np.ndarray) or not buffer.flags.c_contiguous:
+                    continue  # Strided views cannot be used as dst buffers
+                free = self._free[(buffer.shape, buffer.dtype.str)]
+                # The same array may be released by two consumers (e.g. recognition and display sharing a frame)
+                if len(free) < self.max_free and not any(b is buffer for b in free):
+                    free.append(buffer)
+
+    def summary(self):
+        held = sum(len(free) for free in self._free.values())
+        return f"buffer pool: {self.allocated} allocated, {self.reused} reused, {held} free"
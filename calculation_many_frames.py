@@ -1,66 +1,140 @@
 #same method as calculation_model_2points.py, but uses many different combinations of points to find the best
+#The 2x2 (l, m) system is solved for every pair of frames at once with NumPy broadcasting, in chunks so memory stays bounded,
+#and the pairs are aggregated into a robust estimate (median or trimmed mean).
+import argparse
 import numpy as np
 import csv
+from config import MAPPING_FILE
+from coordinate_transformer import compute_alpha, load_camera_position
 
-# Load data from the CSV file
-input_csv = "car_14_transformed.csv"
-data = np.genfromtxt(input_csv, delimiter=',', skip_header=1)
+# Columns (0-based indexing):
+# frame=0, id=1, real_world_x=2, real_world_y=3, width=4, real_width=5
 
-# Camera coordinates (first for 40-50kmph, second for 20-30kmph videos)
-#cam_coordinates = np.array([-0.21, -8.37, 3.13])
-cam_coordinates = np.array([2.04, -3.21, 3.13]) 
+def single_point_frames(data):
+    """Keep only frames that contain exactly one data point, sorted by frame."""
+    frames, counts = np.unique(data[:, 0], return_counts=True)
+    keep = np.isin(data[:, 0], frames[counts == 1])
+    selected = data[keep]
+    return selected[np.argsort(selected[:, 0])]
 
-# Columns (0-based indexing):
-# frame=0, id=1, real_world_x=2, real_world_y=3, width=4, height=5
-
-# Get available frames
-frames = np.unique(data[:, 0]).astype(int)
-print(f"Available frames: {frames}")
-selected_frame = int(input("Choose a frame: "))
-
-# Filter data for the selected frame
-selected_data = data[data[:, 0] == selected_frame]
-
-if selected_data.shape[0] != 1:
-    print("Selected frame must contain exactly one data point.")
-    exit()
-
-# Extract the selected point
-selected_x, selected_y, selected_S_real = selected_data[0, 2], selected_data[0, 3], selected_data[0, 5]
-
-# Prepare CSV output file
-output_csv = "solved_m_l_per_frame.csv"
-with open(output_csv, "w", newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(["frame", "m", "l"])
-
-    for frame in frames:
-        if frame == selected_frame:
-            continue
-        
-        frame_data = data[data[:, 0] == frame]
-        if frame_data.shape[0] != 1:
-            continue
-        
-        # Extract second point
-        frame_x, frame_y, frame_S_real = frame_data[0, 2], frame_data[0, 3], frame_data[0, 5]
-        
-        # Compute angles
-        x_rel_1, y_rel_1 = selected_x - cam_coordinates[0], selected_y - cam_coordinates[1]
-        x_rel_2, y_rel_2 = frame_x - cam_coordinates[0], frame_y - cam_coordinates[1]
-        alpha_1 = np.arctan2(x_rel_1, y_rel_1)
-        alpha_2 = np.arctan2(x_rel_2, y_rel_2)
-        
-        # Compute denominator
-        den = np.sin(alpha_2) * np.cos(alpha_1) - np.sin(alpha_1) * np.cos(alpha_2)
-        if abs(den) < 1e-12:
-            continue  # Skip if angles are too close
-        
-        # Solve for m and l
-        m = (frame_S_real * np.cos(alpha_1) - selected_S_real * np.cos(alpha_2)) / den
-        l = (selected_S_real * np.sin(alpha_2) - frame_S_real * np.sin(alpha_1)) / den
-        
-        # Save to CSV
-        writer.writerow([frame, m, l])
-
-print(f"Results saved to {output_csv}")
\ No newline at end of file
+def solve_pairs(alpha, S_real, chunk_size=1024, eps=1e-12):
+    """
+    Solve l, m for every pair (i, j), i < j, of the given points.
+    For a pair, S_i = l cos(a_i) + m sin(a_i) and S_j = l cos(a_j) + m sin(a_j), so with
+    den = sin(a_j) cos(a_i) - sin(a_i) cos(a_j):
+        m = (S_j cos(a_i) - S_i cos(a_j)) / den
+        l = (S_i sin(a_j) - S_j sin(a_i)) / den
+    Rows i are processed in chunks against all j; pairs with |den| < eps (angles too close) are skipped.
+    :return: (i, j, l, m) arrays of the valid pairs.
+    """
+    alpha = np.asarray(alpha, dtype=np.float64)
+    S_real = np.asarray(S_real, dtype=np.float64)
+    n = len(alpha)
+    sin_a, cos_a = np.sin(alpha), np.cos(alpha)
+    j_all = np.arange(n)
+
+    results = ([], [], [], [])
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        i = np.arange(start, stop)[:, None]
+        si, ci, Si = sin_a[i], cos_a[i], S_real[i]
+
+        den = sin_a[None, :] * ci - si * cos_a[None, :]
+        m = S_real[None, :] * ci - Si * cos_a[None, :]
+        l = Si * sin_a[None, :] - S_real[None, :] * si
+
+        valid = (j_all[None, :] > i) & (np.abs(den) >= eps)
+        ii, jj = np.nonzero(valid)
+        d = den[ii, jj]
+        results[0].append(ii + start)
+        results[1].append(jj)
+        results[2].append(l[ii, jj] / d)
+        results[3].append(m[ii, jj] / d)
+
+    if n == 0:
+        return tuple(np.empty(0) for _ in range(4))
+    return tuple(np.concatenate(parts) for parts in results)
+
+def solve_against_reference(alpha, S_real, ref, eps=1e-12):
+    """Solve l, m for every point paired with the reference point ref (the original interactive mode)."""
+    alpha = np.asarray(alpha, dtype=np.float64)
+    S_real = np.asarray(S_real, dtype=np.float64)
+    a1, S1 = alpha[ref], S_real[ref]
+    den = np.sin(alpha) * np.cos(a1) - np.sin(a1) * np.cos(alpha)
+    valid = np.abs(den) >= eps
+    valid[ref] = False
+    j = np.flatnonzero(valid)
+    m = (S_real[j] * np.cos(a1) - S1 * np.cos(alpha[j])) / den[j]
+    l = (S1 * np.sin(alpha[j]) - S_real[j] * np.sin(a1)) / den[j]
+    return j, l, m
+
+def robust_aggregate(values, method='median', trim=0.1):
+    """Median or trimmed mean (trim = fraction cut at each end) of the finite values."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.nan
+    if method == 'median':
+        return float(np.median(values))
+    k = int(len(values) * trim)
+    values = np.sort(values)
+    if k > 0 and len(values) > 2 * k:
+        values = values[k:-k]
+    return float(values.mean())
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Estimate vehicle length l and width m from all pairs of frames.")
+    parser.add_argument("input_csv", nargs='?', default="car_14_transformed.csv",
+                        help="CSV exported by car_tracking.py")
+    parser.add_argument("--mapping", default=MAPPING_FILE, help="Coordinate mapping JSON the camera position belongs to")
+    parser.add_argument("--camera", type=float, nargs=3, metavar=('X', 'Y', 'Z'),
+                        help="Override the camera coordinates of the mapping")
+    parser.add_argument("--reference", type=int,
+                        help="Only pair every frame with this frame (the original single-reference mode)")
+    parser.add_argument("--method", choices=("median", "trimmed"), default="median", help="Aggregate of the pairs")
+    parser.add_argument("--trim", type=float, default=0.1, help="Fraction trimmed at each end for --method trimmed")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="Rows solved per chunk")
+    parser.add_argument("--output", default="solved_m_l_per_frame.csv", help="Per-pair results CSV")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # Camera coordinates come from the mapping configuration
+    cam_coordinates = np.array(args.camera) if args.camera else load_camera_position(args.mapping)
+    if cam_coordinates is None:
+        print(f"No camera position known for '{args.mapping}'. Add it to config.CAMERA_POSITIONS or use --camera.")
+        return
+
+    # Load data from the CSV file
+    data = np.genfromtxt(args.input_csv, delimiter=',', skip_header=1, ndmin=2)
+    data = single_point_frames(data)
+    frames = data[:, 0].astype(int)
+    print(f"Available frames: {len(frames)}")
+
+    alpha = compute_alpha(data[:, 2], data[:, 3], cam_coordinates)
+    S_real = data[:, 5]
+
+    # Prepare CSV output file
+    with open(args.output, "w", newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        if args.reference is not None:
+            matches = np.flatnonzero(frames == args.reference)
+            if len(matches) != 1:
+                print("Selected frame must contain exactly one data point.")
+                return
+            j, l, m = solve_against_reference(alpha, S_real, matches[0])
+            writer.writerow(["frame", "m", "l"])
+            writer.writerows(zip(frames[j], m, l))
+        else:
+            i, j, l, m = solve_pairs(alpha, S_real, chunk_size=args.chunk_size)
+            writer.writerow(["frame_1", "frame_2", "m", "l"])
+            writer.writerows(zip(frames[i], frames[j], m, l))
+
+    print(f"Solved {len(l)} frame pairs")
+    print(f"Estimated l ({args.method}): {robust_aggregate(l, args.method, args.trim)}")
+    print(f"Estimated m ({args.method}): {robust_aggregate(m, args.method, args.trim)}")
+    print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,157 @@
 #calculates car size based on .csv file exported from car_tracking.py
-import numpy as np
-from scipy.optimize import least_squares
+#The model S_real = l*cos(alpha) + m*sin(alpha) is linear in (l, m), so every vehicle is solved in closed form
+#with vectorized linear least squares over all tracks at once. Tracks whose solution is ill-conditioned or outside the
+#bounds fall back to the bounded scipy least_squares solver, spread over a process pool.
+import argparse
 import csv
+import glob
+from concurrent.futures import ProcessPoolExecutor
 
-# Load data from the CSV file
-input_csv = "car_2_transformed.csv"
-data = np.genfromtxt(input_csv, delimiter=',', skip_header=1)
+import numpy as np
+from scipy.optimize import least_squares
 
-# Camera coordinates (first for 20-30kmph, second for 40-50kmph videos)
-cam_coordinates = np.array([-0.21, -8.37, 3.13])
-#cam_coordinates = np.array([2.04, -3.21, 3.13]) 
+from config import MAPPING_FILE
+from coordinate_transformer import compute_alpha, load_camera_position
+from car_tracking import load_tracking_arrays, load_transformation_data
 
-# Columns (0-based indexing):
+# Columns of car_*_transformed.csv (0-based indexing):
 # frame=0, id=1, real_world_x=2, real_world_y=3, width=4, real_width=5
 
-# Extract relevant data
-real_world_x = data[:, 2]
-real_world_y = data[:, 3]
-S_real = data[:, 5]
+# Bounds for l and m
+BOUNDS = ([2, -3], [8, 8])  # Lower and upper bounds for l and m
 
-# Compute angles
-x_rel = real_world_x - cam_coordinates[0]
-y_rel = real_world_y - cam_coordinates[1]
-alpha = np.arctan2(x_rel, y_rel)
+# Initial guess
+INITIAL_GUESS = [2, 5]
 
 # Objective function for least squares
 def residuals(params, alpha, S_real):
     l, m = params
     return S_real - (l * np.cos(alpha) + m * np.sin(alpha))
 
-# Bounds for l and m
-bounds = ([2, -3], [8, 8])  # Lower and upper bounds for l and m
+def solve_bounded(alpha, S_real, bounds=BOUNDS, initial_guess=INITIAL_GUESS):
+    """Solve using constrained least squares (the original per-vehicle method)."""
+    result = least_squares(residuals, initial_guess, bounds=bounds, args=(alpha, S_real))
+    return result.x
 
-# Initial guess
-initial_guess = [2, 5]
+def _solve_bounded_task(args):
+    track_id, alpha, S_real, bounds = args
+    return track_id, solve_bounded(alpha, S_real, bounds)
+
+def solve_linear(track_index, alpha, S_real, n_tracks, cond_limit=1e8):
+    """
+    Closed-form least squares for all tracks at once.
+    Per track the normal equations are [[Σcc, Σcs], [Σcs, Σss]] [l, m] = [ΣSc, ΣSs],
+    accumulated with np.bincount over the track index of every sample.
+    :return: l, m and a mask of tracks whose 2x2 system is well conditioned.
+    """
+    c, s = np.cos(alpha), np.sin(alpha)
+    sum_cc = np.bincount(track_index, c * c, n_tracks)
+    sum_cs = np.bincount(track_index, c * s, n_tracks)
+    sum_ss = np.bincount(track_index, s * s, n_tracks)
+    sum_Sc = np.bincount(track_index, S_real * c, n_tracks)
+    sum_Ss = np.bincount(track_index, S_real * s, n_tracks)
+
+    det = sum_cc * sum_ss - sum_cs ** 2
+    trace = sum_cc + sum_ss
+    # det / trace^2 is ~1/condition number of the 2x2 system
+    ok = det > trace ** 2 / cond_limit
+    safe_det = np.where(ok, det, 1.0)
+    l = np.where(ok, (sum_ss * sum_Sc - sum_cs * sum_Ss) / safe_det, np.nan)
+    m = np.where(ok, (sum_cc * sum_Ss - sum_cs * sum_Sc) / safe_det, np.nan)
+    return l, m, ok
+
+def estimate_dimensions(track_ids, real_world_x, real_world_y, S_real, cam_coordinates,
+                        bounds=BOUNDS, workers=1, min_samples=2):
+    """
+    Estimate l and m for every vehicle.
+    :return: list of rows [id, l, m, residual_rms, samples, method] sorted by id.
+    """
+    valid = np.isfinite(real_world_x) & np.isfinite(real_world_y) & np.isfinite(S_real)
+    track_ids, S_real = np.asarray(track_ids)[valid], np.asarray(S_real, dtype=np.float64)[valid]
+    alpha = compute_alpha(np.asarray(real_world_x)[valid], np.asarray(real_world_y)[valid], cam_coordinates)
+
+    unique_ids, track_index = np.unique(track_ids, return_inverse=True)
+    n_tracks = len(unique_ids)
+    samples = np.bincount(track_index, minlength=n_tracks)
+
+    l, m, ok = solve_linear(track_index, alpha, S_real, n_tracks)
+    inside = (l >= bounds[0][0]) & (l <= bounds[1][0]) & (m >= bounds[0][1]) & (m <= bounds[1][1])
+    method = np.where(ok & inside, 'linear', 'bounded').astype(object)
+
+    # Fall back to the bounded solver where the closed form is unusable or out of bounds
+    fallback = np.flatnonzero(~(ok & inside) & (samples >= min_samples))
+    if len(fallback):
+        order = np.argsort(track_index, kind='stable')
+        starts = np.concatenate(([0], np.cumsum(samples)))
+        tasks = [(t, alpha[order[starts[t]:starts[t + 1]]], S_real[order[starts[t]:starts[t + 1]]], bounds)
+                 for t in fallback]
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                solved = list(pool.map(_solve_bounded_task, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+        else:
+            solved = [_solve_bounded_task(task) for task in tasks]
+        for t, (l_t, m_t) in solved:
+            l[t], m[t] = l_t, m_t
+
+    # RMS residual of every track with its final (l, m)
+    fitted = np.isfinite(l) & (samples >= min_samples)
+    res = S_real - (l[track_index] * np.cos(alpha) + m[track_index] * np.sin(alpha))
+    rms = np.sqrt(np.bincount(track_index, np.nan_to_num(res) ** 2, n_tracks) / np.maximum(samples, 1))
+
+    return [
+        [int(unique_ids[t]), float(l[t]), float(m[t]), float(rms[t]), int(samples[t]), method[t]]
+        for t in range(n_tracks) if fitted[t]
+    ]
+
+def load_transformed_csvs(paths):
+    """Concatenate car_*_transformed.csv files into (id, real_world_x, real_world_y, real_width) columns."""
+    parts = [np.genfromtxt(path, delimiter=',', skip_header=1, ndmin=2) for path in paths]
+    data = np.concatenate([p for p in parts if p.size]) if parts else np.empty((0, 6))
+    return data[:, 1], data[:, 2], data[:, 3], data[:, 5]
+
+def load_tracking_csv(tracking_csv, mapping_file):
+    """Map the box centers of tracking_data.csv to world coordinates (same as car_tracking.py)."""
+    data = load_tracking_arrays(tracking_csv)
+    world = load_transformation_data(mapping_file).transform(data[:, 2:4])
+    return data[:, 1], world[:, 0], world[:, 1], data[:, 5]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Estimate vehicle length l and width m for all tracked vehicles.")
+    parser.add_argument("inputs", nargs='*',
+                        help="car_*_transformed.csv files (globs allowed); if omitted, --tracking is used")
+    parser.add_argument("--tracking", default="tracking_data.csv", help="Tracking CSV written by main.py")
+    parser.add_argument("--mapping", default=MAPPING_FILE, help="Coordinate mapping JSON (homography and camera)")
+    parser.add_argument("--camera", type=float, nargs=3, metavar=('X', 'Y', 'Z'),
+                        help="Override the camera coordinates of the mapping")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for the bounded fallback solver")
+    parser.add_argument("--output", default="vehicle_dimensions.csv", help="Output CSV")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # Camera coordinates come from the mapping configuration
+    cam_coordinates = np.array(args.camera) if args.camera else load_camera_position(args.mapping)
+    if cam_coordinates is None:
+        print(f"No camera position known for '{args.mapping}'. Add it to config.CAMERA_POSITIONS or use --camera.")
+        return
+
+    if args.inputs:
+        paths = sorted({path for pattern in args.inputs for path in glob.glob(pattern)})
+        track_ids, real_world_x, real_world_y, S_real = load_transformed_csvs(paths)
+    else:
+        track_ids, real_world_x, real_world_y, S_real = load_tracking_csv(args.tracking, args.mapping)
+
+    rows = estimate_dimensions(track_ids, real_world_x, real_world_y, S_real, cam_coordinates, workers=args.workers)
 
-# Solve using constrained least squares
-result = least_squares(residuals, initial_guess, bounds=bounds, args=(alpha, S_real))
-l, m = result.x
+    # Prepare CSV output file
+    with open(args.output, "w", newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["id", "l", "m", "residual_rms", "samples", "method"])
+        writer.writerows(rows)
 
-# Prepare CSV output file
-output_csv = "solved_m_l_per_frame.csv"
-with open(output_csv, "w", newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(["l", "m"])
-    writer.writerow([l, m])
+    print(f"Estimated dimensions of {len(rows)} vehicles")
+    print(f"Results saved to {args.output}")
 
-print(f"Results saved to {output_csv}")
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 #calculates vehicle size based on 2 points. As input it takes a .csv file exported by car_tracking.py. This script works with exactly 2 points, so it takes first 2 points from .csv file.
 import numpy as np
 import csv
+from config import MAPPING_FILE
+from coordinate_transformer import load_camera_position
 
 # Parameters
 D = 1  # Normalized distance (unused here, but left for reference)
@@ -8,9 +10,11 @@ sensor_width = 0.00617
 f = 0.00276  # Focal length
 image_width = 1920
 
-# Camera coordinates (first for 40-50kmph, second for 20-30kmph videos)
-cam_coordinates = np.array([-0.21, -8.37, 3.13])
-#cam_coordinates = np.array([2.04, -3.21, 3.13]) 
+# Camera coordinates of the current coordinate mapping (see config.CAMERA_POSITIONS)
+cam_coordinates = load_camera_position(MAPPING_FILE)
+if cam_coordinates is None:
+    print(f"No camera position known for '{MAPPING_FILE}'. Add it to config.CAMERA_POSITIONS.")
+    exit()
 # Load data from the CSV file
 input_csv = 'car_2_transformed.csv'
 data = np.genfromtxt(input_csv, delimiter=',', skip_header=1)
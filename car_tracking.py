@@ -1,30 +1,25 @@
 #this script takes as input the .csv file with all the tracked vehicles, and outputs the data about one particular vehicle that can be later analysed.
-import csv
-import json
-import math
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 from config import MAPPING_FILE
 from statistics import mean, stdev
 from data_export import CSVExporter
+from coordinate_transformer import CoordinateTransformer
+from track_index import read_track_rows
 
 def load_transformation_data(json_file):
-    with open(json_file, 'r') as f:
-        data = json.load(f)
-    # Extract the transformation matrix
-    matrix = data['transformation_matrix']
-    return matrix
+    # Load the homography once; points are then mapped in batches
+    return CoordinateTransformer(json_file)
 
-def apply_homography(x, y, H):
+def apply_homography(x, y, transformer):
     """
-    Apply homography transformation H to the point (x, y).
-    H is a 3x3 matrix: [[h11,h12,h13],[h21,h22,h23],[h31,h32,h33]]
+    Apply the homography to the point (x, y).
+    Returns (None, None) if the point cannot be mapped (denominator close to zero).
     """
-    denom = (H[2][0]*x + H[2][1]*y + H[2][2])
-    if denom == 0:
-        # Avoid division by zero - this would be a malformed homography or point outside domain
-        return None, None
-    X = (H[0][0]*x + H[0][1]*y + H[0][2]) / denom
-    Y = (H[1][0]*x + H[1][1]*y + H[1][2]) / denom
-    return X, Y
+    return transformer.transform_point(x, y)
 
 def remove_outliers(records, std_threshold=2.0):
     """
@@ -74,6 +69,10 @@ def select_best_frames(records, desired_count=10):
     # Sort by X coordinate
     sorted_records = sorted(records, key=lambda r: r['real_world_x'])
 
+    if desired_count == 1:
+        # A single frame cannot span the axis: take the one in the middle
+        return [sorted_records[len(sorted_records) // 2]]
+
     # A simple approach: pick frames equidistantly in the sorted list
     # so we get coverage along X.
     picked = []
@@ -93,27 +92,128 @@ def select_best_frames(records, desired_count=10):
 
     return picked
 
-def main():
-    tracking_csv = 'tracking_data.csv'       # CSV now contains columns: frame,id,x,y,width,real_width
-    mapping_json = MAPPING_FILE # Homography data
+OUTPUT_HEADER = ['frame', 'id', 'real_world_x', 'real_world_y', 'width', 'real_width']
 
-    # Load homography
-    H = load_transformation_data(mapping_json)
+def build_records(car_id, frames, world, widths, real_widths):
+    """Build the records used by remove_outliers / select_best_frames from world coordinates of one car."""
+    transformed_records = []
+    for frame, (rwx, rwy), width, real_width in zip(frames, world, widths, real_widths):
+        # Skip points the homography cannot map
+        if np.isnan(rwx) or np.isnan(rwy):
+            continue
+        transformed_records.append({
+            'frame': int(frame),
+            'id': int(car_id),
+            'real_world_x': float(rwx),
+            'real_world_y': float(rwy),
+            'width': float(width),
+            # Use the real_width from the CSV
+            'real_width': float(real_width)
+        })
+    return transformed_records
+
+def clean_and_select(records, desired_count=0, std_threshold=2.0):
+    """Remove outliers, pick the requested number of frames and sort the result by frame."""
+    cleaned_records = remove_outliers(records, std_threshold=std_threshold)
+    final_records = select_best_frames(cleaned_records, desired_count=desired_count)
+    final_records.sort(key=lambda x: x['frame'])
+    return final_records
 
-    # Read all tracking data
-    records = []
+def export_car_records(final_records, car_id, output_dir='.'):
+    # CHANGED: now we export 'width' and 'real_width' (instead of 'height')
+    output_filename = os.path.join(output_dir, f"car_{car_id}_transformed.csv")
+    exporter = CSVExporter(output_filename, OUTPUT_HEADER)
+    exporter.write_rows([[r[name] for name in OUTPUT_HEADER] for r in final_records])
+    exporter.close()
+    return output_filename
+
+def load_tracking_arrays(tracking_csv):
+    """
+    Read the columns needed for the transformation (frame, id, x, y, width, real_width)
+    from the tracking CSV in one pass, as a float array of shape (N, 6).
+    """
     with open(tracking_csv, 'r', newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            # Convert numeric fields
-            row['frame'] = int(row['frame'])
-            row['id'] = int(row['id'])
-            row['x'] = float(row['x'])
-            row['y'] = float(row['y'])
-            row['width'] = float(row['width'])
-            # CHANGED: read 'real_width' instead of 'height'
-            row['real_width'] = float(row['real_width'])
-            records.append(row)
+        header = f.readline().strip().split(',')
+    columns = [header.index(name) for name in ('frame', 'id', 'x', 'y', 'width', 'real_width')]
+    return np.loadtxt(tracking_csv, delimiter=',', skiprows=1, usecols=columns, ndmin=2)
+
+def group_by_track(data):
+    """Split a tracking array (frame and id in the first two columns) into {track_id: rows sorted by frame}."""
+    order = np.lexsort((data[:, 0], data[:, 1]))
+    data = data[order]
+    ids = data[:, 1].astype(np.int64)
+    boundaries = np.flatnonzero(np.diff(ids)) + 1
+    return {int(chunk[0, 1]): chunk for chunk in np.split(data, boundaries) if len(chunk)}
+
+def _process_track(args):
+    # Worker for the process pool; rows are (frame, id, x, y, width, real_width, world_x, world_y)
+    car_id, rows, desired_count, std_threshold, output_dir = args
+    records = build_records(car_id, rows[:, 0], rows[:, 6:8], rows[:, 4], rows[:, 5])
+    final_records = clean_and_select(records, desired_count, std_threshold)
+    if not final_records:
+        return car_id, None, 0
+    return car_id, export_car_records(final_records, car_id, output_dir), len(final_records)
+
+def process_tracks(tracking_csv='tracking_data.csv', mapping_json=MAPPING_FILE, car_ids=None, desired_count=0,
+                   std_threshold=2.0, output_dir='.', workers=1):
+    """
+    Batch version of main(): read the tracking data once, group it by track id and write
+    car_<id>_transformed.csv for every requested car (all cars if car_ids is None).
+    :param workers: number of processes used to clean, select and export the tracks (1 = no pool).
+    :return: {car_id: (output file or None, number of exported frames)}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    data = load_tracking_arrays(tracking_csv)
+
+    # Map the box centers of all rows with one homography call
+    # (we assume x,y is the bounding box center, as in main())
+    world = load_transformation_data(mapping_json).transform(data[:, 2:4])
+    tracks = group_by_track(np.column_stack((data, world)))
+    if car_ids is not None:
+        missing = [car_id for car_id in car_ids if car_id not in tracks]
+        for car_id in missing:
+            print(f"No records found for car id {car_id}.")
+        tracks = {car_id: tracks[car_id] for car_id in car_ids if car_id in tracks}
+
+    tasks = [(car_id, rows, desired_count, std_threshold, output_dir)
+             for car_id, rows in tracks.items()]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_process_track, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    else:
+        results = [_process_track(task) for task in tasks]
+
+    return {car_id: (output_filename, count) for car_id, output_filename, count in results}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export the world-coordinate track of one or more vehicles.")
+    parser.add_argument("--input", default='tracking_data.csv', help="Tracking CSV written by main.py")
+    parser.add_argument("--mapping", default=MAPPING_FILE, help="Coordinate mapping JSON")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--all", action="store_true", help="Export every vehicle")
+    selection.add_argument("--car-id", type=int, action="append", help="Vehicle id to export (repeatable)")
+    parser.add_argument("--frames", type=int, default=0, help="Number of frames per vehicle (0 for all)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--output-dir", default='.', help="Folder for the car_<id>_transformed.csv files")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.all or args.car_id:
+        # Non-interactive batch mode
+        results = process_tracks(args.input, args.mapping, None if args.all else args.car_id,
+                                 args.frames, output_dir=args.output_dir, workers=args.workers)
+        exported = {car_id: result for car_id, result in results.items() if result[0]}
+        for car_id, (output_filename, count) in sorted(exported.items()):
+            print(f"Car {car_id}: {count} frames -> {output_filename}")
+        print(f"Exported {len(exported)} of {len(results)} vehicles.")
+        return
+
+    tracking_csv = args.input       # CSV now contains columns: frame,id,x,y,width,real_width
+    mapping_json = args.mapping # Homography data
+
+    # Load homography
+    transformer = load_transformation_data(mapping_json)
 
     # Ask user for car id
     car_id_str = input("Enter car id: ")
@@ -130,67 +230,34 @@ def main():
     except ValueError:
         desired_count = 0  # default
 
-    # Filter records for the chosen car_id
-    car_records = [r for r in records if r['id'] == car_id]
+    # Read only the rows of the chosen car_id: with the track index written by main.py
+    # we seek straight to them, otherwise the CSV is streamed once without keeping other cars
+    car_records = read_track_rows(tracking_csv, car_id)
     if not car_records:
         print(f"No records found for car id {car_id}.")
         return
 
-    # Compute real-world coordinates for the center (x, y)
-    transformed_records = []
-    for r in car_records:
-        frame = r['frame']
-        # CHANGED: No longer use bounding-box height. 
-        # We assume x,y is already the bounding box center in the new CSV.
-        cx = r['x']
-        cy = r['y']
-
-        # Apply homography
-        rwx, rwy = apply_homography(cx, cy, H)
-        if rwx is None or rwy is None:
-            continue
+    # Compute real-world coordinates for the center (x, y) of all records at once.
+    # CHANGED: No longer use bounding-box height.
+    # We assume x,y is already the bounding box center in the new CSV.
+    centers = np.array([(r['x'], r['y']) for r in car_records], dtype=np.float64)
+    transformed_records = build_records(
+        car_id,
+        [r['frame'] for r in car_records],
+        transformer.transform(centers),
+        [r['width'] for r in car_records],
+        [r['real_width'] for r in car_records]
+    )
 
-        transformed_records.append({
-            'frame': frame,
-            'id': car_id,
-            'real_world_x': rwx,
-            'real_world_y': rwy,
-            'width': r['width'],
-            # Use the real_width from the CSV
-            'real_width': r['real_width']
-        })
-
-    # Remove outliers
-    cleaned_records = remove_outliers(transformed_records, std_threshold=2.0)
-
-    # If the user asked for a certain # of frames, select them
-    final_records = select_best_frames(cleaned_records, desired_count=desired_count)
+    # Remove outliers and, if the user asked for a certain # of frames, select them
+    final_records = clean_and_select(transformed_records, desired_count=desired_count, std_threshold=2.0)
     if not final_records:
         print("No records remain after filtering or selection.")
         return
 
-    # Prepare output CSV
-    # CHANGED: now we export 'width' and 'real_width' (instead of 'height')
-    header = ['frame', 'id', 'real_world_x', 'real_world_y', 'width', 'real_width']
-    output_filename = f"car_{car_id}_transformed.csv"
-    exporter = CSVExporter(output_filename, header)
-
-    # Sort final records by frame before output
-    final_records.sort(key=lambda x: x['frame'])
-
-    for r in final_records:
-        exporter.write_row([
-            r['frame'],
-            r['id'],
-            r['real_world_x'],
-            r['real_world_y'],
-            r['width'],
-            r['real_width']
-        ])
-
-    exporter.close()
+    output_filename = export_car_records(final_records, car_id)
     print(f"Data for car id {car_id} exported to {output_filename}")
     print(f"Total frames in output: {len(final_records)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
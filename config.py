@@ -3,6 +3,15 @@ VIDEO_PATH = "20kmph.mp4"
 RECOGNITION_SIZE = (640, 640)
 DISPLAY_SIZE = (1920, 1080)
 MAPPING_FILE = "coordinate_mapping_2030.json"
+CALIBRATION_FILE = "gopro_calibration_fisheye.npz"
+CACHE_REMAP_TABLES = True  # Store the undistortion maps next to the calibration file
+
+# Camera position (x, y, height in meters) in the world frame of each coordinate mapping.
+# A "camera_position" entry in the mapping JSON takes precedence over this table.
+CAMERA_POSITIONS = {
+    "coordinate_mapping_2030.json": (-0.21, -8.37, 3.13),
+    "coordinate_mapping_4050.json": (2.04, -3.21, 3.13),
+}
 
 # Stabilizer configuration (not functioning)
 #STABILIZER_SMOOTHING_WINDOW = 30  # Adjust this value based on your needs
@@ -0,0 +1,99 @@
+#This module maps image coordinates to real-world coordinates with the homography saved by coordinates_mapping.py.
+#The transformation matrix is loaded from the coordinate_mapping_*.json file once, and whole (N, 2) arrays of points
+#are mapped with a single matrix product. Points that cannot be mapped (denominator close to zero) come back as NaN.
+
+import json
+import os
+import numpy as np
+from config import CAMERA_POSITIONS
+
+class CoordinateTransformer:
+    """
+    Image -> world homography loaded from a coordinate mapping JSON file.
+    :param mapping_file: JSON file with 'transformation_matrix' (and optionally 'image_points', 'real_world_points').
+    """
+
+    def __init__(self, mapping_file=None, matrix=None, eps=1e-12):
+        if matrix is None:
+            with open(mapping_file, 'r') as f:
+                data = json.load(f)
+            matrix = data['transformation_matrix']
+            self.image_points = np.array(data.get('image_points', []), dtype=np.float64).reshape(-1, 2)
+            self.real_world_points = np.array(data.get('real_world_points', []), dtype=np.float64).reshape(-1, 2)
+        else:
+            self.image_points = np.empty((0, 2))
+            self.real_world_points = np.empty((0, 2))
+        self.mapping_file = mapping_file
+        self.H = np.asarray(matrix, dtype=np.float64)
+        self.eps = eps
+
+    def transform(self, points):
+        """
+        Map image points to world coordinates.
+        :param points: array-like of shape (N, 2) (or a single (x, y) pair).
+        :return: float array of shape (N, 2); rows that cannot be mapped are NaN.
+        """
+        pts = np.asarray(points, dtype=np.float64)
+        single = pts.ndim == 1
+        pts = pts.reshape(-1, 2)
+
+        H = self.H
+        # Same as [x, y, 1] @ H.T without building the homogeneous array
+        proj = pts @ H[:, :2].T + H[:, 2]
+        denom = proj[:, 2:3]
+        valid = np.abs(denom) >= self.eps
+        world = np.divide(proj[:, :2], denom, out=np.full((len(pts), 2), np.nan), where=valid)
+        return world[0] if single else world
+
+    def transform_point(self, x, y):
+        """Map a single point; returns (X, Y) or (None, None) if it cannot be mapped."""
+        X, Y = self.transform((x, y))
+        if np.isnan(X):
+            return None, None
+        return float(X), float(Y)
+
+def load_camera_position(mapping_file):
+    """
+    Camera position (x, y, z) for a coordinate mapping file: the 'camera_position' entry of the JSON
+    if present, otherwise config.CAMERA_POSITIONS. Returns None if the position is unknown.
+    """
+    with open(mapping_file, 'r') as f:
+        data = json.load(f)
+    position = data.get('camera_position')
+    if position is None:
+        position = CAMERA_POSITIONS.get(os.path.basename(mapping_file))
+    return None if position is None else np.array(position, dtype=np.float64)
+
+def compute_alpha(x, y, cam):
+    """Angle of every world point (x, y) as seen from the camera position cam, measured from the Y axis."""
+    return np.arctan2(np.asarray(x) - cam[0], np.asarray(y) - cam[1])
+
+def _as_boxes(boxes):
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+def bottom_centers(boxes):
+    """Middle-bottom points of (N, 4) xywh boxes."""
+    boxes = _as_boxes(boxes)
+    return np.column_stack((boxes[:, 0], boxes[:, 1] + boxes[:, 3] / 2))
+
+def calculate_real_world_coordinates(boxes, transformer):
+    """World coordinates of the middle-bottom point of every xywh box, as an (N, 2) array."""
+    return transformer.transform(bottom_centers(boxes))
+
+def calculate_real_box_widths(boxes, transformer):
+    """Real-world distance between the bottom-left and bottom-right corners of every xywh box."""
+    boxes = _as_boxes(boxes)
+    bottom = boxes[:, 1] + boxes[:, 3] / 2
+    half_w = boxes[:, 2] / 2
+    # Map left and right corners together in one call
+    corners = np.concatenate((
+        np.column_stack((boxes[:, 0] - half_w, bottom)),
+        np.column_stack((boxes[:, 0] + half_w, bottom)),
+    ))
+    world = transformer.transform(corners)
+    left, right = world[:len(boxes)], world[len(boxes):]
+    return np.hypot(right[:, 0] - left[:, 0], right[:, 1] - left[:, 1])
+
+def calculate_real_box_width(box, transformer):
+    """Real-world width of a single xywh box."""
+    return float(calculate_real_box_widths([box], transformer)[0])
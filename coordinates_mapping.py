@@ -6,6 +6,7 @@ import cv2
 import numpy as np
 import json
 from config import VIDEO_PATH, RECOGNITION_SIZE, DISPLAY_SIZE, MAPPING_FILE
+from frame_source import read_frame_at
 
 # Optional preprocessing dependencies
 USE_PREPROCESSING = True  # Set to False to disable preprocessing
@@ -13,7 +14,8 @@ if USE_PREPROCESSING:
     from preprocess import preprocess_frame, load_calibration_data
 
 # Configuration
-IMAGE_PATH = "mapping.png"  # Update with your actual image path
+IMAGE_PATH = "mapping.png"  # Update with your actual image path (a video file works as well)
+FRAME_INDEX = 0  # Frame used when IMAGE_PATH is a video
 DISPLAY_SIZE = (1920, 1080)  # Adjust as desired
 
 # Global variables
@@ -57,8 +59,8 @@ def compute_transformation(src_points, dst_points):
 def main():
     global image, points, real_world_coords
 
-    # Load the image
-    frame = cv2.imread(IMAGE_PATH)
+    # Load the image (or one frame of a video)
+    frame = read_frame_at(IMAGE_PATH, FRAME_INDEX)
     if frame is None:
         print(f"Failed to load the image from {IMAGE_PATH}. Please check the path.")
         return
@@ -1,7 +1,7 @@
 #this script is used to test the accuracy of coordinate mapping
 import cv2
-import numpy as np
-import json
+from coordinate_transformer import CoordinateTransformer
+from frame_source import read_frame_at
 
 # Optional preprocessing dependencies
 USE_PREPROCESSING = True  # Set to False to disable preprocessing
@@ -9,46 +9,41 @@ if USE_PREPROCESSING:
     from preprocess import preprocess_frame, load_calibration_data
 
 # Configuration
-IMAGE_PATH = "30kmph_mapping.png"
+IMAGE_PATH = "30kmph_mapping.png"  # A video file works as well
+FRAME_INDEX = 0  # Frame used when IMAGE_PATH is a video
 DISPLAY_SIZE = (1920, 1080)
 
 def load_homography(json_path="coordinate_mapping.json"):
     """
-    Loads the homography matrix from a JSON file, 
+    Loads the homography from a JSON file as a CoordinateTransformer,
     assumed to be image->world if you used:
     findHomography(image_points, real_world_points)
     """
-    with open(json_path, "r") as f:
-        data = json.load(f)
-    matrix_list = data["transformation_matrix"]
-    return np.array(matrix_list, dtype=np.float64)
+    return CoordinateTransformer(json_path)
 
-def transform_image_to_world(px, py, H_img_to_world):
+def transform_image_to_world(px, py, transformer):
     """
     Transforms a pixel (px, py) from image coordinates
-    to real-world coordinates using a homography that
+    to real-world coordinates using a transformer that
     maps image->world.
     """
-    pt = np.array([px, py, 1.0], dtype=np.float64)
-    proj = H_img_to_world @ pt
-    if abs(proj[2]) < 1e-12:
+    wx, wy = transformer.transform_point(px, py)
+    if wx is None:
         return None  # Avoid division by zero
-    wx = proj[0] / proj[2]
-    wy = proj[1] / proj[2]
     return (wx, wy)
 
 def mouse_callback(event, x, y, flags, param):
     """
     Mouse callback function: 
-    - param is a dictionary holding {"image": image, "H": homography}
+    - param is a dictionary holding {"image": image, "transformer": transformer}
     - On left click, transform pixel->world and draw text on the image
     """
     if event == cv2.EVENT_LBUTTONDOWN:
         display_img = param["image"]     # The image we are showing
-        H_img_to_world = param["H"]      # image->world homography
+        transformer = param["transformer"]  # image->world transformer
         
         # 1) Transform from clicked pixel to real-world
-        world_pt = transform_image_to_world(x, y, H_img_to_world)
+        world_pt = transform_image_to_world(x, y, transformer)
         if world_pt is None:
             return
         wx, wy = world_pt
@@ -66,8 +61,8 @@ def mouse_callback(event, x, y, flags, param):
         cv2.imshow("Validation", display_img)
 
 def main():
-    # 1) Load the image
-    frame = cv2.imread(IMAGE_PATH)
+    # 1) Load the image (or one frame of a video)
+    frame = read_frame_at(IMAGE_PATH, FRAME_INDEX)
     if frame is None:
         print(f"Failed to load image from {IMAGE_PATH}")
         return
@@ -86,18 +81,14 @@ def main():
     display_img = cv2.resize(frame, DISPLAY_SIZE, interpolation=cv2.INTER_AREA)
     
     # 2) Load the homography (image->world)
-    H_img_to_world = load_homography("coordinate_mapping_2030.json")
-    
-    # If your matrix is actually world->image, invert it:
-    # H_img_to_world = np.linalg.inv(H_world_to_img)  
-    # (Uncomment if needed, depending on how you saved it.)
+    transformer = load_homography("coordinate_mapping_2030.json")
 
     # 3) Create a named window and set the mouse callback
     cv2.namedWindow("Validation", cv2.WINDOW_NORMAL)
     cv2.setMouseCallback(
         "Validation", 
         mouse_callback, 
-        param={"image": display_img, "H": H_img_to_world}
+        param={"image": display_img, "transformer": transformer}
     )
 
     # Show initially
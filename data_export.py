@@ -1,16 +1,227 @@
+#Exporters used to save tracking results.
+#CSVExporter writes plain text rows; ColumnarExporter buffers rows into typed NumPy columns and flushes them in compressed chunks
+#to Parquet (when pyarrow is installed) or to chunked .npz files. Both share the Exporter interface, so main.py can switch between them.
+
 import csv
+import glob
+import os
+
+import numpy as np
+
+from track_index import TrackIndexBuilder
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; fall back to .npz chunks
+    pa = None
+    pq = None
+
+# Columns stored as integers (columnar) or written as integers (CSV), everything else is a float
+INTEGER_COLUMNS = ('frame', 'id', 'first_frame', 'last_frame', 'detections')
+
+class Exporter:
+    """Interface shared by all exporters."""
+
+    filename = None
+
+    @property
+    def output(self):
+        """Where the rows end up, for messages (a file name or a pattern of chunk files)."""
+        return self.filename
+
+    def write_row(self, row_data):
+        raise NotImplementedError
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class _CountingFile:
+    """File wrapper that keeps track of the number of bytes written."""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = 0
+
+    def write(self, text):
+        self.offset += len(text.encode('utf-8'))
+        return self.f.write(text)
 
-class CSVExporter:
-    def __init__(self, filename, header):
-        self.csv_file = open(filename, 'w', newline='')
-        self.csv_writer = csv.writer(self.csv_file)
+class CSVExporter(Exporter):
+    """
+    Writes rows to a CSV file.
+    :param index_column: if set (e.g. 'id'), the byte offset of every row is recorded per value of this column
+                         and saved as a track index sidecar on close (see track_index.py).
+    :param frame_column: column holding the frame number, stored in the index as each track's frame range.
+    """
+
+    def __init__(self, filename, header, index_column=None, frame_column='frame'):
+        self.filename = filename
+        self.header = list(header)
+        self._int_cols = [i for i, name in enumerate(self.header) if name in INTEGER_COLUMNS]
+        self.csv_file = open(filename, 'w', newline='', encoding='utf-8')
+        self.index = None
+        if index_column is not None:
+            self.index = TrackIndexBuilder()
+            self._index_col = self.header.index(index_column)
+            self._frame_col = self.header.index(frame_column)
+            self._counter = _CountingFile(self.csv_file)
+            self.csv_writer = csv.writer(self._counter)
+        else:
+            self.csv_writer = csv.writer(self.csv_file)
         self._write_header(header)
 
     def _write_header(self, header):
         self.csv_writer.writerow(header)
 
     def write_row(self, row_data):
+        if self.index is not None:
+            self.index.add(row_data[self._index_col], row_data[self._frame_col], self._counter.offset)
         self.csv_writer.writerow(row_data)
 
+    def _as_lists(self, rows):
+        # NumPy blocks are float arrays; write frame and id back as integers so readers and the index can parse them
+        rows = rows.tolist()
+        for row in rows:
+            for i in self._int_cols:
+                row[i] = int(row[i])
+        return rows
+
+    def write_rows(self, rows):
+        if isinstance(rows, np.ndarray):
+            rows = self._as_lists(rows.reshape(-1, len(self.header)))
+        if self.index is not None:
+            for row in rows:
+                self.write_row(row)
+        else:
+            self.csv_writer.writerows(rows)
+
     def close(self):
-        self.csv_file.close()
\ No newline at end of file
+        self.csv_file.close()
+        if self.index is not None:
+            self.index.save(self.filename)
+
+class ColumnarExporter(Exporter):
+    """
+    Buffers rows in a preallocated block and writes them as typed columns in chunks.
+    :param filename: output file; the extension is replaced by .parquet or .npz depending on the backend.
+    :param header: column names (same schemas as the CSV exports).
+    :param chunk_rows: number of rows buffered before a chunk is written.
+    :param float_dtype: dtype of the non-integer columns.
+    :param compression: Parquet codec (ignored by the .npz backend, which is always deflate-compressed).
+    :param backend: 'parquet', 'npz' or None to pick Parquet when pyarrow is available.
+    """
+
+    def __init__(self, filename, header, chunk_rows=65536, float_dtype=np.float32, compression='zstd', backend=None):
+        if backend is None:
+            backend = 'parquet' if pa is not None else 'npz'
+        if backend == 'parquet' and pa is None:
+            raise ImportError("pyarrow is required for the parquet backend")
+        self.backend = backend
+        self.header = list(header)
+        self.dtypes = [np.int64 if name in INTEGER_COLUMNS else float_dtype for name in self.header]
+        self.chunk_rows = chunk_rows
+        self.compression = compression
+        self.filename = os.path.splitext(filename)[0] + ('.parquet' if backend == 'parquet' else '.npz')
+        self.rows_written = 0
+        self._block = np.empty((chunk_rows, len(self.header)), dtype=np.float64)
+        self._n = 0
+        self._chunk_index = 0
+        self._writer = None
+        if backend == 'npz':
+            # Remove chunks left over from a previous run with the same name
+            for old in glob.glob(_chunk_pattern(self.filename)):
+                os.remove(old)
+
+    def write_row(self, row_data):
+        self._block[self._n] = row_data
+        self._n += 1
+        if self._n == self.chunk_rows:
+            self.flush()
+
+    def write_rows(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(self.header))
+        start = 0
+        while start < len(rows):
+            take = min(len(rows) - start, self.chunk_rows - self._n)
+            self._block[self._n:self._n + take] = rows[start:start + take]
+            self._n += take
+            start += take
+            if self._n == self.chunk_rows:
+                self.flush()
+
+    def flush(self):
+        if self._n == 0:
+            return
+        columns = {
+            name: self._block[:self._n, i].astype(dtype)
+            for i, (name, dtype) in enumerate(zip(self.header, self.dtypes))
+        }
+        if self.backend == 'parquet':
+            table = pa.table(columns)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.filename, table.schema, compression=self.compression)
+            self._writer.write_table(table)
+        else:
+            chunk_file = _chunk_file(self.filename, self._chunk_index)
+            np.savez_compressed(chunk_file, **columns)
+        self._chunk_index += 1
+        self.rows_written += self._n
+        self._n = 0
+
+    @property
+    def output(self):
+        # The .npz backend writes numbered chunk files next to filename (read them back with read_columns(filename))
+        return self.filename if self.backend == 'parquet' else _chunk_pattern(self.filename)
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+def _chunk_file(filename, index):
+    return f"{os.path.splitext(filename)[0]}.chunk{index:05d}.npz"
+
+def _chunk_pattern(filename):
+    return f"{os.path.splitext(filename)[0]}.chunk*.npz"
+
+def read_columns(filename):
+    """
+    Read a file written by ColumnarExporter back into a dict of NumPy columns.
+    Accepts the base name with any extension; Parquet is tried first, then .npz chunks.
+    """
+    base = os.path.splitext(filename)[0]
+    if os.path.exists(base + '.parquet'):
+        if pq is None:
+            raise ImportError("pyarrow is required to read Parquet files")
+        table = pq.read_table(base + '.parquet')
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+
+    chunk_files = sorted(glob.glob(_chunk_pattern(base)))
+    if not chunk_files:
+        raise FileNotFoundError(f"No columnar export found for '{filename}'")
+    parts = {}
+    for chunk_file in chunk_files:
+        with np.load(chunk_file) as X:
+            for name in X.files:
+                parts.setdefault(name, []).append(X[name])
+    return {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+def create_exporter(filename, header, export_format='csv', index_column=None, **kwargs):
+    """Create the exporter for 'csv' or 'columnar' output (the track index only applies to CSV)."""
+    if export_format == 'csv':
+        return CSVExporter(filename, header, index_column=index_column)
+    if export_format == 'columnar':
+        return ColumnarExporter(filename, header, **kwargs)
+    raise ValueError(f"Unknown export format: {export_format}")
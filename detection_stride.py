@@ -0,0 +1,109 @@
+#Adaptive detection stride for main.py.
+#At 60 fps a vehicle moves only a few centimetres between frames, so the detector does not need to run on every frame.
+#AdaptiveStride decides on which frames model.track runs: the stride k grows while the scene is empty and drops back
+#to every frame as soon as a new vehicle appears or the scene gets busy.
+#On the skipped frames ConstantVelocityPredictor extrapolates the boxes and keypoints of the last detection.
+
+import numpy as np
+
+class AdaptiveStride:
+    """
+    Chooses the frames the detector runs on.
+    :param max_stride: largest stride, reached while no vehicle is in view (1 disables skipping).
+    :param min_stride: stride used while the scene is busy or a new vehicle has just appeared.
+    :param busy_tracks: number of tracked vehicles from which the scene counts as busy.
+    With a few vehicles in view the stride moves towards the midpoint of min_stride and max_stride.
+    """
+
+    def __init__(self, max_stride=4, min_stride=1, busy_tracks=4):
+        self.min_stride = max(1, min_stride)
+        self.max_stride = max(self.min_stride, max_stride)
+        self.busy_tracks = busy_tracks
+        self.stride = self.min_stride
+        self.frames = 0
+        self.detections = 0
+        self._skipped = 0
+        self._known_ids = set()
+
+    def should_detect(self):
+        """Call once per frame, in order; True when the detector has to run on this frame."""
+        self.frames += 1
+        if self._skipped + 1 >= self.stride:
+            self._skipped = 0
+            self.detections += 1
+            return True
+        self._skipped += 1
+        return False
+
+    def update(self, track_ids):
+        """Adapt the stride to the result of a detection."""
+        ids = set(int(track_id) for track_id in track_ids)
+        new_vehicle = bool(ids - self._known_ids)
+        self._known_ids = ids
+
+        if new_vehicle or len(ids) >= self.busy_tracks:
+            # A new track needs a few dense detections before the tracker has locked on
+            self.stride = self.min_stride
+            return
+        if not ids:
+            target = self.max_stride
+        else:
+            target = (self.min_stride + self.max_stride) // 2
+        # One step at a time towards the target
+        if self.stride < target:
+            self.stride += 1
+        elif self.stride > target:
+            self.stride -= 1
+
+    def detection_ratio(self):
+        return self.detections / self.frames if self.frames else 1.0
+
+class ConstantVelocityPredictor:
+    """
+    Extrapolates the boxes and keypoints of the last detection with a constant image-space velocity per track,
+    estimated from the two most recent detections of the track (zero for a track seen once).
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.track_ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4))
+        self.keypoints = np.empty((0, 0, 3))
+        self.velocity = np.empty((0, 4))     # box change per frame
+
+    def update(self, frame, track_ids, boxes, keypoints):
+        """Store a detection: track ids (N,), xywh boxes (N, 4) and keypoints (N, K, 3)."""
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        velocity = np.zeros_like(boxes)
+
+        if len(self.track_ids) and len(track_ids):
+            # Match the tracks with the previous detection
+            order = np.argsort(self.track_ids)
+            pos = np.minimum(np.searchsorted(self.track_ids, track_ids, sorter=order), len(order) - 1)
+            prev = order[pos]
+            known = self.track_ids[prev] == track_ids
+            dt = frame - self.frame
+            if dt > 0:
+                velocity[known] = (boxes[known] - self.boxes[prev[known]]) / dt
+
+        self.frame = frame
+        self.track_ids = track_ids
+        self.boxes = boxes
+        self.keypoints = np.asarray(keypoints, dtype=np.float64).reshape(len(boxes), -1, 3)
+        self.velocity = velocity
+
+    def predict(self, frame):
+        """Predicted (track_ids, boxes, keypoints) at the given frame; keypoints move with their box center."""
+        if self.frame is None or not len(self.track_ids):
+            return self.track_ids, self.boxes, self.keypoints
+        dt = frame - self.frame
+        boxes = self.boxes + self.velocity * dt
+        keypoints = self.keypoints.copy()
+        visible = keypoints[..., 2] > 0
+        shift = np.broadcast_to((self.velocity[:, None, :2] * dt), keypoints[..., :2].shape)
+        keypoints[..., :2] += np.where(visible[..., None], shift, 0.0)
+        return self.track_ids, boxes, keypoints
+
+    def reset(self):
+        self.__init__()
@@ -0,0 +1,385 @@
+#Video frame sources shared by main.py and the calibration / mapping tools.
+#Three backends read the same way (read() returns the next BGR frame or None at the end):
+#  opencv - cv2.VideoCapture, optionally with hardware decoding and a decoder thread count
+#  pyav   - PyAV (libav) with frame-threaded decoding, usually the fastest for GoPro HEVC files
+#  ffmpeg - an ffmpeg subprocess writing raw BGR frames to a pipe, read straight into NumPy arrays
+#Every backend can start at a frame (or time), stop at an end frame (or time) and emit frames at a reduced size.
+#LiveSource wraps a backend opened on a live stream (RTSP URL, or '-' for a stream piped to stdin) with a grabber
+#thread that keeps only the newest frame.
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:  # PyAV is optional
+    av = None
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+class FrameSource:
+    """
+    Base class of the backends.
+    :param path: video file.
+    :param start_frame, end_frame: range of frames to read (end exclusive, None = until the end).
+    :param start_time, end_time: the same range in seconds; override start_frame / end_frame when given.
+    :param size: output (width, height); scale: output size as a fraction of the native size (kept even).
+    Attributes after opening: fps, native_size, size (output), frame_count (of the file, 0 if unknown),
+    start_frame, end_frame, position (index of the next frame) and timestamp (seconds, of the last frame read).
+    supports_out tells whether the backend decodes into the out array passed to read().
+    """
+
+    backend = None
+    supports_out = False
+
+    def __init__(self, path, start_frame=0, end_frame=None, start_time=None, end_time=None, size=None, scale=None):
+        self.path = path
+        self.fps, self.native_size, self.frame_count = self._probe()
+        if self.fps <= 0:
+            print(f"Warning: Invalid FPS ({self.fps}), defaulting to 30")
+            self.fps = 30.0
+        self.start_frame = int(round(start_time * self.fps)) if start_time is not None else int(start_frame)
+        self.end_frame = int(round(end_time * self.fps)) if end_time is not None else end_frame
+        self.size = _output_size(self.native_size, size, scale)
+        self.position = self.start_frame
+        self.timestamp = None
+
+    @property
+    def resized(self):
+        return self.size != self.native_size
+
+    def read(self, out=None):
+        """
+        Next frame as a (height, width, 3) uint8 BGR array, or None at the end of the range.
+        :param out: optional preallocated array of the output shape the frame is decoded into. Backends that cannot
+                    decode in place return a new array, so always use the returned frame.
+        """
+        if self.end_frame is not None and self.position >= self.end_frame:
+            return None
+        frame = self._read(out)
+        if frame is None:
+            return None
+        self.position += 1
+        return frame
+
+    def close(self):
+        pass
+
+    def _probe(self):
+        raise NotImplementedError
+
+    def _read(self, out=None):
+        raise NotImplementedError
+
+    def __iter__(self):
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class OpenCVSource(FrameSource):
+    """
+    cv2.VideoCapture backend.
+    :param threads: decoder threads (0 = OpenCV default).
+    :param hwaccel: ask OpenCV for any available hardware decoder.
+    """
+
+    backend = 'opencv'
+    supports_out = True
+
+    def __init__(self, path, threads=0, hwaccel=False, **kwargs):
+        params = []
+        if threads and hasattr(cv2, 'CAP_PROP_N_THREADS'):
+            params += [cv2.CAP_PROP_N_THREADS, threads]
+        if hwaccel and hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+            params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        self.cap = cv2.VideoCapture(path, cv2.CAP_ANY, params) if params else cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video '{path}'")
+        super().__init__(path, **kwargs)
+        self._native = None  # Reused full-size frame when resizing
+        if self.start_frame:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+
+    def _probe(self):
+        size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        return self.cap.get(cv2.CAP_PROP_FPS), size, max(0, int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+
+    def _read(self, out=None):
+        if self.resized:
+            success, self._native = self.cap.read(self._native)
+        else:
+            success, frame = self.cap.read(out)
+        if not success:
+            return None
+        self.timestamp = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if self.resized:
+            frame = cv2.resize(self._native, self.size, dst=out, interpolation=cv2.INTER_AREA)
+        return frame
+
+    def close(self):
+        self.cap.release()
+
+class PyAVSource(FrameSource):
+    """
+    PyAV backend with multi-threaded decoding.
+    :param threads: decoder threads (0 = one per core).
+    """
+
+    backend = 'pyav'
+
+    def __init__(self, path, threads=0, hwaccel=None, options=None, **kwargs):
+        if av is None:
+            raise ImportError("PyAV is required for the pyav backend (pip install av)")
+        if hwaccel:
+            print("The pyav backend decodes in software; use the opencv or ffmpeg backend for hardware decoding")
+        # '-' reads a stream piped to stdin; options are passed to libav (e.g. {'rtsp_transport': 'tcp'})
+        self.container = av.open(sys.stdin.buffer if path == '-' else path, options=options or {})
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = 'AUTO'  # Frame and slice threading
+        self.stream.thread_count = threads
+        super().__init__(path, **kwargs)
+        self._offset = self.stream.start_time or 0
+        self._skip_until = None
+        if self.start_frame:
+            # Seek to the keyframe before the start and decode forward to the exact frame
+            target = self._offset + int(round(self.start_frame / self.fps / self.stream.time_base))
+            self.container.seek(target, stream=self.stream, backward=True)
+            self._skip_until = target - 0.5 / self.fps / self.stream.time_base
+        self._frames = self.container.decode(self.stream)
+
+    def _probe(self):
+        rate = self.stream.average_rate or self.stream.guessed_rate
+        size = (self.stream.codec_context.width, self.stream.codec_context.height)
+        return float(rate) if rate else 0.0, size, self.stream.frames or 0
+
+    def _read(self, out=None):
+        # libav hands out its own arrays, so out is not used
+        for frame in self._frames:
+            if self._skip_until is not None and frame.pts is not None and frame.pts < self._skip_until:
+                continue
+            self._skip_until = None
+            if frame.pts is not None:
+                self.timestamp = float((frame.pts - self._offset) * self.stream.time_base)
+            # Scaling happens in libswscale during the colour conversion, so no extra pass over the frame
+            return frame.reformat(width=self.size[0], height=self.size[1], format='bgr24').to_ndarray()
+        return None
+
+    def close(self):
+        self.container.close()
+
+class FFmpegSource(FrameSource):
+    """
+    ffmpeg subprocess backend: frames are decoded (and scaled) by ffmpeg and read from its stdout
+    directly into NumPy arrays with readinto, without intermediate bytes objects.
+    :param threads: decoder threads (0 = ffmpeg default).
+    :param hwaccel: value of ffmpeg's -hwaccel option (e.g. 'auto', 'cuda'), None for software decoding.
+    """
+
+    backend = 'ffmpeg'
+    supports_out = True
+
+    def __init__(self, path, threads=0, hwaccel=None, ffmpeg='ffmpeg', ffprobe='ffprobe', **kwargs):
+        if path == '-':
+            raise ValueError("The ffmpeg backend cannot read stdin; use the pyav backend")
+        self.ffmpeg = shutil.which(ffmpeg)
+        self.ffprobe = shutil.which(ffprobe)
+        if self.ffmpeg is None or self.ffprobe is None:
+            raise FileNotFoundError("ffmpeg and ffprobe are required for the ffmpeg backend")
+        super().__init__(path, **kwargs)
+
+        cmd = [self.ffmpeg, '-v', 'error', '-nostdin']
+        if hwaccel:
+            cmd += ['-hwaccel', hwaccel]
+        if threads:
+            cmd += ['-threads', str(threads)]
+        if self.start_frame:
+            cmd += ['-ss', f"{self.start_frame / self.fps:.6f}"]
+        cmd += ['-i', path]
+        if self.end_frame is not None:
+            cmd += ['-frames:v', str(max(0, self.end_frame - self.start_frame))]
+        if self.resized:
+            cmd += ['-vf', f"scale={self.size[0]}:{self.size[1]}:flags=area"]
+        cmd += ['-f', 'rawvideo', '-pix_fmt', 'bgr24', '-']
+        self.frame_bytes = self.size[0] * self.size[1] * 3
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=self.frame_bytes)
+
+    def _probe(self):
+        output = subprocess.check_output([
+            self.ffprobe, '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'stream=width,height,avg_frame_rate,nb_frames', '-of', 'json', self.path
+        ])
+        stream = json.loads(output)['streams'][0]
+        num, _, den = stream.get('avg_frame_rate', '0/1').partition('/')
+        fps = float(num) / float(den) if den and float(den) else 0.0
+        frames = stream.get('nb_frames', '0')
+        return fps, (int(stream['width']), int(stream['height'])), int(frames) if frames.isdigit() else 0
+
+    def _read(self, out=None):
+        frame = out if out is not None else np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+        view = memoryview(frame).cast('B')
+        filled = 0
+        while filled < self.frame_bytes:
+            n = self.process.stdout.readinto(view[filled:])
+            if not n:
+                return None  # End of stream (a partial frame is dropped)
+            filled += n
+        self.timestamp = self.position / self.fps
+        return frame
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.stdout.close()
+        self.process.wait()
+
+class LiveSource:
+    """
+    Latest-frame-wins reader for live streams.
+    A grabber thread reads the stream as fast as it delivers frames and keeps only the newest one, so a slow
+    consumer always gets the most recent frame instead of an ever older backlog. Frames overwritten before
+    they were read are counted in frames_dropped.
+    After read(), timestamp is the source time of the frame (s) and arrival its time.monotonic() grab time.
+    Streams without increasing timestamps fall back to the arrival clock.
+    :param source: FrameSource opened on the stream.
+    :param pool: optional BufferPool the grabber decodes into; dropped frames are returned to it.
+    """
+
+    supports_out = False
+
+    def __init__(self, source, pool=None):
+        self.source = source
+        self.backend = source.backend
+        self.fps = source.fps
+        self.size = source.size
+        self.start_frame = 0
+        self.pool = pool
+        self.frames_grabbed = 0
+        self.frames_dropped = 0
+        self.timestamp = None
+        self.arrival = None
+        self._latest = None        # (frame, source timestamp, arrival)
+        self._ended = False
+        self._closed = False
+        self._error = None
+        self._arrival_offset = None  # Set once the source timestamps turned out to be unusable
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._grab, name='grabber', daemon=True)
+        self._thread.start()
+
+    def _grab(self):
+        try:
+            while not self._closed:
+                frame = read_pooled(self.source, self.pool)
+                arrival = time.monotonic()
+                if frame is None:
+                    break
+                with self._cond:
+                    if self._latest is not None:
+                        self.frames_dropped += 1
+                        if self.pool is not None:
+                            self.pool.release(self._latest[0])
+                    self._latest = (frame, self.source.timestamp, arrival)
+                    self.frames_grabbed += 1
+                    self._cond.notify()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._ended = True
+                self._cond.notify_all()
+
+    def read(self, out=None):
+        """Newest frame not returned yet (waits for the next one), or None when the stream has ended."""
+        with self._cond:
+            while self._latest is None and not self._ended:
+                self._cond.wait()
+            if self._latest is None:
+                if self._error is not None:
+                    raise self._error
+                return None
+            frame, timestamp, arrival = self._latest
+            self._latest = None
+
+        if self._arrival_offset is None and (
+                timestamp is None or (self.timestamp is not None and timestamp <= self.timestamp)):
+            print("Stream timestamps are missing or not increasing; using the arrival time of the frames")
+            self._arrival_offset = (self.timestamp or 0.0) - (self.arrival if self.arrival is not None else arrival)
+        if self._arrival_offset is not None:
+            timestamp = arrival + self._arrival_offset
+        self.timestamp = timestamp
+        self.arrival = arrival
+        return frame
+
+    def close(self):
+        self._closed = True
+        self._thread.join(timeout=2.0)  # The grabber stops after its current read
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+BACKENDS = {'opencv': OpenCVSource, 'pyav': PyAVSource, 'ffmpeg': FFmpegSource}
+
+def open_source(path, backend='auto', live=False, pool=None, **kwargs):
+    """
+    Open a video with the given backend ('auto' picks PyAV when installed, OpenCV otherwise).
+    Keyword arguments are passed to the backend (start_frame, end_frame, start_time, end_time, size, scale,
+    threads, hwaccel).
+    :param live: wrap the source in a LiveSource (latest-frame-wins grabber); pool is used by its grabber.
+    """
+    if backend == 'auto':
+        backend = 'pyav' if av is not None or path == '-' else 'opencv'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown frame source backend '{backend}', expected one of {sorted(BACKENDS)}")
+    source = BACKENDS[backend](path, **kwargs)
+    return LiveSource(source, pool) if live else source
+
+def read_pooled(source, pool=None):
+    """
+    Next frame of source, decoded into a buffer of pool when the backend can decode in place.
+    The buffer goes back to the pool when the read fails or the backend returned another array.
+    """
+    if pool is None or not source.supports_out:
+        return source.read()
+    out = pool.acquire((source.size[1], source.size[0], 3))
+    frame = source.read(out)
+    if frame is not out:
+        pool.release(out)
+    return frame
+
+def is_image_file(path):
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+def read_frame_at(path, frame_index=0, backend='auto', **kwargs):
+    """Single frame of a video (or the image itself if path is an image file); None if it cannot be read."""
+    if is_image_file(path):
+        return cv2.imread(path)
+    with open_source(path, backend, start_frame=frame_index, **kwargs) as source:
+        return source.read()
+
+def _output_size(native_size, size=None, scale=None):
+    if size is not None:
+        return tuple(int(v) for v in size)
+    if scale is not None and scale != 1:
+        # Even dimensions keep chroma-subsampled scalers and encoders happy
+        return tuple(max(2, int(round(v * scale / 2)) * 2) for v in native_size)
+    return tuple(native_size)
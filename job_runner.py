@@ -0,0 +1,162 @@
+#Runs main.py on many videos / cameras at once.
+#A manifest lists the jobs (video, calibration .npz, coordinate mapping JSON and optionally the camera position);
+#jobs are spread over a process pool where every worker loads the YOLO model once and reuses it for all its jobs.
+#Each job writes its outputs (tracking_data, world_coordinates, timings...) to its own folder, and a summary of the
+#throughput of every job is printed and saved to jobs_summary.csv.
+#
+#Manifest (JSON):
+#{
+#    "defaults": {"calibration": "gopro_calibration_fisheye.npz", "args": ["--export-format", "columnar"]},
+#    "jobs": [
+#        {"name": "2030", "video": "GX010381.MP4", "mapping": "coordinate_mapping_2030.json"},
+#        {"name": "4050", "video": "GX010382.MP4", "mapping": "coordinate_mapping_4050.json",
+#         "camera_position": [2.04, -3.21, 3.13]}
+#    ]
+#}
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config import CALIBRATION_FILE
+from coordinate_transformer import load_camera_position
+
+SUMMARY_HEADER = ['name', 'status', 'frames', 'detections', 'elapsed_s', 'fps', 'output_dir', 'error']
+
+# Model of the current worker process, loaded once by _init_worker
+_model = None
+
+def load_manifest(path):
+    """Read the manifest and return the list of jobs with the defaults applied."""
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    defaults = manifest.get('defaults', {})
+    base = os.path.dirname(os.path.abspath(path))
+
+    jobs = []
+    for i, entry in enumerate(manifest['jobs']):
+        job = {'calibration': CALIBRATION_FILE}
+        job.update(defaults)
+        job.update(entry)
+        # Extra main.py arguments of the job are appended to the default ones
+        job['args'] = list(defaults.get('args', [])) + list(entry.get('args', []))
+        if 'video' not in job or 'mapping' not in job:
+            raise ValueError(f"Job {i} of {path} needs at least 'video' and 'mapping'")
+        job.setdefault('name', f"{i:03d}_{os.path.splitext(os.path.basename(job['video']))[0]}")
+        # Paths in the manifest are relative to the manifest
+        for key in ('video', 'calibration', 'mapping'):
+            job[key] = os.path.join(base, job[key])
+        jobs.append(job)
+
+    names = [job['name'] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("Job names must be unique (they are used as output folder names)")
+    return jobs
+
+def _init_worker(weights, device):
+    global _model
+    import main as tracking  # Imported in the workers only (loads torch / ultralytics)
+    _model = tracking.load_model(weights, device)
+
+def run_job(job, output_root, weights='best.pt', device='cuda'):
+    """Process one job; returns a row of the summary report."""
+    import main as tracking
+
+    output_dir = os.path.join(output_root, job['name'])
+    os.makedirs(output_dir, exist_ok=True)
+    summary = {'name': job['name'], 'status': 'ok', 'frames': 0, 'detections': 0, 'elapsed_s': 0.0, 'fps': 0.0,
+               'output_dir': output_dir, 'error': ''}
+
+    camera_position = job.get('camera_position')
+    if camera_position is None:
+        position = load_camera_position(job['mapping'])
+        camera_position = None if position is None else position.tolist()
+
+    # Record what the outputs were produced from; calculation_model.py needs the camera position
+    with open(os.path.join(output_dir, 'job.json'), 'w') as f:
+        record = {key: job[key] for key in ('name', 'video', 'calibration', 'mapping', 'args')}
+        record['camera_position'] = camera_position
+        json.dump(record, f, indent=4)
+
+    args = tracking.parse_args([
+        '--video', job['video'],
+        '--calibration', job['calibration'],
+        '--mapping', job['mapping'],
+        '--output-dir', output_dir,
+        '--model', weights,
+        '--device', device,
+    ] + job['args'] + ['--headless'])  # Worker processes cannot open windows
+
+    try:
+        result = tracking.run(args, model=_model)
+    except Exception as e:
+        traceback.print_exc()
+        summary.update(status='failed', error=f"{type(e).__name__}: {e}")
+        return summary
+    if result is None:
+        summary.update(status='failed', error='calibration could not be loaded')
+        return summary
+    summary.update(result)
+    return summary
+
+def run_jobs(jobs, output_root, workers=1, weights='best.pt', device='cuda'):
+    """Run all jobs over a process pool and return the summary rows in manifest order."""
+    os.makedirs(output_root, exist_ok=True)
+    # Spawned workers: CUDA cannot be used in forked processes
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context,
+                             initializer=_init_worker, initargs=(weights, device)) as pool:
+        futures = {pool.submit(run_job, job, output_root, weights, device): job['name'] for job in jobs}
+        for future in as_completed(futures):
+            summary = future.result()
+            results[futures[future]] = summary
+            print(f"[{summary['name']}] {summary['status']}: {summary['frames']} frames, {summary['fps']:.1f} FPS")
+    return [results[job['name']] for job in jobs]
+
+def write_summary(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def print_summary(rows, wall_time):
+    print(f"{'job':<20} {'status':<7} {'frames':>8} {'time (s)':>9} {'FPS':>7}")
+    for row in rows:
+        print(f"{row['name']:<20} {row['status']:<7} {row['frames']:>8} {row['elapsed_s']:9.1f} {row['fps']:7.1f}")
+    total = sum(row['frames'] for row in rows)
+    print(f"Total: {total} frames in {wall_time:.1f} s ({total / wall_time if wall_time > 0 else 0:.1f} FPS overall)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Process several videos / cameras in parallel.")
+    parser.add_argument("manifest", help="JSON manifest of the jobs")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Worker processes; each one loads its own copy of the model")
+    parser.add_argument("--output-root", default="jobs", help="Every job writes to <output-root>/<name>/")
+    parser.add_argument("--model", default="best.pt", help="YOLOv8 weights")
+    parser.add_argument("--device", default="cuda", help="Device the models run on")
+    parser.add_argument("--only", action="append", help="Run only the job with this name (repeatable)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    jobs = load_manifest(args.manifest)
+    if args.only:
+        jobs = [job for job in jobs if job['name'] in args.only]
+    print(f"Running {len(jobs)} jobs on {args.workers} workers")
+
+    start = time.perf_counter()
+    rows = run_jobs(jobs, args.output_root, args.workers, args.model, args.device)
+    wall_time = time.perf_counter() - start
+
+    print_summary(rows, wall_time)
+    summary_file = os.path.join(args.output_root, 'jobs_summary.csv')
+    write_summary(rows, summary_file)
+    print(f"Summary saved to {summary_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# Kalman-filtered world-space track state
+import numpy as np
+
+class KalmanTracker:
+    """
+    Constant-velocity Kalman filter over all tracks at once, a drop-in replacement of SpeedTracker.
+    Every track owns one slot of a (max_tracks, 4) state array [x, y, vx, vy] (meters, m/s) with its (4, 4)
+    covariance, and the predict / update steps of all tracks seen in a frame are a few batched NumPy operations.
+    The time step of every track is the time since its own last update (frame timestamp when given, otherwise
+    frame_count / fps), so skipped and dropped frames are handled without special cases.
+    Smoothed positions, velocities and speeds with their uncertainty are available every frame through estimates(),
+    so no averaging buffer and no offline outlier pass are needed to get stable speeds.
+    :param process_noise: spectral density of the (white noise) acceleration, in m^2/s^3; larger values follow
+                          speed changes faster, smaller values smooth more.
+    :param measurement_noise: standard deviation of the homography-mapped positions, in meters.
+    :param initial_speed_std: standard deviation of the velocity of a new track, in m/s.
+    :param max_tracks: initial number of slots (the arrays grow if more tracks are alive at once).
+    :param max_missed_frames: evict a track after this many frames without an update (None to never evict).
+    """
+
+    def __init__(self, process_noise=2.0, measurement_noise=0.3, initial_speed_std=15.0, max_tracks=64,
+                 max_missed_frames=60):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.initial_speed_std = initial_speed_std
+        self.max_missed_frames = max_missed_frames
+        self.slots = {}            # track_id -> slot index
+        self._free = []
+        self._allocate(max_tracks)
+
+    def _allocate(self, capacity):
+        self.state = np.zeros((capacity, 4))                      # x, y, vx, vy
+        self.covariance = np.zeros((capacity, 4, 4))
+        self.times = np.zeros(capacity)                           # time of the last update (s)
+        self.initialized = np.zeros(capacity, dtype=bool)
+        self.last_seen = np.zeros(capacity, dtype=np.int64)       # frame count of the last update
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def _grow(self):
+        old = (self.state, self.covariance, self.times, self.initialized, self.last_seen)
+        capacity = len(self.times)
+        self._allocate(capacity * 2)
+        new = (self.state, self.covariance, self.times, self.initialized, self.last_seen)
+        for dst, src in zip(new, old):
+            dst[:capacity] = src
+        self._free = list(range(2 * capacity - 1, capacity - 1, -1))
+
+    def _slot(self, track_id):
+        slot = self.slots.get(track_id)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self.slots[track_id] = slot
+        return slot
+
+    def remove(self, track_id):
+        """Forget a track and free its slot."""
+        slot = self.slots.pop(track_id, None)
+        if slot is None:
+            return
+        self.initialized[slot] = False
+        self._free.append(slot)
+
+    def evict_stale(self, frame_count):
+        """Remove tracks not updated within max_missed_frames; returns their ids."""
+        if self.max_missed_frames is None or not self.slots:
+            return []
+        stale = [track_id for track_id, slot in self.slots.items()
+                 if frame_count - self.last_seen[slot] > self.max_missed_frames]
+        for track_id in stale:
+            self.remove(track_id)
+        return stale
+
+    def update_speed(self, track_id, world_coord, frame_count, fps, timestamp=None):
+        return self.get_speeds([track_id], [world_coord], frame_count, fps, timestamp)[0]
+
+    def get_speeds(self, track_ids, world_coords, frame_count, fps, timestamp=None):
+        """
+        Filter the positions of all tracks seen in this frame and return their speeds (km/h) in the same order.
+        Track ids within one call are expected to be unique, as produced by the tracker.
+        :param timestamp: time of the frame in seconds (from the video source); frame_count / fps if None.
+        """
+        self.evict_stale(frame_count)
+        if len(track_ids) == 0:
+            return []
+        if timestamp is None:
+            if fps <= 0:
+                return [0.0] * len(track_ids)
+            timestamp = frame_count / fps
+
+        all_slots = np.array([self._slot(track_id) for track_id in track_ids], dtype=np.int64)
+        coords = np.asarray(world_coords, dtype=np.float64).reshape(-1, 2)
+        self.last_seen[all_slots] = frame_count
+
+        # Positions that could not be mapped (NaN) keep the previous estimate
+        finite = np.isfinite(coords).all(axis=1)
+        slots, coords = all_slots[finite], coords[finite]
+
+        new = ~self.initialized[slots]
+        if new.any():
+            self._initialize(slots[new], coords[new], timestamp)
+        known = ~new & (timestamp > self.times[slots])
+        if known.any():
+            self._predict(slots[known], timestamp - self.times[slots[known]])
+            self._update(slots[known], coords[known])
+            self.times[slots[known]] = timestamp
+
+        return self._speeds(all_slots).tolist()
+
+    def predict(self, track_ids, frame_count, fps, timestamp=None):
+        """
+        Advance the given tracks to this frame without a measurement (frames the detector skipped) and return their
+        speeds (km/h); positions move with the estimated velocity and the uncertainty grows. Unknown tracks get 0.
+        """
+        if timestamp is None:
+            if fps <= 0:
+                return self.current_speeds(track_ids)
+            timestamp = frame_count / fps
+        slots = np.array([self.slots.get(track_id, -1) for track_id in track_ids], dtype=np.int64)
+        slots = slots[slots >= 0]
+        slots = slots[self.initialized[slots] & (timestamp > self.times[slots])]
+        if len(slots):
+            self._predict(slots, timestamp - self.times[slots])
+            self.times[slots] = timestamp
+        return self.current_speeds(track_ids)
+
+    def _initialize(self, slots, coords, timestamp):
+        self.state[slots, :2] = coords
+        self.state[slots, 2:] = 0.0
+        self.covariance[slots] = np.diag([self.measurement_noise ** 2] * 2 + [self.initial_speed_std ** 2] * 2)
+        self.times[slots] = timestamp
+        self.initialized[slots] = True
+
+    def _predict(self, slots, dt):
+        # x' = F x with F = [[I, dt I], [0, I]], per track dt
+        x = self.state[slots]
+        x[:, :2] += x[:, 2:] * dt[:, None]
+        self.state[slots] = x
+
+        # P' = F P F^T + Q, written out block-wise for the (position, velocity) blocks
+        P = self.covariance[slots]
+        t = dt[:, None, None]
+        pp, pv, vp, vv = P[:, :2, :2], P[:, :2, 2:], P[:, 2:, :2], P[:, 2:, 2:]
+        new_pp = pp + t * (pv + vp) + t * t * vv
+        new_pv = pv + t * vv
+        # Discretized white-noise acceleration
+        q = self.process_noise
+        eye = np.eye(2)
+        P[:, :2, :2] = new_pp + q * t ** 3 / 3 * eye
+        P[:, :2, 2:] = new_pv + q * t ** 2 / 2 * eye
+        P[:, 2:, :2] = np.swapaxes(P[:, :2, 2:], 1, 2)
+        P[:, 2:, 2:] = vv + q * t * eye
+        self.covariance[slots] = P
+
+    def _update(self, slots, coords):
+        # Position measurement: H = [I, 0]
+        x = self.state[slots]
+        P = self.covariance[slots]
+        S = P[:, :2, :2] + self.measurement_noise ** 2 * np.eye(2)
+        gain = P[:, :, :2] @ np.linalg.inv(S)                    # (n, 4, 2)
+        innovation = coords - x[:, :2]
+        x += (gain @ innovation[:, :, None])[:, :, 0]
+        P = P - gain @ P[:, :2, :]
+        self.state[slots] = x
+        self.covariance[slots] = 0.5 * (P + np.swapaxes(P, 1, 2))  # keep it symmetric despite rounding
+
+    def current_speeds(self, track_ids):
+        """Current speed estimates (km/h) of the given tracks without adding a position; unknown tracks get 0."""
+        slots = np.array([self.slots.get(track_id, -1) for track_id in track_ids], dtype=np.int64)
+        speeds = np.zeros(len(slots))
+        known = slots >= 0
+        speeds[known] = self._speeds(slots[known])
+        return speeds.tolist()
+
+    def estimates(self, track_ids):
+        """
+        Filtered state of the given tracks after their last update.
+        :return: positions (N, 2) in meters, velocities (N, 2) in m/s, speeds (N,) and speed standard deviations (N,)
+                 in km/h; NaN for unknown tracks.
+        """
+        slots = np.array([self.slots.get(track_id, -1) for track_id in track_ids], dtype=np.int64)
+        known = slots >= 0
+        known[known] = self.initialized[slots[known]]
+        positions = np.full((len(slots), 2), np.nan)
+        velocities = np.full((len(slots), 2), np.nan)
+        speeds = np.full(len(slots), np.nan)
+        speed_std = np.full(len(slots), np.nan)
+        s = slots[known]
+        positions[known] = self.state[s, :2]
+        velocities[known] = self.state[s, 2:]
+        speeds[known] = self._speeds(s)
+        speed_std[known] = self._speed_std(s)
+        return positions, velocities, speeds, speed_std
+
+    def _speeds(self, slots):
+        v = self.state[slots, 2:]
+        return np.where(self.initialized[slots], np.hypot(v[:, 0], v[:, 1]) * 3.6, 0.0)  # m/s -> km/h
+
+    def _speed_std(self, slots):
+        # First-order propagation of the velocity covariance to the speed |v|
+        v = self.state[slots, 2:]
+        cov = self.covariance[slots, 2:, 2:]
+        norm = np.hypot(v[:, 0], v[:, 1])
+        direction = np.where(norm[:, None] > 1e-6, v / np.maximum(norm, 1e-6)[:, None], np.sqrt(0.5))
+        var = np.einsum('ni,nij,nj->n', direction, cov, direction)
+        return np.sqrt(np.maximum(var, 0.0)) * 3.6
@@ -1,132 +1,478 @@
+import argparse
+import os
+import time
+
 import cv2
 import numpy as np
 from ultralytics import YOLO
-from preprocess import preprocess_frame, load_calibration_data, rescale_coordinates
-from config import VIDEO_PATH, RECOGNITION_SIZE, DISPLAY_SIZE, MAPPING_FILE
-from data_export import CSVExporter
+from preprocess import (
+    preprocess_frame, load_calibration_data, rescale_boxes, rescale_keypoints, Undistorter, remap_cache_file,
+    RegionOfInterest
+)
+from config import VIDEO_PATH, RECOGNITION_SIZE, DISPLAY_SIZE, MAPPING_FILE, CALIBRATION_FILE, CACHE_REMAP_TABLES
+from data_export import create_exporter
 from coordinate_transformer import (
     CoordinateTransformer,
     calculate_real_world_coordinates,
-    calculate_real_box_width  # <-- NEW IMPORT
+    calculate_real_box_widths
 )
 from speed_utils import SpeedTracker
+from kalman import KalmanTracker
+from online_filter import OnlineTrackFilter
+from track_registry import TrackRegistry, SUMMARY_HEADER
+from car_tracking import export_car_records
+from detection_stride import AdaptiveStride, ConstantVelocityPredictor
 from visualization_utils import draw_annotations
+from pipeline import FramePipeline
+from frame_source import open_source, read_pooled, BACKENDS
+from buffer_pool import BufferPool
+from profiling import StageProfiler, ThreadedCProfile
 
-def main():
+# Stages timed by the profiler, in the column order of the per-frame timing CSV
+STAGES = ('decode', 'undistort', 'track', 'transfer', 'rescale', 'homography', 'speed', 'rows', 'predict',
+          'filter', 'evict', 'registry', 'export', 'draw', 'display')
+
+def _car_frames(value):
+    count = int(value)
+    if count < 0:
+        raise argparse.ArgumentTypeError("must be 0 (all frames) or a positive number of frames")
+    return count
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Track vehicles and estimate their speeds.")
+    parser.add_argument("--video", default=VIDEO_PATH, help="Input video")
+    parser.add_argument("--calibration", default=CALIBRATION_FILE, help="Fisheye calibration .npz")
+    parser.add_argument("--mapping", default=MAPPING_FILE, help="Coordinate mapping JSON")
+    parser.add_argument("--backend", choices=("auto",) + tuple(BACKENDS), default="auto",
+                        help="Video decoding backend (auto: PyAV if installed, otherwise OpenCV)")
+    parser.add_argument("--decode-threads", type=int, default=0, help="Decoder threads (0 = backend default)")
+    parser.add_argument("--hwaccel", nargs='?', const="auto",
+                        help="Hardware decoding (opencv: any available; ffmpeg: -hwaccel value, default auto)")
+    parser.add_argument("--decode-scale", type=float,
+                        help="Decode frames at this fraction of the native resolution (e.g. 0.5 for 4K input)")
+    parser.add_argument("--start-frame", type=int, default=0, help="First frame to process")
+    parser.add_argument("--end-frame", type=int, help="Stop before this frame")
+    parser.add_argument("--start-time", type=float, help="Start at this time (s); overrides --start-frame")
+    parser.add_argument("--end-time", type=float, help="Stop at this time (s); overrides --end-frame")
+    parser.add_argument("--live", action="store_true",
+                        help="--video is a live stream (RTSP URL, or '-' for a stream piped to stdin): frames are "
+                             "grabbed latest-frame-wins and speeds use the stream timestamps")
+    parser.add_argument("--latency-budget", type=float, default=0.5,
+                        help="With --live, drop frames older than this many seconds before processing them")
+    parser.add_argument("--output-dir", default=".",
+                        help="Folder for tracking_data / world_coordinates and the other relative output paths")
+    parser.add_argument("--model", default="best.pt", help="YOLOv8 weights")
+    parser.add_argument("--device", default="cuda", help="Device the model runs on")
+    parser.add_argument("--workers", type=int, default=2, help="Number of preprocessing threads")
+    parser.add_argument("--queue-size", type=int, default=8, help="Capacity of each pipeline queue")
+    parser.add_argument("--stats", action="store_true", help="Print per-stage pipeline statistics at the end")
+    parser.add_argument("--no-buffer-pool", action="store_true",
+                        help="Allocate new frame arrays for every frame instead of recycling them")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without a GUI: no display resize, annotations or cv2.imshow")
+    parser.add_argument("--video-out", help="In headless mode, write annotated frames to this MP4 file")
+    parser.add_argument("--video-every", type=int, default=1,
+                        help="In headless mode, write every N-th frame to --video-out (default: 1)")
+    parser.add_argument("--export-format", choices=("csv", "columnar"), default="csv",
+                        help="csv, or columnar (Parquet, or chunked .npz when pyarrow is missing)")
+    parser.add_argument("--report-every", type=float, default=0,
+                        help="Print per-stage latency percentiles every N seconds (0 = only at the end with --stats)")
+    parser.add_argument("--timings-out", help="Write per-frame stage timings (ms) to this CSV file")
+    parser.add_argument("--timings-json", help="Write the final per-stage latency summary to this JSON file")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Run under cProfile (all pipeline threads) and save the statistics to FILE")
+    parser.add_argument("--max-stride", type=int, default=1,
+                        help="Adaptive detection: run the detector at most every N-th frame while the scene is "
+                             "empty and predict the boxes in between (default 1: detect every frame); on skipped "
+                             "frames the Kalman speed model is advanced, the average speed keeps its last value")
+    parser.add_argument("--roi", action="store_true",
+                        help="Only send the mapped road area (image_points of the mapping plus a margin) to detection")
+    parser.add_argument("--roi-margin", type=float, default=0.2,
+                        help="Margin added around the mapped area on every side, as a fraction of its size")
+    parser.add_argument("--speed-model", choices=("average", "kalman"), default="average",
+                        help="average: mean speed over the last positions; kalman: constant-velocity Kalman filter "
+                             "(adds filtered positions, velocities and the speed uncertainty to world_coordinates)")
+    parser.add_argument("--track-timeout", type=int, default=60,
+                        help="A vehicle's track ends after this many frames without a detection: its summary is "
+                             "written to vehicles.csv and its state is freed")
+    parser.add_argument("--car-dir",
+                        help="Write car_<id>_transformed.csv to this folder as soon as a vehicle's track ends "
+                             "(outliers removed and frames selected while tracking, like car_tracking.py)")
+    parser.add_argument("--car-frames", type=_car_frames, default=0,
+                        help="With --car-dir, number of frames kept per vehicle (0 for all)")
+    parser.add_argument("--outlier-std", type=float, default=2.0,
+                        help="With --car-dir, reject positions whose motion is more than this many standard "
+                             "deviations off the vehicle's running motion statistics")
+    parser.add_argument("--busy-tracks", type=int, default=4,
+                        help="With --max-stride, detect every frame once this many vehicles are tracked")
+    return parser.parse_args(argv)
+
+def load_model(weights="best.pt", device="cuda"):
     # Load the YOLOv8 model
-    model = YOLO("best.pt")
-    model.to("cuda")
+    model = YOLO(weights)
+    model.to(device)
     print(f"Using device: {model.device}")
-    
+    return model
+
+def run(args, model=None):
+    """
+    Track one video with the options parsed by parse_args.
+    :param model: already loaded YOLO model to reuse (e.g. across the jobs of job_runner.py); loaded from args if None.
+    :return: dict with the number of frames processed, the elapsed time and the throughput, or None on failure.
+    """
+    if model is None:
+        model = load_model(args.model, args.device)
+    elif getattr(model, 'predictor', None) is not None:
+        # A fresh predictor also creates fresh trackers, so track ids do not carry over from the previous video
+        model.predictor = None
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    def output_path(path):
+        return path and os.path.join(args.output_dir, path)
+
     # Load calibration data
-    K, D, DIM = load_calibration_data()
+    K, D, DIM = load_calibration_data(args.calibration)
     if K is None or D is None or DIM is None:
         print("Failed to load calibration data. Exiting.")
-        return
+        return None
+
+    # Build the undistortion maps once and reuse them for every frame
+    undistorter = Undistorter(
+        K, D, DIM, cache_file=remap_cache_file(args.calibration) if CACHE_REMAP_TABLES else None
+    )
 
     # Initialize coordinate transformer and speed tracker
-    transformer = CoordinateTransformer(MAPPING_FILE)
-    speed_tracker = SpeedTracker()
+    transformer = CoordinateTransformer(args.mapping)
+    kalman = args.speed_model == 'kalman'
+    # Tracks are ended by the track registry below
+    speed_tracker = KalmanTracker(max_missed_frames=None) if kalman else SpeedTracker(max_missed_frames=None)
 
-    # Open the video file
-    cap = cv2.VideoCapture(VIDEO_PATH)
+    # Region of interest: the surveyed road area, in the display-size view the mapping points were picked in
+    roi = None
+    if args.roi:
+        if len(transformer.image_points) == 0:
+            print(f"No image_points in '{args.mapping}', running detection on the whole frame.")
+        else:
+            roi = RegionOfInterest.from_points(transformer.image_points, DISPLAY_SIZE, args.roi_margin)
+            print(f"Detecting in {roi}")
+
+    # Per-vehicle files written while tracking, when each track ends
+    online_filter = None
+    if args.car_dir:
+        car_dir = output_path(args.car_dir)
+        os.makedirs(car_dir, exist_ok=True)
+        online_filter = OnlineTrackFilter(
+            args.car_frames, args.outlier_std,
+            on_finished=lambda track_id, records: export_car_records(records, track_id, car_dir),
+            max_missed_frames=None
+        )
+
+    # Adaptive detection stride; skipped frames get constant-velocity predictions of the last detection
+    stride = AdaptiveStride(args.max_stride, busy_tracks=args.busy_tracks)
+    predictor = ConstantVelocityPredictor()
+
+    # Decoded, undistorted and display frames are recycled: every stage hands its frame back to the pool
+    # once the next stage has consumed it, so no large arrays are allocated in the steady state
+    pool = None if args.no_buffer_pool else BufferPool()
+
+    # Open the video file (or live stream)
+    source_options = {
+        'start_frame': args.start_frame, 'end_frame': args.end_frame,
+        'start_time': args.start_time, 'end_time': args.end_time,
+        'scale': args.decode_scale, 'threads': args.decode_threads,
+    }
+    if args.hwaccel:
+        source_options['hwaccel'] = args.hwaccel if args.backend == 'ffmpeg' else True
+    source = open_source(args.video, args.backend, live=args.live, pool=pool, **source_options)
+    print(f"Decoding {args.video} with {source.backend} at {source.size[0]}x{source.size[1]}")
 
     # Get video FPS
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if fps <= 0:
-        print(f"Warning: Invalid FPS ({fps}), defaulting to 30")
-        fps = 30.0
+    fps = source.fps
 
     # Modify the CSV headers: drop 'height' and add 'real_width'
     tracking_header = ['frame', 'id', 'x', 'y', 'width', 'real_width']
     for i in range(10):  # 10 keypoints, if needed
         tracking_header.extend([f'kp{i}_x', f'kp{i}_y', f'kp{i}_conf'])
-    tracking_exporter = CSVExporter('tracking_data.csv', tracking_header)
+    tracking_exporter = create_exporter(output_path('tracking_data.csv'), tracking_header, args.export_format,
+                                        index_column='id')
 
     world_coord_header = ['frame', 'id', 'world_x', 'world_y', 'speed_kmh']
-    world_coord_exporter = CSVExporter('world_coordinates.csv', world_coord_header)
+    if kalman:
+        world_coord_header += ['speed_std_kmh', 'filtered_x', 'filtered_y', 'velocity_x', 'velocity_y']
+    world_coord_exporter = create_exporter(output_path('world_coordinates.csv'), world_coord_header,
+                                           args.export_format)
 
-    frame_count = 0
+    # One summary row per vehicle, written when its track ends
+    vehicle_exporter = create_exporter(output_path('vehicles.csv'), SUMMARY_HEADER, args.export_format)
 
-    while cap.isOpened():
-        success, frame = cap.read()
-        if not success:
-            break
+    def write_vehicle_summary(track_id, summary):
+        vehicle_exporter.write_rows([[summary[name] for name in SUMMARY_HEADER]])
 
-        frame_count += 1
-        
-        # Preprocess the frame
-        recognition_frame, display_frame = preprocess_frame(
-            frame, K, D, DIM, RECOGNITION_SIZE, DISPLAY_SIZE
-        )
+    # Ending a track frees its state everywhere and flushes its results
+    registry = TrackRegistry(args.track_timeout, fps, on_finished=[
+        lambda track_id, summary: speed_tracker.remove(track_id),
+        write_vehicle_summary
+    ])
+    if online_filter is not None:
+        registry.add_callback(lambda track_id, summary: online_filter.finish(track_id))
+
+    # In headless mode the display-size frame is only produced for frames that go to the video file
+    video_writer = None
+    video_every = max(1, args.video_every)
+    if args.headless and args.video_out:
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        video_writer = cv2.VideoWriter(output_path(args.video_out), fourcc, fps / video_every, DISPLAY_SIZE)
+
+    def needs_display(index):
+        if not args.headless:
+            return True
+        return video_writer is not None and index % video_every == 0
+
+    # Per-stage timers; cheap enough to stay on for every run
+    profiler = StageProfiler(STAGES, report_every=args.report_every, frame_file=output_path(args.timings_out))
+    cprofile = ThreadedCProfile() if args.profile else None
+
+    late_frames = 0
+
+    def release(*buffers):
+        if pool is not None:
+            pool.release(*buffers)
+
+    def read_frame():
+        if args.live:
+            # The grabber decodes into the pool itself; frames carry their stream time and grab time
+            frame = source.read()
+            return None if frame is None else (frame, {'timestamp': source.timestamp, 'arrival': source.arrival})
+        return read_pooled(source, pool)
+
+    def is_late(packet):
+        arrival = packet.get('arrival')
+        return arrival is not None and time.monotonic() - arrival > args.latency_budget
 
-        # Run YOLOv8 tracking
-        results = model.track(recognition_frame, persist=True)
+    def preprocess(packet):
+        # Runs in the worker pool; remap/resize release the GIL so frames are processed in parallel
+        if is_late(packet):
+            # Over the latency budget already: skip the remap, the track stage drops the frame
+            packet['late'] = True
+            packet['recognition'] = packet['display'] = None
+            release(packet['frame'])
+            packet['frame'] = None
+            return
+        display_size = DISPLAY_SIZE if needs_display(packet['index']) else None
+        with profiler.stage('undistort', packet['timings']):
+            packet['recognition'], packet['display'] = preprocess_frame(
+                packet['frame'], K, D, DIM, RECOGNITION_SIZE, display_size, undistorter=undistorter, roi=roi,
+                pool=pool
+            )
+        if display_size is None:
+            packet['display'] = None
+        release(packet['frame'])
+        packet['frame'] = None  # The raw frame is no longer needed
 
-        if results[0].boxes.id is not None:
+    def release_recognition(packet):
+        # The recognition frame doubles as the display frame when both have the same size
+        if packet['recognition'] is not packet['display']:
+            release(packet['recognition'])
+        packet['recognition'] = None
+
+    def world_rows(frames, track_ids, real_world_coords, speeds):
+        # [frame, id, world_x, world_y, speed_kmh] (+ speed_std_kmh, filtered x/y and velocity x/y with kalman)
+        columns = [frames, track_ids, real_world_coords, speeds]
+        if kalman:
+            positions, velocities, _, speed_std = speed_tracker.estimates(track_ids.tolist())
+            columns += [speed_std, positions, velocities]
+        return np.column_stack(columns)
+
+    def predict(packet):
+        # Skipped frame: boxes and keypoints are extrapolated and the speed model is advanced without a measurement
+        # (the Kalman state moves with its velocity, the average speed keeps its last estimate). The predicted tracks
+        # count as seen for the registry timeout. Only world_coordinates gets rows; tracking_data holds measured
+        # boxes only.
+        frame_count = packet['index']
+        with profiler.stage('predict', packet['timings']):
+            track_ids, scaled_boxes, scaled_keypoints = predictor.predict(frame_count)
+            if not len(track_ids):
+                return
+            real_world_coords = calculate_real_world_coordinates(scaled_boxes, transformer)
+            speeds = np.asarray(speed_tracker.predict(track_ids.tolist(), frame_count, fps, packet.get('timestamp')))
+            registry.touch(frame_count, track_ids)
+            frames = np.full(len(track_ids), frame_count)
+            packet['world_rows'] = world_rows(frames, track_ids, real_world_coords, speeds)
+        packet['detections'] = (scaled_boxes, scaled_keypoints, track_ids, speeds)
+
+    def track(packet):
+        # Runs YOLOv8 tracking and the speed estimation; must see frames in order
+        nonlocal late_frames
+        frame_count = packet['index']
+        timings = packet['timings']
+        packet['detections'] = None
+        packet['tracking_rows'] = []
+        packet['world_rows'] = []
+
+        if packet.get('late') or is_late(packet):
+            # Frames that cannot be processed within the latency budget are dropped (not tracked, shown or exported)
+            late_frames += 1
+            release_recognition(packet)
+            release(packet['display'])
+            packet['display'] = None
+            return
+
+        with profiler.stage('evict', timings):
+            registry.evict(frame_count)
+
+        if not stride.should_detect():
+            release_recognition(packet)
+            predict(packet)
+            return
+
+        with profiler.stage('track', timings):
+            results = model.track(packet['recognition'], persist=True)
+        release_recognition(packet)
+
+        if results[0].boxes.id is None:
+            stride.update(())
+            predictor.reset()
+            return
+
+        with profiler.stage('transfer', timings):
             boxes = results[0].boxes.xywh.cpu().numpy()
-            track_ids = results[0].boxes.id.int().cpu().tolist()
+            track_ids = results[0].boxes.id.int().cpu().numpy()
             keypoints = results[0].keypoints.data.cpu().numpy()
 
-            # Rescale boxes and keypoints to display size
-            scaled_boxes = [
-                rescale_coordinates(box.tolist(), RECOGNITION_SIZE, DISPLAY_SIZE) 
-                for box in boxes
-            ]
-            scaled_keypoints = [
-                [
-                    rescale_coordinates(kp[:2], RECOGNITION_SIZE, DISPLAY_SIZE) + [kp[2]]
-                    if len(kp) == 3 and kp[2] > 0 else [0, 0, 0]
-                    for kp in obj_kps
-                ]
-                for obj_kps in keypoints
-            ]
+        # Rescale boxes and keypoints to display size (keypoints with zero confidence become (0, 0, 0))
+        with profiler.stage('rescale', timings):
+            if roi is None:
+                scaled_boxes = rescale_boxes(boxes, RECOGNITION_SIZE, DISPLAY_SIZE)
+                scaled_keypoints = rescale_keypoints(keypoints, RECOGNITION_SIZE, DISPLAY_SIZE)
+            else:
+                scaled_boxes = roi.rescale_boxes(boxes, RECOGNITION_SIZE, DISPLAY_SIZE)
+                scaled_keypoints = roi.rescale_keypoints(keypoints, RECOGNITION_SIZE, DISPLAY_SIZE)
 
+        with profiler.stage('homography', timings):
             # Calculate real-world coordinates (the "middle-bottom" point)
             real_world_coords = calculate_real_world_coordinates(scaled_boxes, transformer)
 
-            # Calculate speeds using frame count and fps
-            speeds = speed_tracker.get_speeds(track_ids, real_world_coords, frame_count, fps)
-
-            # For each object, compute real_width and export data
-            for (box, track_id, kps, world_coord, speed) in zip(
-                scaled_boxes, track_ids, scaled_keypoints, real_world_coords, speeds
-            ):
-                x, y, w, h = box
-
-                # Calculate the real-world width between bottom-left and bottom-right corners
-                real_width = calculate_real_box_width(box, transformer)
-
-                # Write tracking data: [frame, id, x, y, width, real_width, <keypoints>...]
-                row = [frame_count, track_id, x, y, w, real_width]
-                for kp in kps:
-                    row.extend(kp)
-                tracking_exporter.write_row(row)
-
-                # Write real-world coords and speeds (already what you had)
-                world_coord_exporter.write_row([
-                    frame_count,
-                    track_id,
-                    world_coord[0],  # "middle-bottom" real x
-                    world_coord[1],  # "middle-bottom" real y
-                    speed
-                ])
-
-            # Draw annotations with speeds
-            annotated_frame = draw_annotations(display_frame.copy(), scaled_boxes, scaled_keypoints, track_ids, speeds)
-        else:
-            annotated_frame = display_frame
+            # Real-world width between bottom-left and bottom-right corners of every box
+            real_widths = calculate_real_box_widths(scaled_boxes, transformer)
+
+        if online_filter is not None:
+            with profiler.stage('filter', timings):
+                # Box centers, as car_tracking.py maps the x, y columns of tracking_data
+                centers = transformer.transform(scaled_boxes[:, :2])
+                online_filter.add_rows(frame_count, track_ids, centers, scaled_boxes[:, 2], real_widths)
 
+        # Calculate speeds using frame count and fps
+        with profiler.stage('speed', timings):
+            speeds = np.asarray(speed_tracker.get_speeds(track_ids.tolist(), real_world_coords, frame_count, fps,
+                                                         packet.get('timestamp')))
+
+        with profiler.stage('registry', timings):
+            registry.update(frame_count, track_ids, real_world_coords, speeds, real_widths)
+
+        # Build the exporter rows as two NumPy blocks (frame and id are written back as integers)
+        with profiler.stage('rows', timings):
+            n = len(track_ids)
+            frames = np.full(n, frame_count)
+            # Tracking data: [frame, id, x, y, width, real_width, <keypoints>...]
+            packet['tracking_rows'] = np.column_stack((
+                frames, track_ids, scaled_boxes[:, :3], real_widths, scaled_keypoints.reshape(n, -1)
+            ))
+            # Real-world "middle-bottom" coords and speeds: [frame, id, world_x, world_y, speed_kmh]
+            packet['world_rows'] = world_rows(frames, track_ids, real_world_coords, speeds)
+
+        packet['detections'] = (scaled_boxes, scaled_keypoints, track_ids, speeds)
+        stride.update(track_ids)
+        predictor.update(frame_count, track_ids, scaled_boxes, scaled_keypoints)
+
+    def export(packet):
+        with profiler.stage('export', packet['timings']):
+            tracking_exporter.write_rows(packet['tracking_rows'])
+            world_coord_exporter.write_rows(packet['world_rows'])
+        profiler.end_frame(packet['index'], packet['timings'])
+
+    def annotate(packet):
+        # Draw annotations with speeds
+        with profiler.stage('draw'):
+            if roi is not None:
+                x, y, w, h = (int(round(v)) for v in roi.to_pixels(DISPLAY_SIZE))
+                cv2.rectangle(packet['display'], (x, y), (x + w, y + h), (0, 255, 255), 1)
+            if packet['detections'] is not None:
+                scaled_boxes, scaled_keypoints, track_ids, speeds = packet['detections']
+                return draw_annotations(packet['display'], scaled_boxes, scaled_keypoints, track_ids, speeds)
+            return packet['display']
+
+    def display(packet):
+        if packet['display'] is None:  # Dropped frame
+            return not (cv2.waitKey(1) & 0xFF == ord("q"))
+        annotated_frame = annotate(packet)
         # Display the annotated frame
-        cv2.imshow("YOLOv8 Tracking", annotated_frame)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
+        with profiler.stage('display'):
+            cv2.imshow("YOLOv8 Tracking", annotated_frame)
+            release(packet['display'])  # imshow keeps its own copy
+            return not (cv2.waitKey(1) & 0xFF == ord("q"))
 
-    # Cleanup
-    cap.release()
-    cv2.destroyAllWindows()
-    tracking_exporter.close()
-    world_coord_exporter.close()
+    def write_video(packet):
+        if packet['display'] is not None:
+            video_writer.write(annotate(packet))
+            release(packet['display'])
+
+    sinks = [export]
+    if video_writer is not None:
+        sinks.append(write_video)
+
+    pipeline = FramePipeline(
+        read_frame, preprocess, track,
+        sinks=sinks, display=None if args.headless else display,
+        workers=args.workers, queue_size=args.queue_size,
+        profiler=profiler, cprofile=cprofile,
+        first_index=source.start_frame + 1  # Frame numbers in the exports stay those of the video
+    )
+
+    start = time.perf_counter()
+    if cprofile is not None:
+        cprofile.enable()
+    try:
+        frames = pipeline.run()
+    finally:
+        if cprofile is not None:
+            cprofile.disable()
+        # Cleanup
+        source.close()
+        if video_writer is not None:
+            video_writer.release()
+        if not args.headless:
+            cv2.destroyAllWindows()
+        tracking_exporter.close()
+        world_coord_exporter.close()
+        registry.finish_all()  # Vehicles still in view at the end
+        vehicle_exporter.close()
+        profiler.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {frames} frames in {elapsed:.1f} s ({frames / elapsed if elapsed > 0 else 0:.1f} FPS)")
+    if args.live:
+        print(f"Dropped {source.frames_dropped} of {source.frames_grabbed} grabbed frames (newer frame available) "
+              f"and {late_frames} late frames (over the {args.latency_budget:.2f} s latency budget)")
+    print(f"Tracked {registry.finished} vehicles, summaries saved to {vehicle_exporter.output}")
+    if online_filter is not None:
+        print(f"Exported {online_filter.exported} vehicles to {car_dir}")
+    if args.max_stride > 1:
+        print(f"Detector ran on {stride.detections} frames ({100 * stride.detection_ratio():.0f}%)")
+    if args.stats:
+        pipeline.print_stats()
+        if pool is not None:
+            print(pool.summary())
+        print(profiler.summary())
+    if args.timings_json:
+        profiler.save_json(output_path(args.timings_json))
+    if cprofile is not None:
+        cprofile.dump(output_path(args.profile))
+    return {'frames': frames, 'elapsed_s': elapsed, 'fps': frames / elapsed if elapsed > 0 else 0.0,
+            'detections': stride.detections}
+
+def main():
+    run(parse_args())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,162 @@
+#Streaming counterpart of car_tracking.remove_outliers / select_best_frames.
+#main.py feeds every detection of a vehicle to OnlineTrackFilter while tracking. Outliers are rejected as they arrive,
+#using Welford running statistics of the vehicle's motion, and a bounded, X-covering set of frames is kept per track.
+#When a track ends, its cleaned and selected frames are emitted at once (e.g. as car_<id>_transformed.csv), so there
+#is no second pass over tracking_data.csv.
+
+import bisect
+import math
+
+from car_tracking import select_best_frames
+
+class RunningStats:
+    """Welford running mean and variance of a stream of values."""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+class _TrackState:
+    __slots__ = ('records', 'xs', 'last', 'vx', 'vy', 'rejected_in_row', 'rejected', 'last_seen')
+
+    def __init__(self):
+        self.records = []          # kept records, sorted by real_world_x
+        self.xs = []               # their real_world_x, for bisect
+        self.last = None           # last accepted record
+        self.vx = RunningStats()   # motion per frame along X and Y (m / frame)
+        self.vy = RunningStats()
+        self.rejected_in_row = 0
+        self.rejected = 0
+        self.last_seen = 0
+
+class OnlineTrackFilter:
+    """
+    Per-track streaming outlier rejection and frame selection.
+    A vehicle moves, so its position is not compared with a mean position as in remove_outliers (the running mean would
+    trail behind the vehicle); instead each new position is compared with the last accepted one, and the motion per
+    frame must stay within std_threshold standard deviations (plus min_tolerance) of the running motion statistics.
+    After max_rejections rejections in a row the statistics restart from the current position.
+    With desired_count > 0 at most buffer_factor * desired_count records are kept per track: when the buffer is full,
+    the record closest along world X to its neighbours is dropped, so the buffer keeps covering the whole X range and
+    select_best_frames picks the final frames from it.
+    :param on_finished: callback(track_id, records) called when a track ends with its records sorted by frame.
+    :param max_missed_frames: a track ends after this many frames without a detection (None: only by finish()).
+    """
+
+    def __init__(self, desired_count=0, std_threshold=2.0, warmup=5, min_tolerance=0.05, max_rejections=5,
+                 buffer_factor=4, on_finished=None, max_missed_frames=60):
+        self.desired_count = desired_count
+        self.std_threshold = std_threshold
+        self.warmup = warmup
+        self.min_tolerance = min_tolerance
+        self.max_rejections = max_rejections
+        self.capacity = max(2, buffer_factor * desired_count) if desired_count > 0 else None
+        self.on_finished = on_finished
+        self.max_missed_frames = max_missed_frames
+        self.tracks = {}
+        self.finished = 0    # tracks ended
+        self.exported = 0    # tracks ended with records, passed to on_finished
+
+    def add(self, record):
+        """Feed one record (dict with frame, id, real_world_x, real_world_y, width, real_width); False if rejected."""
+        x, y = record['real_world_x'], record['real_world_y']
+        if not (math.isfinite(x) and math.isfinite(y)):
+            return False
+        state = self.tracks.get(record['id'])
+        if state is None:
+            state = self.tracks[record['id']] = _TrackState()
+        state.last_seen = record['frame']
+
+        if state.last is not None:
+            frames = record['frame'] - state.last['frame']
+            if frames <= 0:
+                return False
+            vx = (x - state.last['real_world_x']) / frames
+            vy = (y - state.last['real_world_y']) / frames
+            if self._is_outlier(state, vx, vy):
+                state.rejected += 1
+                state.rejected_in_row += 1
+                if state.rejected_in_row < self.max_rejections:
+                    return False
+                # The vehicle really moves differently (or the reference was the outlier): start over from here
+                state.vx, state.vy = RunningStats(), RunningStats()
+            else:
+                state.vx.add(vx)
+                state.vy.add(vy)
+        state.rejected_in_row = 0
+        state.last = record
+        self._keep(state, record)
+        return True
+
+    def add_rows(self, frame, track_ids, world, widths, real_widths):
+        """Feed the detections of one frame: ids (N,), world box centers (N, 2), widths (N,) and real widths (N,)."""
+        for track_id, (rwx, rwy), width, real_width in zip(track_ids, world, widths, real_widths):
+            self.add({
+                'frame': int(frame),
+                'id': int(track_id),
+                'real_world_x': float(rwx),
+                'real_world_y': float(rwy),
+                'width': float(width),
+                'real_width': float(real_width)
+            })
+
+    def _is_outlier(self, state, vx, vy):
+        if state.vx.count < self.warmup:
+            return False
+        k = self.std_threshold
+        return (abs(vx - state.vx.mean) > k * state.vx.std + self.min_tolerance or
+                abs(vy - state.vy.mean) > k * state.vy.std + self.min_tolerance)
+
+    def _keep(self, state, record):
+        i = bisect.bisect(state.xs, record['real_world_x'])
+        state.xs.insert(i, record['real_world_x'])
+        state.records.insert(i, record)
+        if self.capacity is None or len(state.records) <= self.capacity:
+            return
+        # Drop the inner record whose neighbours are closest together: it adds the least coverage along X
+        xs = state.xs
+        drop = min(range(1, len(xs) - 1), key=lambda j: xs[j + 1] - xs[j - 1])
+        del xs[drop]
+        del state.records[drop]
+
+    def finish(self, track_id):
+        """End a track: returns its cleaned and selected records (sorted by frame) and frees its state."""
+        state = self.tracks.pop(track_id, None)
+        if state is None:
+            return []
+        records = select_best_frames(state.records, desired_count=self.desired_count)
+        records = sorted(records, key=lambda r: r['frame'])
+        self.finished += 1
+        if records:
+            self.exported += 1
+            if self.on_finished is not None:
+                self.on_finished(track_id, records)
+        return records
+
+    def evict_stale(self, frame):
+        """End the tracks without a detection within max_missed_frames; returns their ids."""
+        if self.max_missed_frames is None:
+            return []
+        stale = [track_id for track_id, state in self.tracks.items()
+                 if frame - state.last_seen > self.max_missed_frames]
+        for track_id in stale:
+            self.finish(track_id)
+        return stale
+
+    def finish_all(self):
+        """End all remaining tracks (end of the video)."""
+        for track_id in list(self.tracks):
+            self.finish(track_id)
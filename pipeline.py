@@ -0,0 +1,244 @@
+#Staged, multi-threaded frame pipeline used by main.py.
+#Frames flow decode -> preprocess (worker pool, order preserved) -> track -> sinks (CSV export, video writer...) through bounded queues,
+#so a slow stage blocks the stages before it (backpressure) instead of letting memory grow.
+#An optional display callback runs on the calling thread, because cv2.imshow has to stay on the main thread on most platforms.
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_END = object()  # Marks the end of the stream in every queue
+
+
+class StageStats:
+    """Counters for one pipeline stage: items processed, busy time, backpressure and depth of its input queue."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_s = 0.0
+        self.blocked_s = 0.0   # Time spent waiting to push into a full downstream queue
+        self.depth_sum = 0
+        self.depth_max = 0
+        self.depth_samples = 0
+        self._lock = threading.Lock()  # The preprocess stage is run by every pool thread
+
+    def add_item(self, busy_s):
+        with self._lock:
+            self.busy_s += busy_s
+            self.items += 1
+
+    def sample_depth(self, depth):
+        self.depth_sum += depth
+        self.depth_samples += 1
+        if depth > self.depth_max:
+            self.depth_max = depth
+
+    def summary(self):
+        mean_depth = self.depth_sum / self.depth_samples if self.depth_samples else 0.0
+        busy_ms = 1000 * self.busy_s / self.items if self.items else 0.0
+        return (f"{self.name:<12} items={self.items:<7} busy={busy_ms:7.2f} ms/item "
+                f"blocked={self.blocked_s:6.2f} s  input queue mean={mean_depth:5.2f} max={self.depth_max}")
+
+
+class FramePipeline:
+    """
+    Runs the per-frame work of main.py as a set of concurrent stages.
+    :param read_frame: callable returning the next frame, or None at the end of the stream. It may also return
+                       (frame, info) where info is a dict of extra packet entries (e.g. the frame timestamp).
+    :param preprocess: callable(packet) run in a pool of workers; frames leave the pool in input order.
+    :param track: callable(packet) run on a single thread in frame order (the tracker is stateful).
+    :param sinks: callables(packet) that each run on their own thread after tracking (CSV export, video writer...).
+    :param display: optional callable(packet) run on the calling thread; returning False stops the pipeline.
+    :param workers: number of preprocess workers.
+    :param queue_size: capacity of every inter-stage queue.
+    :param profiler: optional profiling.StageProfiler; the decode time of every frame is recorded as 'decode'.
+    :param cprofile: optional profiling.ThreadedCProfile run in every pipeline thread.
+    :param first_index: frame number of the first frame (e.g. start frame + 1 when reading from the middle of a video).
+    Packets are dicts; the pipeline sets 'index' (1-based frame number), 'frame' and 'timings' (stage -> ns),
+    stages add their own keys in place.
+    """
+
+    def __init__(self, read_frame, preprocess, track, sinks=(), display=None, workers=2, queue_size=8,
+                 profiler=None, cprofile=None, first_index=1):
+        self.read_frame = read_frame
+        self.preprocess = preprocess
+        self.track = track
+        self.sinks = list(sinks)
+        self.display = display
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.profiler = profiler
+        self.cprofile = cprofile
+        self.first_index = first_index
+        self.stats = {}
+        self.frames_tracked = 0
+        self._stop = threading.Event()
+        self._errors = []
+
+    def stop(self):
+        """Stop decoding; frames already in flight are drained without being tracked."""
+        self._stop.set()
+
+    def run(self):
+        """Process the whole stream. Returns the number of frames that went through the tracker."""
+        decoded = queue.Queue(maxsize=self.queue_size)
+        preprocessed = queue.Queue(maxsize=self.queue_size)
+        sink_queues = [queue.Queue(maxsize=self.queue_size) for _ in self.sinks]
+        display_queue = queue.Queue(maxsize=self.queue_size) if self.display else None
+        outputs = sink_queues + ([display_queue] if display_queue else [])
+
+        for name in ('decode', 'preprocess', 'track'):
+            self._stage(name)
+        sink_stats = [self._stage(getattr(sink, '__name__', 'sink')) for sink in self.sinks]
+
+        guard = self.cprofile.wrap(self._guard) if self.cprofile else self._guard
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='preprocess',
+                                      initializer=self.cprofile.initializer if self.cprofile else None)
+        threads = [
+            threading.Thread(target=guard, args=(self._decode_loop, decoded), name='decode'),
+            threading.Thread(target=guard, args=(self._dispatch_loop, decoded, preprocessed, executor),
+                             name='dispatch'),
+            threading.Thread(target=guard, args=(self._track_loop, preprocessed, outputs), name='track'),
+        ]
+        for sink, q, stats in zip(self.sinks, sink_queues, sink_stats):
+            threads.append(threading.Thread(target=guard, args=(self._sink_loop, sink, q, stats),
+                                            name=stats.name))
+        for t in threads:
+            t.start()
+
+        try:
+            if display_queue:
+                self._display_loop(display_queue, self._stage('display'))
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+            raise
+        finally:
+            for t in threads:
+                t.join()
+            executor.shutdown(wait=True)
+
+        if self._errors:
+            raise self._errors[0]
+        return self.frames_tracked
+
+    def print_stats(self):
+        for stats in self.stats.values():
+            print(stats.summary())
+
+    # --- stage loops -------------------------------------------------------
+
+    def _decode_loop(self, out_q):
+        stats = self.stats['decode']
+        index = self.first_index - 1
+        while not self._stop.is_set():
+            start = time.perf_counter_ns()
+            frame = self.read_frame()
+            if frame is None:
+                break
+            info = None
+            if isinstance(frame, tuple):
+                frame, info = frame
+            elapsed = time.perf_counter_ns() - start
+            stats.busy_s += elapsed / 1e9
+            stats.items += 1
+            index += 1
+            packet = {'index': index, 'frame': frame, 'timings': {}}
+            if info:
+                packet.update(info)
+            if self.profiler is not None:
+                self.profiler.record('decode', elapsed, packet['timings'])
+            self._put(out_q, packet, stats)
+        self._put(out_q, _END, stats)
+
+    def _dispatch_loop(self, in_q, out_q, executor):
+        # Futures are queued in submission order, so the tracker receives frames in order
+        # while up to queue_size frames are being preprocessed concurrently.
+        stats = self.stats['preprocess']
+        while True:
+            packet = self._get(in_q, stats)
+            if packet is _END:
+                break
+            self._put(out_q, executor.submit(self._run_stage, self.preprocess, packet, stats), stats)
+        self._put(out_q, _END, stats)
+
+    def _track_loop(self, in_q, outputs):
+        stats = self.stats['track']
+        while True:
+            future = self._get(in_q, stats)
+            if future is _END:
+                break
+            packet = future.result()
+            if self._stop.is_set():
+                continue  # Drain the frames still in flight without tracking them
+            self._run_stage(self.track, packet, stats)
+            self.frames_tracked += 1
+            for q in outputs:
+                self._put(q, packet, stats)
+        for q in outputs:
+            self._put(q, _END, stats)
+
+    def _sink_loop(self, sink, in_q, stats):
+        while True:
+            packet = self._get(in_q, stats)
+            if packet is _END:
+                break
+            self._run_stage(sink, packet, stats)
+
+    def _display_loop(self, in_q, stats):
+        while True:
+            packet = self._get(in_q, stats)
+            if packet is _END:
+                break
+            start = time.perf_counter()
+            keep_going = self.display(packet)
+            stats.add_item(time.perf_counter() - start)
+            if keep_going is False:
+                self._stop.set()
+
+    # --- helpers -------------------------------------------------------------
+
+    def _stage(self, name):
+        unique = name
+        suffix = 2
+        while unique in self.stats:
+            unique = f"{name}{suffix}"
+            suffix += 1
+        self.stats[unique] = StageStats(unique)
+        return self.stats[unique]
+
+    def _get(self, q, stats):
+        stats.sample_depth(q.qsize())
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self._errors:
+                    return _END  # Another stage failed; shut down
+
+    def _put(self, q, item, stats):
+        # Blocks while the downstream queue is full (backpressure)
+        start = time.perf_counter()
+        while True:
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                if self._errors:
+                    return
+        stats.blocked_s += time.perf_counter() - start
+
+    def _run_stage(self, fn, packet, stats):
+        start = time.perf_counter()
+        fn(packet)
+        stats.add_item(time.perf_counter() - start)
+        return packet
+
+    def _guard(self, loop, *args):
+        try:
+            loop(*args)
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
@@ -1,42 +1,321 @@
-#This script handles image preprocessing for fisheye camera footage. 
-#It includes functions to undistort images using previously computed calibration parameters, resize frames for recognition and display, and rescale coordinates between different resolutions. 
-#The load_calibration_data function retrieves the camera matrix and distortion coefficients from a saved .npz file. 
+#This script handles image preprocessing for fisheye camera footage.
+#It includes functions to undistort images using previously computed calibration parameters, resize frames for recognition and display, and rescale coordinates between different resolutions.
+#The load_calibration_data function retrieves the camera matrix and distortion coefficients from a saved .npz file.
+#The Undistorter class builds the fisheye remap tables once and reuses them for every frame (optionally caching them on disk next to the .npz).
+#A RegionOfInterest restricts the recognition frame to part of the undistorted view (e.g. the mapped road area).
+
+import hashlib
+import os
+import tempfile
+import threading
 
 import cv2
 import numpy as np
 
+class Undistorter:
+    """
+    Undistorts frames with precomputed remap tables.
+    cv2.fisheye.initUndistortRectifyMap only depends on K, D, DIM, the scale and the
+    input/output sizes, so the maps are built once per (input size, output size) and reused.
+    The output size is folded into the projection matrix, which means undistortion and the
+    resize to recognition/display size happen in a single cv2.remap call. A region of interest
+    is folded in the same way (shifted principal point), so cropping costs nothing extra.
+    A bilinear remap that shrinks the view a lot aliases fine texture, so for large downscale factors
+    the remap only shrinks up to max_remap_downscale and cv2.resize with INTER_AREA does the rest.
+    :param K, D, DIM: calibration data as returned by load_calibration_data.
+    :param scale: zoom factor applied to the focal length of the undistorted view.
+    :param cache_file: optional .npz file used to persist the maps between runs.
+    :param max_remap_downscale: largest shrink factor, relative to the view at calibration resolution (DIM), done by
+                                the remap itself; 1.0 gives the same result as undistorting at DIM and resizing
+                                with INTER_AREA, larger values are faster but alias more (None: always one remap).
+    """
+
+    def __init__(self, K, D, DIM, scale=0.6, cache_file=None, max_remap_downscale=1.0):
+        self.K = np.asarray(K, dtype=np.float64)
+        self.D = np.asarray(D, dtype=np.float64)
+        self.DIM = tuple(int(v) for v in np.ravel(DIM))
+        self.scale = scale
+        self.cache_file = cache_file
+        self.max_remap_downscale = max_remap_downscale
+        self._scratch = threading.local()  # Per-thread intermediate frames of the two-step undistortion
+        self.digest = calibration_digest(self.K, self.D, self.DIM, scale)
+        self._maps = {}
+        self._lock = threading.Lock()  # maps() is called from the preprocessing worker threads
+        if cache_file:
+            self._load_cache()
+
+    def maps(self, input_size, output_size=None, roi=None):
+        """
+        Return (map1, map2) for the given input and output sizes, building them on first use.
+        :param roi: optional RegionOfInterest of the undistorted view that is stretched to output_size.
+        """
+        input_size = tuple(int(v) for v in input_size)
+        output_size = tuple(int(v) for v in output_size) if output_size else self.DIM
+        key = _map_key(input_size, output_size, roi)
+        maps = self._maps.get(key)
+        if maps is not None:
+            return maps
+        with self._lock:
+            # Another worker may have built the maps while this one waited for the lock
+            maps = self._maps.get(key)
+            if maps is None:
+                # Small differences come from rounding when frames are decoded at a reduced size
+                assert abs(input_size[0] / input_size[1] - self.DIM[0] / self.DIM[1]) < 0.01, \
+                    "Image to undistort needs to have same aspect ratio as the ones used in calibration"
+                maps = self._maps[key] = self._build_maps(input_size, output_size, roi)
+                if self.cache_file:
+                    self._save_cache()
+        return maps
+
+    def undistort(self, img, output_size=None, roi=None, dst=None):
+        """
+        Undistort img (or only its roi) and resize it to output_size (DIM by default), in one remap unless the
+        view is shrunk by more than max_remap_downscale.
+        :param dst: optional preallocated output array (e.g. from a BufferPool) of the output size.
+        """
+        input_size = img.shape[1::-1]
+        output_size = tuple(int(v) for v in output_size) if output_size else self.DIM
+        remap_size = self._remap_size(input_size, output_size, roi)
+        if remap_size == output_size:
+            map1, map2 = self.maps(input_size, output_size, roi)
+            return cv2.remap(img, map1, map2, dst=dst, interpolation=cv2.INTER_LINEAR,
+                             borderMode=cv2.BORDER_CONSTANT)
+
+        # Remap at (close to) the source resolution, then shrink with INTER_AREA to avoid aliasing
+        map1, map2 = self.maps(input_size, remap_size, roi)
+        key = (remap_size, img.shape[2:], img.dtype.str)
+        scratch = getattr(self._scratch, 'frames', None)
+        if scratch is None:
+            scratch = self._scratch.frames = {}
+        scratch[key] = cv2.remap(img, map1, map2, dst=scratch.get(key), interpolation=cv2.INTER_LINEAR,
+                                 borderMode=cv2.BORDER_CONSTANT)
+        return cv2.resize(scratch[key], output_size, dst=dst, interpolation=cv2.INTER_AREA)
+
+    def _remap_size(self, input_size, output_size, roi=None):
+        # Size of the remap output: output_size, unless the remap would shrink the view by more than
+        # max_remap_downscale (measured in pixels of the view at calibration resolution, like the
+        # original undistort-at-DIM path; larger input frames are shrunk by the remap itself)
+        if not self.max_remap_downscale:
+            return output_size
+        source = (self.DIM[0], self.DIM[1]) if roi is None else roi.to_pixels(self.DIM)[2:]
+        if all(s / o <= self.max_remap_downscale for s, o in zip(source, output_size)):
+            return output_size
+        return tuple(max(o, int(np.ceil(s / self.max_remap_downscale))) for s, o in zip(source, output_size))
+
+    def _build_maps(self, input_size, output_size, roi=None):
+        Knew = self.K.copy()
+        if self.scale:  # The scale is to resize the final undistorted image to zoom in
+            Knew[(0, 1), (0, 1)] = self.scale * Knew[(0, 1), (0, 1)]
+
+        if roi is None:
+            # Project the undistorted DIM-sized view directly onto output_size pixels
+            P = _scale_camera_matrix(Knew, output_size[0] / self.DIM[0], output_size[1] / self.DIM[1])
+        else:
+            # Move the principal point so the ROI starts at the origin, then project the ROI onto output_size
+            x, y, w, h = roi.to_pixels(self.DIM)
+            Knew[0, 2] -= x
+            Knew[1, 2] -= y
+            P = _scale_camera_matrix(Knew, output_size[0] / w, output_size[1] / h)
+        map_x, map_y = cv2.fisheye.initUndistortRectifyMap(
+            self.K, self.D, np.eye(3), P, output_size, cv2.CV_32FC1
+        )
+
+        # The maps point into a DIM-sized image; rescale them if frames come in at another resolution
+        if input_size != self.DIM:
+            sx, sy = input_size[0] / self.DIM[0], input_size[1] / self.DIM[1]
+            map_x = (map_x + 0.5) * sx - 0.5
+            map_y = (map_y + 0.5) * sy - 0.5
+
+        return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with np.load(self.cache_file) as X:
+                if str(X['digest']) != self.digest:
+                    return  # Calibration changed since the cache was written
+                for name in X.files:
+                    if name.startswith('map1_'):
+                        key = name[len('map1_'):]
+                        self._maps[key] = (X[name], X['map2_' + key])
+        except Exception as e:
+            print(f"Ignoring unreadable remap cache '{self.cache_file}': {e}")
+
+    def _save_cache(self):
+        # Called with self._lock held
+        arrays = {'digest': np.array(self.digest)}
+        for key, (map1, map2) in list(self._maps.items()):
+            arrays['map1_' + key] = map1
+            arrays['map2_' + key] = map2
+        # Write to a temporary file first so concurrent runs never see a half-written cache
+        directory = os.path.dirname(os.path.abspath(self.cache_file))
+        fd, tmp_path = tempfile.mkstemp(suffix='.npz', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"Could not write remap cache '{self.cache_file}': {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+def calibration_digest(K, D, DIM, scale):
+    """Short hash identifying one set of calibration parameters."""
+    h = hashlib.sha1()
+    for arr in (K, D, DIM):
+        h.update(np.ascontiguousarray(arr, dtype=np.float64).tobytes())
+    h.update(repr(scale).encode())
+    return h.hexdigest()[:16]
+
+def remap_cache_file(calibration_file):
+    """Path of the remap cache stored next to a calibration .npz file."""
+    return os.path.splitext(calibration_file)[0] + '_remap_cache.npz'
+
+def _map_key(input_size, output_size, roi=None):
+    key = f"{input_size[0]}x{input_size[1]}_{output_size[0]}x{output_size[1]}"
+    if roi is not None:
+        key += "_roi" + "_".join(f"{v:.5f}" for v in roi.bounds)
+    return key
+
+def _scale_camera_matrix(K, sx, sy):
+    # Pixel-centre aware scaling, consistent with cv2.resize
+    P = K.copy()
+    P[0, 0] *= sx
+    P[1, 1] *= sy
+    P[0, 2] = (P[0, 2] + 0.5) * sx - 0.5
+    P[1, 2] = (P[1, 2] + 0.5) * sy - 0.5
+    return P
+
+# Undistorters shared by the functional API, keyed by calibration digest
+_undistorters = {}
+
+def get_undistorter(K, D, DIM, scale=0.6):
+    key = calibration_digest(K, D, np.ravel(DIM), scale)
+    if key not in _undistorters:
+        _undistorters[key] = Undistorter(K, D, DIM, scale)
+    return _undistorters[key]
+
 def undistort(img, K, D, DIM, scale=0.6):
-    dim1 = img.shape[:2][::-1]  #dim1 is the dimension of input image to un-distort
-    assert dim1[0]/dim1[1] == DIM[0]/DIM[1], "Image to undistort needs to have same aspect ratio as the ones used in calibration"
-    if dim1[0] != DIM[0]:
-        img = cv2.resize(img, DIM, interpolation=cv2.INTER_AREA)
-    Knew = K.copy()
-    if scale:  # The scale is to resize the final undistorted image to zoom in
-        Knew[(0,1), (0,1)] = scale * Knew[(0,1), (0,1)]
-    map1, map2 = cv2.fisheye.initUndistortRectifyMap(K, D, np.eye(3), Knew, DIM, cv2.CV_16SC2)
-    undistorted_img = cv2.remap(img, map1, map2, interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
-    return undistorted_img
-
-def preprocess_frame(frame, K, D, DIM, recognition_size=(640, 640), display_size=None):
-    # Step 1: Undistort the frame
-    undistorted_frame = undistort(frame, K, D, DIM)
-    
-    # Step 2: Resize the frame to the recognition size
-    recognition_frame = cv2.resize(undistorted_frame, recognition_size, interpolation=cv2.INTER_AREA)
-    
-    # Step 3: If display_size is provided and different from recognition_size, resize for display
-    if display_size and display_size != recognition_size:
-        display_frame = cv2.resize(undistorted_frame, display_size, interpolation=cv2.INTER_AREA)
-    else:
-        display_frame = recognition_frame
-    
+    return get_undistorter(K, D, DIM, scale).undistort(img)
+
+def preprocess_frame(frame, K, D, DIM, recognition_size=(640, 640), display_size=None, undistorter=None, roi=None,
+                     pool=None):
+    if undistorter is None:
+        undistorter = get_undistorter(K, D, DIM)
+
+    if not display_size:
+        # Recognition only (headless): undistort straight into the recognition size;
+        # with a region of interest only that part of the view is sent to recognition
+        recognition_frame = undistorter.undistort(frame, recognition_size, roi,
+                                                  dst=_acquire(pool, recognition_size, frame))
+        return recognition_frame, recognition_frame
+
+    # One remap for the display view; the recognition frame is shrunk from it with INTER_AREA
+    display_frame = undistorter.undistort(frame, display_size, dst=_acquire(pool, display_size, frame))
+    if roi is None and tuple(display_size) == tuple(recognition_size):
+        return display_frame, display_frame
+
+    view = display_frame
+    if roi is not None:
+        x, y, w, h = (int(round(v)) for v in roi.to_pixels(display_size))
+        if w < recognition_size[0] or h < recognition_size[1]:
+            # The crop would have to be enlarged: remap the ROI at recognition size from the full-resolution frame
+            recognition_frame = undistorter.undistort(frame, recognition_size, roi,
+                                                      dst=_acquire(pool, recognition_size, frame))
+            return recognition_frame, display_frame
+        view = display_frame[y:y + h, x:x + w]
+    recognition_frame = cv2.resize(view, tuple(recognition_size), dst=_acquire(pool, recognition_size, frame),
+                                   interpolation=cv2.INTER_AREA)
     return recognition_frame, display_frame
 
+def _acquire(pool, size, frame):
+    # Output buffer of size (width, height) with the channels of frame, or None to let OpenCV allocate
+    if pool is None:
+        return None
+    return pool.acquire((size[1], size[0]) + frame.shape[2:], frame.dtype)
+
 def rescale_coordinates(coords, from_size, to_size):
     fx = to_size[0] / from_size[0]
     fy = to_size[1] / from_size[1]
     return [coord * fx if i % 2 == 0 else coord * fy for i, coord in enumerate(coords)]
 
+def rescale_boxes(boxes, from_size, to_size):
+    """Rescale an (N, 4) array of xywh (or xyxy) boxes in one operation; returns a float64 (N, 4) array."""
+    scale = np.array([to_size[0] / from_size[0], to_size[1] / from_size[1]] * 2)
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4) * scale
+
+def rescale_keypoints(keypoints, from_size, to_size, min_conf=0.0):
+    """
+    Rescale an (N, K, 3) array of (x, y, confidence) keypoints in one operation.
+    Keypoints with confidence <= min_conf are set to (0, 0, 0), like missing keypoints in the exports.
+    :return: float64 array of shape (N, K, 3).
+    """
+    kps = np.asarray(keypoints, dtype=np.float64)
+    if kps.ndim == 2:
+        kps = kps[None]
+    fx = to_size[0] / from_size[0]
+    fy = to_size[1] / from_size[1]
+    scaled = kps * np.array([fx, fy, 1.0])
+    scaled[kps[..., 2] <= min_conf] = 0.0
+    return scaled
+
+class RegionOfInterest:
+    """
+    Rectangle of the undistorted view, stored as fractions (x, y, w, h) of the view's width and height,
+    so the same ROI applies at recognition, display and calibration resolution.
+    """
+
+    def __init__(self, x, y, w, h):
+        self.bounds = (float(x), float(y), float(w), float(h))
+
+    @classmethod
+    def from_points(cls, points, view_size, margin=0.2, keep_aspect=True):
+        """
+        Bounding box of image points (in pixels of a view of view_size), enlarged by margin (fraction of the box
+        size on every side) and clipped to the view. With keep_aspect the box gets the aspect ratio of the
+        view, so objects keep the proportions the detector sees on full frames.
+        """
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2) / np.asarray(view_size, dtype=np.float64)
+        if len(pts) == 0:
+            raise ValueError("At least one point is needed to derive a region of interest")
+        lo, hi = pts.min(axis=0), pts.max(axis=0)
+        size = hi - lo
+        lo, hi = lo - margin * size, hi + margin * size
+        if keep_aspect:
+            # Equal fractions of width and height = same aspect ratio as the view
+            side = min(1.0, float((hi - lo).max()))
+            center = (lo + hi) / 2
+            lo, hi = center - side / 2, center + side / 2
+        # Shift the box back inside the view, then clip what still does not fit
+        shift = np.maximum(-lo, 0.0) - np.maximum(hi - 1.0, 0.0)
+        lo, hi = np.clip(lo + shift, 0.0, 1.0), np.clip(hi + shift, 0.0, 1.0)
+        return cls(lo[0], lo[1], hi[0] - lo[0], hi[1] - lo[1])
+
+    def to_pixels(self, view_size):
+        """(x, y, w, h) of the ROI in pixels of a view of view_size."""
+        x, y, w, h = self.bounds
+        return x * view_size[0], y * view_size[1], w * view_size[0], h * view_size[1]
+
+    def rescale_boxes(self, boxes, from_size, view_size):
+        """Map (N, 4) xywh boxes detected in the from_size ROI image to pixels of the whole view."""
+        x, y, w, h = self.to_pixels(view_size)
+        scaled = rescale_boxes(boxes, from_size, (w, h))
+        scaled[:, :2] += (x, y)
+        return scaled
+
+    def rescale_keypoints(self, keypoints, from_size, view_size, min_conf=0.0):
+        """Map (N, K, 3) keypoints of the ROI image to the whole view; hidden keypoints stay (0, 0, 0)."""
+        x, y, w, h = self.to_pixels(view_size)
+        scaled = rescale_keypoints(keypoints, from_size, (w, h), min_conf)
+        visible = scaled[..., 2] > 0
+        scaled[..., 0] += np.where(visible, x, 0.0)
+        scaled[..., 1] += np.where(visible, y, 0.0)
+        return scaled
+
+    def __repr__(self):
+        return "RegionOfInterest(x={:.3f}, y={:.3f}, w={:.3f}, h={:.3f})".format(*self.bounds)
+
 # Load calibration data
 def load_calibration_data(file_path='gopro_calibration_fisheye.npz'):
     try:
@@ -49,4 +328,4 @@ def load_calibration_data(file_path='gopro_calibration_fisheye.npz'):
         return None, None, None
     except Exception as e:
         print(f"Error loading calibration data: {e}")
-        return None, None, None
\ No newline at end of file
+        return None, None, None
@@ -0,0 +1,179 @@
+#Lightweight instrumentation for the tracking loop.
+#StageProfiler times named stages with perf_counter_ns, keeps a rolling window of durations per stage for p50/p95/p99,
+#prints a periodic summary and can stream per-frame timings to a CSV file. Recording a stage costs two clock reads and
+#a deque append, so it can stay enabled in production.
+#ThreadedCProfile collects cProfile data from every pipeline thread (cProfile only sees the thread it is enabled in).
+
+import cProfile
+import csv
+import json
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+class StageProfiler:
+    """
+    Per-stage timers with rolling percentiles.
+    :param stages: stage names, in the order used for the per-frame CSV columns.
+    :param window: number of most recent samples kept per stage for the percentiles.
+    :param report_every: print a summary every N seconds (0 disables the periodic summary).
+    :param frame_file: optional CSV receiving one row of stage times (ms) per frame.
+    """
+
+    def __init__(self, stages, window=2000, report_every=0, frame_file=None):
+        self.stages = list(stages)
+        self.window = window
+        self.samples = {name: deque(maxlen=window) for name in self.stages}
+        self.totals = dict.fromkeys(self.stages, 0)
+        self.counts = dict.fromkeys(self.stages, 0)
+        self.report_every = report_every
+        self._last_report = time.perf_counter()
+        self._lock = threading.Lock()
+        self._frame_file = None
+        self._frame_writer = None
+        if frame_file:
+            self._frame_file = open(frame_file, 'w', newline='')
+            self._frame_writer = csv.writer(self._frame_file)
+            self._frame_writer.writerow(['frame'] + [f'{name}_ms' for name in self.stages])
+
+    def record(self, name, elapsed_ns, timings=None):
+        """Add one duration for a stage; also accumulate it into the frame's timings dict if given."""
+        # Stages are recorded from the decode, preprocess, track and sink threads at once
+        with self._lock:
+            samples = self.samples.get(name)
+            if samples is None:  # Stage not declared up front; tracked but not written to the per-frame CSV
+                self.totals.setdefault(name, 0)
+                self.counts.setdefault(name, 0)
+                samples = self.samples.setdefault(name, deque(maxlen=self.window))
+            samples.append(elapsed_ns)
+            self.totals[name] += elapsed_ns
+            self.counts[name] += 1
+        if timings is not None:
+            timings[name] = timings.get(name, 0) + elapsed_ns
+
+    @contextmanager
+    def stage(self, name, timings=None):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter_ns() - start, timings)
+
+    def end_frame(self, frame, timings):
+        """Write the frame's timings to the per-frame CSV and print the periodic summary when due."""
+        if self._frame_writer is not None:
+            with self._lock:
+                self._frame_writer.writerow(
+                    [frame] + [f"{timings.get(name, 0) / 1e6:.3f}" for name in self.stages]
+                )
+        if self.report_every and time.perf_counter() - self._last_report >= self.report_every:
+            self._last_report = time.perf_counter()
+            print(self.summary())
+
+    def percentiles(self, name):
+        """(p50, p95, p99) of the recent samples of a stage, in milliseconds."""
+        with self._lock:
+            samples = list(self.samples.get(name, ()))
+        if not samples:
+            return (0.0, 0.0, 0.0)
+        values = np.fromiter(samples, dtype=np.float64) / 1e6
+        return tuple(float(v) for v in np.percentile(values, (50, 95, 99)))
+
+    def stats(self):
+        """Summary per stage: count, mean and rolling percentiles (ms)."""
+        result = {}
+        with self._lock:
+            totals = [(name, self.counts[name], self.totals[name]) for name in self.samples]
+        for name, count, total in totals:
+            if not count:
+                continue
+            p50, p95, p99 = self.percentiles(name)
+            result[name] = {
+                'count': count,
+                'mean_ms': total / count / 1e6,
+                'p50_ms': p50,
+                'p95_ms': p95,
+                'p99_ms': p99,
+            }
+        return result
+
+    def summary(self):
+        lines = [f"{'stage':<12} {'count':>8} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:<12} {s['count']:>8} {s['mean_ms']:8.2f} {s['p50_ms']:8.2f} "
+                         f"{s['p95_ms']:8.2f} {s['p99_ms']:8.2f}")
+        return "\n".join(lines)
+
+    def save_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.stats(), f, indent=4)
+
+    def close(self):
+        if self._frame_file is not None:
+            self._frame_file.close()
+            self._frame_file = None
+
+class ThreadedCProfile:
+    """
+    Runs cProfile in every thread of the pipeline and merges the results.
+    Use wrap() for thread targets, initializer() for thread pool workers and
+    enable()/disable() around the work done on the calling thread.
+    """
+
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+        self._main = None
+
+    def _start(self):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows a single active profiler, which then already covers all threads
+            return None
+        with self._lock:
+            self.profiles.append(profile)
+        return profile
+
+    def wrap(self, target):
+        def run(*args, **kwargs):
+            profile = self._start()
+            try:
+                return target(*args, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.disable()
+        return run
+
+    def initializer(self):
+        # Stays enabled for the lifetime of the worker thread
+        self._start()
+
+    def enable(self):
+        self._main = self._start()
+
+    def disable(self):
+        if self._main is not None:
+            self._main.disable()
+
+    def dump(self, path, top=25):
+        """Save the merged statistics (readable with pstats / snakeviz) and print the top functions."""
+        stats = None
+        for profile in self.profiles:
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        if stats is None:
+            return
+        stats.dump_stats(path)
+        stats.sort_stats('cumulative').print_stats(top)
+        print(f"Profile saved to {path}")
@@ -1,49 +1,166 @@
 # functions used to calculate the speed
 import numpy as np
-from collections import deque
 
 class SpeedTracker:
-    def __init__(self, buffer_size=10):
-        self.trackers = {}
-        self.buffer_size = buffer_size
+    """
+    Array-backed speed tracker.
+    Every track owns one slot in preallocated ring buffers of shape (max_tracks, buffer_size, ...),
+    so updating all tracks of a frame takes a handful of vectorized NumPy operations.
+    For each slot the tracker keeps running sums of the travelled distance and of the elapsed time
+    over the last buffer_size positions; the speed is distance_sum / time_sum converted to km/h.
+    The time of a position is the frame timestamp when one is given (live sources, dropped frames),
+    otherwise frame_count / fps.
+    Tracks that have not been seen for max_missed_frames frames are evicted and their slot reused.
+    :param buffer_size: number of positions kept per track.
+    :param max_tracks: initial number of slots (the buffers grow if more tracks are alive at once).
+    :param max_missed_frames: evict a track after this many frames without an update (None to never evict).
+    """
+
+    def __init__(self, buffer_size=10, max_tracks=64, max_missed_frames=60):
+        self.buffer_size = max(2, buffer_size)
+        self.max_missed_frames = max_missed_frames
+        self.slots = {}            # track_id -> slot index
+        self._free = []
+        self._allocate(max_tracks)
+
+    def _allocate(self, capacity):
+        self.positions = np.zeros((capacity, self.buffer_size, 2))
+        self.times = np.zeros((capacity, self.buffer_size))           # seconds
+        self.segment_dist = np.zeros((capacity, self.buffer_size))    # distance from the previous position
+        self.segment_time = np.zeros((capacity, self.buffer_size))    # time since the previous position
+        self.head = np.zeros(capacity, dtype=np.int64)                # next write index
+        self.count = np.zeros(capacity, dtype=np.int64)               # number of stored positions
+        self.dist_sum = np.zeros(capacity)
+        self.time_sum = np.zeros(capacity)
+        self.last_seen = np.zeros(capacity, dtype=np.int64)           # frame count of the last update
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def _grow(self):
+        old = (self.positions, self.times, self.segment_dist, self.segment_time,
+               self.head, self.count, self.dist_sum, self.time_sum, self.last_seen)
+        capacity = len(self.head)
+        self._allocate(capacity * 2)
+        new = (self.positions, self.times, self.segment_dist, self.segment_time,
+               self.head, self.count, self.dist_sum, self.time_sum, self.last_seen)
+        for dst, src in zip(new, old):
+            dst[:capacity] = src
+        self._free = list(range(2 * capacity - 1, capacity - 1, -1))
+
+    def _slot(self, track_id):
+        slot = self.slots.get(track_id)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self.slots[track_id] = slot
+        return slot
+
+    def remove(self, track_id):
+        """Forget a track and free its slot."""
+        slot = self.slots.pop(track_id, None)
+        if slot is None:
+            return
+        self.head[slot] = 0
+        self.count[slot] = 0
+        self.dist_sum[slot] = 0.0
+        self.time_sum[slot] = 0.0
+        self.segment_dist[slot] = 0.0
+        self.segment_time[slot] = 0.0
+        self._free.append(slot)
+
+    def evict_stale(self, frame_count):
+        """Remove tracks not updated within max_missed_frames; returns their ids."""
+        if self.max_missed_frames is None or not self.slots:
+            return []
+        stale = [track_id for track_id, slot in self.slots.items()
+                 if frame_count - self.last_seen[slot] > self.max_missed_frames]
+        for track_id in stale:
+            self.remove(track_id)
+        return stale
 
     def calculate_speed(self, prev_pos, curr_pos, fps):
         """Calculate speed in km/h given two positions and fps."""
-        distance = np.sqrt((curr_pos[0] - prev_pos[0])**2 + (curr_pos[1] - prev_pos[1])**2)
+        distance = np.hypot(curr_pos[0] - prev_pos[0], curr_pos[1] - prev_pos[1])
         # Calculate time difference based on fps (1/fps = seconds per frame)
-        time_diff = 1 / fps
-        speed_ms = distance / time_diff if fps > 0 else 0
-        return speed_ms * 3.6  # Convert m/s to km/h
-
-    def update_speed(self, track_id, world_coord, frame_count, fps):
-        if track_id not in self.trackers:
-            self.trackers[track_id] = deque(maxlen=self.buffer_size)
-        
-        speed_tracker = self.trackers[track_id]
-        if speed_tracker:
-            speed = self.calculate_speed(speed_tracker[-1][0], world_coord, fps)
-        else:
-            speed = 0
-        
-        # Store both position and frame number
-        speed_tracker.append((world_coord, frame_count))
-        
-        # Calculate average speed over the buffer
-        if len(speed_tracker) > 1:
-            speeds = []
-            for i in range(len(speed_tracker) - 1):
-                pos1, frame1 = speed_tracker[i]
-                pos2, frame2 = speed_tracker[i + 1]
-                # Use actual frame difference for more accurate speed calculation
-                frame_diff = frame2 - frame1
-                if frame_diff > 0:  # Avoid division by zero
-                    distance = np.sqrt((pos2[0] - pos1[0])**2 + (pos2[1] - pos1[1])**2)
-                    time_diff = frame_diff / fps
-                    speed_ms = distance / time_diff
-                    speeds.append(speed_ms * 3.6)  # Convert to km/h
-            return np.mean(speeds) if speeds else 0
-        return speed
-
-    def get_speeds(self, track_ids, world_coords, frame_count, fps):
-        return [self.update_speed(track_id, world_coord, frame_count, fps) 
-                for track_id, world_coord in zip(track_ids, world_coords)]
\ No newline at end of file
+        return distance * fps * 3.6 if fps > 0 else 0  # Convert m/s to km/h
+
+    def update_speed(self, track_id, world_coord, frame_count, fps, timestamp=None):
+        return self.get_speeds([track_id], [world_coord], frame_count, fps, timestamp)[0]
+
+    def get_speeds(self, track_ids, world_coords, frame_count, fps, timestamp=None):
+        """
+        Update all tracks seen in this frame and return their speeds (km/h) in the same order.
+        Track ids within one call are expected to be unique, as produced by the tracker.
+        :param timestamp: time of the frame in seconds (from the video source); frame_count / fps if None.
+        """
+        self.evict_stale(frame_count)
+        if len(track_ids) == 0:
+            return []
+        if timestamp is None:
+            if fps <= 0:
+                return [0.0] * len(track_ids)
+            timestamp = frame_count / fps
+
+        all_slots = np.array([self._slot(track_id) for track_id in track_ids], dtype=np.int64)
+        coords = np.asarray(world_coords, dtype=np.float64).reshape(-1, 2)
+        self.last_seen[all_slots] = frame_count
+
+        # Positions that could not be mapped (NaN) keep the previous speed estimate
+        finite = np.isfinite(coords).all(axis=1)
+        slots, coords = all_slots[finite], coords[finite]
+        B = self.buffer_size
+
+        head = self.head[slots]
+        count = self.count[slots]
+        prev = (head - 1) % B
+
+        # New segment from the previous position of each track
+        has_prev = count > 0
+        delta = coords - self.positions[slots, prev]
+        time_gap = timestamp - self.times[slots, prev]
+        valid = has_prev & (time_gap > 0)
+        new_dist = np.where(valid, np.hypot(delta[:, 0], delta[:, 1]), 0.0)
+        new_time = np.where(valid, time_gap, 0.0)
+
+        # When the ring is full the oldest position is overwritten, so the segment
+        # leading out of it (stored at the following index) leaves the window
+        full = count >= B
+        leaving = (head + 1) % B
+        self.dist_sum[slots] -= np.where(full, self.segment_dist[slots, leaving], 0.0)
+        self.time_sum[slots] -= np.where(full, self.segment_time[slots, leaving], 0.0)
+        self.segment_dist[slots[full], leaving[full]] = 0.0
+        self.segment_time[slots[full], leaving[full]] = 0.0
+
+        # Store the new position and its segment
+        self.positions[slots, head] = coords
+        self.times[slots, head] = timestamp
+        self.segment_dist[slots, head] = new_dist
+        self.segment_time[slots, head] = new_time
+        self.dist_sum[slots] += new_dist
+        self.time_sum[slots] += new_time
+        self.head[slots] = (head + 1) % B
+        self.count[slots] = np.minimum(count + 1, B)
+
+        return self._speeds(all_slots).tolist()
+
+    def predict(self, track_ids, frame_count, fps, timestamp=None):
+        """Frames without a detection: the average has no motion model, so the speeds keep their last estimate."""
+        return self.current_speeds(track_ids)
+
+    def current_speeds(self, track_ids):
+        """Current speed estimates (km/h) of the given tracks without adding a position; unknown tracks get 0."""
+        slots = np.array([self.slots.get(track_id, -1) for track_id in track_ids], dtype=np.int64)
+        speeds = np.zeros(len(slots))
+        known = slots >= 0
+        speeds[known] = self._speeds(slots[known])
+        return speeds.tolist()
+
+    def _speeds(self, slots):
+        # Average speed over the buffer: total distance / total elapsed time.
+        # Segments span the real time between positions, so skipped or dropped frames are accounted for.
+        dist_sum = np.maximum(self.dist_sum[slots], 0.0)  # guard against rounding drift
+        time_sum = self.time_sum[slots]
+        speeds = np.zeros(len(slots))
+        moving = time_sum > 1e-9
+        speeds[moving] = dist_sum[moving] / time_sum[moving] * 3.6  # m/s -> km/h
+        return speeds
@@ -0,0 +1,48 @@
+import numpy as np
+
+from calculation_many_frames import solve_against_reference, solve_pairs
+
+def _brute_force(alpha, S_real, eps=1e-12):
+    # The original double loop over all frame pairs
+    pairs = []
+    for i in range(len(alpha)):
+        for j in range(i + 1, len(alpha)):
+            a1, a2, S1, S2 = alpha[i], alpha[j], S_real[i], S_real[j]
+            den = np.sin(a2) * np.cos(a1) - np.sin(a1) * np.cos(a2)
+            if abs(den) < eps:
+                continue
+            m = (S2 * np.cos(a1) - S1 * np.cos(a2)) / den
+            l = (S1 * np.sin(a2) - S2 * np.sin(a1)) / den
+            pairs.append((i, j, l, m))
+    return pairs
+
+def _samples(n, seed=0):
+    rng = np.random.default_rng(seed)
+    alpha = rng.uniform(-1.2, 1.2, n)
+    alpha[5] = alpha[2]  # a pair with equal angles has no solution
+    S_real = 4.5 * np.cos(alpha) + 1.8 * np.sin(alpha) + rng.normal(0, 0.05, n)
+    return alpha, S_real
+
+def test_solve_pairs_matches_double_loop():
+    alpha, S_real = _samples(23)
+    expected = _brute_force(alpha, S_real)
+    for chunk_size in (1, 4, 1024):
+        i, j, l, m = solve_pairs(alpha, S_real, chunk_size=chunk_size)
+        got = sorted(zip(i.tolist(), j.tolist(), l, m))
+        assert [(a, b) for a, b, _, _ in got] == [(a, b) for a, b, _, _ in expected]
+        np.testing.assert_allclose([(x, y) for _, _, x, y in got], [(x, y) for _, _, x, y in expected],
+                                   rtol=1e-9, atol=1e-9)
+    assert (2, 5) not in set(zip(i.tolist(), j.tolist()))
+
+def test_exact_data_gives_the_true_dimensions():
+    alpha = np.linspace(-1.0, 1.0, 9)
+    i, j, l, m = solve_pairs(alpha, 4.5 * np.cos(alpha) + 1.8 * np.sin(alpha))
+    assert len(i) == 9 * 8 // 2
+    np.testing.assert_allclose(l, 4.5)
+    np.testing.assert_allclose(m, 1.8)
+    j, l, m = solve_against_reference(alpha, 4.5 * np.cos(alpha) + 1.8 * np.sin(alpha), ref=0)
+    assert j.tolist() == list(range(1, 9))
+    np.testing.assert_allclose(l, 4.5)
+
+def test_no_points():
+    assert all(len(part) == 0 for part in solve_pairs(np.empty(0), np.empty(0)))
@@ -0,0 +1,42 @@
+import numpy as np
+
+from calculation_model import estimate_dimensions, solve_linear
+from coordinate_transformer import compute_alpha
+
+def _samples(seed=0):
+    # Three tracks with their own l, m; track 2 is seen from a single angle only
+    rng = np.random.default_rng(seed)
+    truth = {0: (4.5, 1.8), 1: (6.0, 2.4), 2: (4.0, 1.7)}
+    track_index, alpha = [], []
+    for track, count in ((0, 40), (1, 25), (2, 10)):
+        track_index += [track] * count
+        alpha += [0.3] * count if track == 2 else list(rng.uniform(-1.0, 1.0, count))
+    track_index, alpha = np.array(track_index), np.array(alpha)
+    l = np.array([truth[t][0] for t in track_index])
+    m = np.array([truth[t][1] for t in track_index])
+    S_real = l * np.cos(alpha) + m * np.sin(alpha) + rng.normal(0, 0.02, len(alpha))
+    return track_index, alpha, S_real
+
+def test_solve_linear_matches_per_track_least_squares():
+    track_index, alpha, S_real = _samples()
+    l, m, ok = solve_linear(track_index, alpha, S_real, 3)
+    assert ok.tolist() == [True, True, False]
+    assert np.isnan(l[2]) and np.isnan(m[2])
+    for track in (0, 1):
+        a = alpha[track_index == track]
+        expected, *_ = np.linalg.lstsq(np.column_stack((np.cos(a), np.sin(a))), S_real[track_index == track],
+                                       rcond=None)
+        np.testing.assert_allclose((l[track], m[track]), expected, rtol=1e-9)
+
+def test_estimate_dimensions_falls_back_to_the_bounded_solver():
+    cam = (0.0, -10.0)
+    track_ids = np.repeat([7, 9], 20)
+    x = np.concatenate((np.linspace(-8, 8, 20), np.full(20, 3.0)))
+    y = np.concatenate((np.full(20, 5.0), np.full(20, 5.0)))
+    alpha = compute_alpha(x, y, cam)
+    S_real = 4.5 * np.cos(alpha) + 1.8 * np.sin(alpha)
+    rows = estimate_dimensions(track_ids, x, y, S_real, cam)
+    assert [row[0] for row in rows] == [7, 9]
+    assert rows[0][5] == 'linear'
+    np.testing.assert_allclose(rows[0][1:3], (4.5, 1.8), atol=1e-9)
+    assert rows[1][5] == 'bounded' and rows[1][4] == 20
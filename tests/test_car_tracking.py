@@ -0,0 +1,57 @@
+import csv
+import json
+
+import numpy as np
+
+from car_tracking import OUTPUT_HEADER, build_records, clean_and_select, process_tracks
+from coordinate_transformer import CoordinateTransformer
+
+H = [[0.01, 0.0, -1.0], [0.0, 0.02, -2.0], [0.0, 0.0, 1.0]]
+
+def _write_inputs(tmp_path):
+    mapping = tmp_path / 'mapping.json'
+    mapping.write_text(json.dumps({'transformation_matrix': H}))
+    tracking = tmp_path / 'tracking_data.csv'
+    with open(tracking, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['frame', 'id', 'x', 'y', 'width', 'real_width'])
+        for frame in range(20):
+            writer.writerow([frame, 1, 100 + 10 * frame, 300, 80, 1.8])
+            if frame % 2 == 0:
+                writer.writerow([frame, 4, 900 - 20 * frame, 500, 120, 2.1])
+        writer.writerow([7, 1, 50000, 300, 80, 1.8])  # outlier, out of frame order
+    return str(tracking), str(mapping)
+
+def _read(path):
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        assert reader.fieldnames == OUTPUT_HEADER
+        return [{name: float(value) for name, value in row.items()} for row in reader]
+
+def test_process_tracks_matches_the_single_vehicle_path(tmp_path):
+    tracking, mapping = _write_inputs(tmp_path)
+    out = tmp_path / 'cars'
+    results = process_tracks(tracking, mapping, desired_count=5, output_dir=str(out))
+    assert sorted(results) == [1, 4]
+    assert results[1][1] == 5 and results[4][1] == 5
+
+    transformer = CoordinateTransformer(matrix=H)
+    data = np.loadtxt(tracking, delimiter=',', skiprows=1)
+    for car_id in (1, 4):
+        rows = data[data[:, 1] == car_id]
+        rows = rows[np.argsort(rows[:, 0], kind='stable')]
+        expected = clean_and_select(build_records(car_id, rows[:, 0], transformer.transform(rows[:, 2:4]),
+                                                  rows[:, 4], rows[:, 5]), desired_count=5)
+        exported = _read(results[car_id][0])
+        assert [row['frame'] for row in exported] == [r['frame'] for r in expected]
+        np.testing.assert_allclose([[row[name] for name in OUTPUT_HEADER] for row in exported],
+                                   [[r[name] for name in OUTPUT_HEADER] for r in expected])
+    assert all(row['real_world_x'] < 100 for row in _read(results[1][0]))
+
+def test_process_tracks_selected_ids_and_workers(tmp_path):
+    tracking, mapping = _write_inputs(tmp_path)
+    serial = process_tracks(tracking, mapping, car_ids=[4, 9], output_dir=str(tmp_path / 'serial'))
+    parallel = process_tracks(tracking, mapping, car_ids=[1, 4], output_dir=str(tmp_path / 'parallel'), workers=2)
+    assert sorted(serial) == [4] and serial[4][1] == 10
+    assert sorted(parallel) == [1, 4]
+    assert _read(serial[4][0]) == _read(parallel[4][0])
@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+
+from coordinate_transformer import CoordinateTransformer, calculate_real_world_coordinates
+
+H = np.array([[0.02, 0.001, -3.0],
+              [0.0005, 0.03, -2.0],
+              [0.0001, 0.0002, 1.0]])
+
+def test_transform_matches_perspective_transform():
+    transformer = CoordinateTransformer(matrix=H)
+    points = np.random.default_rng(0).uniform(0, 1920, (50, 2))
+    expected = cv2.perspectiveTransform(points.reshape(-1, 1, 2), H).reshape(-1, 2)
+    np.testing.assert_allclose(transformer.transform(points), expected, rtol=1e-9)
+    np.testing.assert_allclose(transformer.transform(points[0]), expected[0], rtol=1e-9)
+
+def test_points_on_the_horizon_are_nan():
+    # w = 1e-4 x + 2e-4 y + 1 is zero on this line
+    transformer = CoordinateTransformer(matrix=H, eps=1e-9)
+    horizon = (-10000.0, 0.0)
+    world = transformer.transform([horizon, (100.0, 200.0)])
+    assert np.isnan(world[0]).all()
+    assert np.isfinite(world[1]).all()
+    assert transformer.transform_point(*horizon) == (None, None)
+
+def test_world_coordinates_of_box_bottom_centers():
+    transformer = CoordinateTransformer(matrix=H)
+    boxes = np.array([[100.0, 200.0, 40.0, 60.0], [500.0, 300.0, 80.0, 20.0]])
+    np.testing.assert_allclose(calculate_real_world_coordinates(boxes, transformer),
+                               transformer.transform([(100.0, 230.0), (500.0, 310.0)]))
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from kalman import KalmanTracker
+
+def _drive(tracker, track_ids, velocities, frames, fps=30.0, noise=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    for frame in frames:
+        world = [np.asarray(v) * frame / fps + rng.normal(0, noise, 2) for v in velocities]
+        speeds = tracker.get_speeds(track_ids, world, frame, fps)
+    return speeds
+
+def test_converges_to_the_true_speed():
+    tracker = KalmanTracker(max_tracks=1)  # grows to fit the tracks
+    velocities = [(10.0, 0.0), (0.0, -5.0), (6.0, 8.0)]  # m/s
+    speeds = _drive(tracker, [1, 2, 3], velocities, range(90), noise=0.05)
+    np.testing.assert_allclose(speeds, [36.0, 18.0, 36.0], rtol=0.05)
+
+    positions, velocity, estimated, speed_std = tracker.estimates([1, 2, 3, 4])
+    np.testing.assert_allclose(velocity[:3], velocities, atol=0.5)
+    np.testing.assert_allclose(positions[:3], np.array(velocities) * 89 / 30.0, atol=0.2)
+    np.testing.assert_allclose(estimated[:3], speeds)
+    assert (speed_std[:3] > 0).all() and (speed_std[:3] < 3.0).all()
+    assert np.isnan(positions[3]).all() and np.isnan(estimated[3])
+
+def test_predict_moves_the_state_without_a_measurement():
+    tracker = KalmanTracker()
+    _drive(tracker, [1], [(10.0, 0.0)], range(30))
+    positions, _, speeds, speed_std = tracker.estimates([1])
+    predicted = tracker.predict([1, 2], 33, 30.0)
+    after, _, _, after_std = tracker.estimates([1])
+    assert predicted == [pytest.approx(speeds[0]), 0.0]
+    np.testing.assert_allclose(after[0], positions[0] + (10.0 * 4 / 30.0, 0.0), atol=1e-3)
+    assert after_std[0] > speed_std[0]
+    # The next measurement continues from the predicted time
+    assert tracker.get_speeds([1], [(10.0 * 34 / 30.0, 0.0)], 34, 30.0)[0] == pytest.approx(36.0, rel=0.01)
+
+def test_nan_measurement_keeps_the_estimate_and_remove_frees_the_slot():
+    tracker = KalmanTracker(max_missed_frames=None)
+    speeds = _drive(tracker, [1], [(10.0, 0.0)], range(30))
+    assert tracker.get_speeds([1], [(np.nan, np.nan)], 30, 30.0) == speeds
+    slot = tracker.slots[1]
+    tracker.remove(1)
+    assert tracker.current_speeds([1]) == [0.0]
+    assert tracker.get_speeds([2], [(0.0, 0.0)], 31, 30.0) == [0.0]
+    assert tracker.slots[2] == slot
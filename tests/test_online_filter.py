@@ -0,0 +1,40 @@
+from car_tracking import select_best_frames
+from online_filter import OnlineTrackFilter
+
+def _record(frame, x, track_id=1):
+    return {'frame': frame, 'id': track_id, 'real_world_x': x, 'real_world_y': 0.0, 'width': 100.0,
+            'real_width': 1.8}
+
+def test_select_best_frames_single_frame():
+    records = [_record(frame, 0.3 * frame) for frame in range(1, 11)]
+    picked = select_best_frames(records, desired_count=1)
+    assert len(picked) == 1
+    assert picked[0] in records
+
+def test_finish_with_one_desired_frame():
+    finished = []
+    online_filter = OnlineTrackFilter(desired_count=1, on_finished=lambda track_id, records: finished.append(records))
+    for frame in range(1, 21):
+        online_filter.add(_record(frame, 0.3 * frame))
+    records = online_filter.finish(1)
+    assert len(records) == 1
+    assert finished == [records]
+    assert 1 not in online_filter.tracks
+
+def test_rejects_jump():
+    online_filter = OnlineTrackFilter()
+    for frame in range(1, 11):
+        assert online_filter.add(_record(frame, 0.3 * frame))
+    assert not online_filter.add(_record(11, 25.0))
+    assert online_filter.add(_record(12, 3.6))
+
+def test_exported_counts_only_tracks_with_records():
+    exported = []
+    online_filter = OnlineTrackFilter(on_finished=lambda track_id, records: exported.append(track_id))
+    for frame in range(1, 6):
+        online_filter.add(_record(frame, 0.3 * frame, track_id=1))
+        online_filter.add(_record(frame, float('nan'), track_id=2))
+    online_filter.finish_all()
+    online_filter.finish(2)
+    assert exported == [1]
+    assert online_filter.exported == 1
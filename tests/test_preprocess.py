@@ -0,0 +1,44 @@
+import os
+
+import cv2
+import numpy as np
+
+from preprocess import Undistorter, load_calibration_data, preprocess_frame
+
+CALIBRATION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'gopro_calibration_fisheye.npz')
+
+def _baseline(undistorter, img, size):
+    # Undistort at full resolution, then downscale with INTER_AREA
+    return cv2.resize(undistorter.undistort(img), size, interpolation=cv2.INTER_AREA)
+
+def _frame(DIM, blur):
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (DIM[1], DIM[0], 3), dtype=np.uint8)
+    return cv2.GaussianBlur(img, (0, 0), blur) if blur else img
+
+def _difference(a, b):
+    return np.abs(a.astype(np.int16) - b.astype(np.int16))
+
+def test_recognition_frame_matches_baseline_on_noise():
+    K, D, DIM = load_calibration_data(CALIBRATION)
+    undistorter = Undistorter(K, D, DIM)
+    img = _frame(undistorter.DIM, blur=0)
+    diff = _difference(undistorter.undistort(img, (640, 640)), _baseline(undistorter, img, (640, 640)))
+    assert diff.max() <= 1
+
+def test_single_remap_difference_is_bounded_on_realistic_frame():
+    # With fine texture removed (camera optics, compression) the single remap stays close to the baseline
+    K, D, DIM = load_calibration_data(CALIBRATION)
+    fused = Undistorter(K, D, DIM, max_remap_downscale=None)
+    img = _frame(fused.DIM, blur=2.0)
+    diff = _difference(fused.undistort(img, (640, 640)), _baseline(fused, img, (640, 640)))
+    assert diff.mean() < 2.0
+
+def test_preprocess_frame_shrinks_recognition_from_display_view():
+    K, D, DIM = load_calibration_data(CALIBRATION)
+    undistorter = Undistorter(K, D, DIM)
+    img = _frame(undistorter.DIM, blur=0)
+    recognition, display = preprocess_frame(img, K, D, DIM, (640, 640), (1920, 1080), undistorter=undistorter)
+    assert np.array_equal(display, undistorter.undistort(img, (1920, 1080)))
+    assert np.array_equal(recognition, cv2.resize(display, (640, 640), interpolation=cv2.INTER_AREA))
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from speed_utils import SpeedTracker
+
+def _baseline_speed(history, fps):
+    # The deque-based tracker: mean of the segment speeds over the last positions
+    speeds = []
+    for (pos1, frame1), (pos2, frame2) in zip(history, history[1:]):
+        if frame2 > frame1:
+            distance = np.hypot(pos2[0] - pos1[0], pos2[1] - pos1[1])
+            speeds.append(distance / ((frame2 - frame1) / fps) * 3.6)
+    return np.mean(speeds) if speeds else 0.0
+
+def test_matches_baseline_with_every_frame_updates():
+    rng = np.random.default_rng(0)
+    fps, buffer_size = 30.0, 10
+    tracker = SpeedTracker(buffer_size=buffer_size, max_tracks=2)  # grows to fit the tracks
+    track_ids = [3, 7, 11, 42]
+    positions = {track_id: rng.uniform(-5, 5, 2) for track_id in track_ids}
+    history = {track_id: [] for track_id in track_ids}
+
+    for frame in range(40):
+        world = []
+        for track_id in track_ids:
+            positions[track_id] = positions[track_id] + rng.normal(0.5, 0.2, 2)
+            world.append(positions[track_id])
+            history[track_id] = (history[track_id] + [(positions[track_id], frame)])[-buffer_size:]
+        speeds = tracker.get_speeds(track_ids, world, frame, fps)
+        expected = [_baseline_speed(history[track_id], fps) for track_id in track_ids]
+        np.testing.assert_allclose(speeds, expected, rtol=1e-9, atol=1e-9)
+
+def test_nan_position_keeps_the_previous_speed():
+    tracker = SpeedTracker()
+    for frame in range(5):
+        speed = tracker.update_speed(1, (frame * 0.5, 0.0), frame, 30.0)
+    assert tracker.update_speed(1, (np.nan, np.nan), 5, 30.0) == speed
+    assert speed == pytest.approx(0.5 * 30.0 * 3.6)
+
+def test_removed_slot_starts_from_scratch():
+    tracker = SpeedTracker(max_tracks=1, max_missed_frames=None)
+    for frame in range(5):
+        tracker.update_speed(1, (frame * 1.0, 0.0), frame, 10.0)
+    tracker.remove(1)
+    assert tracker.current_speeds([1]) == [0.0]
+    assert tracker.update_speed(2, (100.0, 0.0), 5, 10.0) == 0.0
+    assert tracker.update_speed(2, (100.5, 0.0), 6, 10.0) == pytest.approx(0.5 * 10.0 * 3.6)
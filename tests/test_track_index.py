@@ -0,0 +1,50 @@
+import numpy as np
+
+from data_export import CSVExporter
+from track_index import TrackIndex, build_track_index, iter_tracking_rows, read_track_rows
+
+HEADER = ['frame', 'id', 'x', 'y', 'width', 'real_width']
+
+def _rows():
+    # Interleaved tracks, as main.py writes them frame by frame
+    rng = np.random.default_rng(0)
+    rows = []
+    for frame in range(30):
+        for track_id in (1, 2, 5):
+            if track_id == 5 and frame < 10:
+                continue
+            rows.append([frame, track_id, *rng.uniform(0, 1000, 3).round(3), round(rng.uniform(1.5, 2.0), 3)])
+    return np.array(rows)
+
+def _write(path, index_column):
+    with CSVExporter(str(path), HEADER, index_column=index_column) as exporter:
+        exporter.write_rows(_rows())
+    return str(path)
+
+def test_read_track_rows_seeks_to_the_rows_of_one_track(tmp_path):
+    csv_path = _write(tmp_path / 'tracking_data.csv', 'id')
+    index = TrackIndex.load(csv_path)
+    assert index.track_ids() == [1, 2, 5]
+    assert index.frame_range(5) == (10, 29)
+    for track_id in (1, 2, 5):
+        rows = read_track_rows(csv_path, track_id, index)
+        assert rows == list(iter_tracking_rows(csv_path, track_id))
+        assert all(row['id'] == track_id for row in rows)
+    assert read_track_rows(csv_path, 9, index) == []
+
+def test_built_index_matches_the_one_written_with_the_csv(tmp_path):
+    written = TrackIndex.load(_write(tmp_path / 'indexed.csv', 'id'))
+    csv_path = _write(tmp_path / 'plain.csv', None)
+    assert TrackIndex.load(csv_path) is None
+    built = build_track_index(csv_path)
+    for track_id in (1, 2, 5):
+        np.testing.assert_array_equal(built.offsets(track_id), written.offsets(track_id))
+        assert built.frame_range(track_id) == written.frame_range(track_id)
+
+def test_out_of_date_index_is_ignored(tmp_path):
+    csv_path = _write(tmp_path / 'tracking_data.csv', 'id')
+    with open(csv_path, 'a') as f:
+        f.write('30,1,1.0,2.0,3.0,1.8\n')
+    assert TrackIndex.load(csv_path) is None
+    rows = read_track_rows(csv_path, 1)
+    assert len(rows) == 31 and rows[-1]['frame'] == 30
@@ -0,0 +1,19 @@
+import pytest
+
+from track_registry import TrackRegistry
+
+def test_predicted_frames_keep_a_track_alive_without_changing_its_summary():
+    finished = []
+    registry = TrackRegistry(timeout=5, fps=10.0, on_finished=[lambda track_id, summary: finished.append(summary)])
+    for frame in range(3):
+        registry.update(frame, [1, 2], [(frame * 1.0, 0.0), (0.0, frame * 2.0)], [36.0, 72.0], [1.8, 2.0])
+    for frame in range(3, 8):
+        registry.touch(frame, [1])  # skipped frames, track 1 predicted
+
+    assert [summary['id'] for summary in registry.evict(8)] == [2]
+    assert registry.evict(12) == []
+    summary = registry.evict(13)[0]
+    assert summary['last_frame'] == 2 and summary['detections'] == 3
+    assert summary['duration_s'] == pytest.approx(0.2)
+    assert summary['path_length_m'] == pytest.approx(2.0)
+    assert [s['id'] for s in finished] == [2, 1]
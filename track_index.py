@@ -0,0 +1,156 @@
+#Track index for tracking_data.csv.
+#While the CSV is written, the byte offset of every row is recorded per track id together with the track's frame range.
+#The index is saved as a sidecar file (<csv>.idx.npz), so a single vehicle can be read by seeking straight to its rows
+#instead of parsing the whole file. For CSVs written without an index, build_track_index creates one in a single streaming pass.
+
+import csv
+import os
+from array import array
+
+import numpy as np
+
+INTEGER_FIELDS = ('frame', 'id')
+
+def index_file(csv_path):
+    """Path of the index sidecar for a CSV file."""
+    return csv_path + '.idx.npz'
+
+class TrackIndexBuilder:
+    """Collects row offsets per track while a CSV file is written."""
+
+    def __init__(self):
+        self.offsets = {}      # track_id -> array of byte offsets
+        self.first_frame = {}
+        self.last_frame = {}
+
+    def add(self, track_id, frame, offset):
+        track_id = int(track_id)
+        frame = int(frame)
+        offsets = self.offsets.get(track_id)
+        if offsets is None:
+            offsets = self.offsets[track_id] = array('q')
+            self.first_frame[track_id] = frame
+            self.last_frame[track_id] = frame
+        offsets.append(offset)
+        if frame < self.first_frame[track_id]:
+            self.first_frame[track_id] = frame
+        if frame > self.last_frame[track_id]:
+            self.last_frame[track_id] = frame
+
+    def save(self, csv_path):
+        ids = np.array(sorted(self.offsets), dtype=np.int64)
+        counts = np.array([len(self.offsets[i]) for i in ids], dtype=np.int64)
+        starts = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+        offsets = np.concatenate([np.frombuffer(self.offsets[i], dtype=np.int64) for i in ids]) \
+            if len(ids) else np.empty(0, dtype=np.int64)
+        np.savez(
+            index_file(csv_path),
+            ids=ids,
+            starts=starts,
+            offsets=offsets,
+            first_frame=np.array([self.first_frame[i] for i in ids], dtype=np.int64),
+            last_frame=np.array([self.last_frame[i] for i in ids], dtype=np.int64),
+            csv_size=np.int64(os.path.getsize(csv_path)),
+        )
+
+class TrackIndex:
+    """Loaded track index: track id -> row offsets and frame range."""
+
+    def __init__(self, ids, starts, offsets, first_frame, last_frame, csv_size):
+        self.ids = ids
+        self.starts = starts
+        self.offsets_all = offsets
+        self.first_frame = first_frame
+        self.last_frame = last_frame
+        self.csv_size = int(csv_size)
+        self._position = {int(track_id): i for i, track_id in enumerate(ids)}
+
+    @classmethod
+    def load(cls, csv_path):
+        """Load the index of csv_path; returns None if it is missing or out of date."""
+        path = index_file(csv_path)
+        if not os.path.exists(path) or not os.path.exists(csv_path):
+            return None
+        with np.load(path) as X:
+            index = cls(X['ids'], X['starts'], X['offsets'], X['first_frame'], X['last_frame'], X['csv_size'])
+        if index.csv_size != os.path.getsize(csv_path):
+            print(f"Index '{path}' does not match '{csv_path}', ignoring it.")
+            return None
+        return index
+
+    def __contains__(self, track_id):
+        return int(track_id) in self._position
+
+    def track_ids(self):
+        return [int(i) for i in self.ids]
+
+    def offsets(self, track_id):
+        i = self._position.get(int(track_id))
+        if i is None:
+            return np.empty(0, dtype=np.int64)
+        return self.offsets_all[self.starts[i]:self.starts[i + 1]]
+
+    def frame_range(self, track_id):
+        i = self._position.get(int(track_id))
+        if i is None:
+            return None
+        return int(self.first_frame[i]), int(self.last_frame[i])
+
+def _convert_row(header, values):
+    row = {}
+    for name, value in zip(header, values):
+        row[name] = int(float(value)) if name in INTEGER_FIELDS else float(value)
+    return row
+
+def _read_header(f):
+    return next(csv.reader([f.readline().decode('utf-8')]))
+
+def iter_tracking_rows(csv_path, track_id=None):
+    """
+    Stream rows of a tracking CSV as dicts with numeric values, optionally only those of one track.
+    Rows of other tracks are skipped after looking only at their id field.
+    """
+    with open(csv_path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        id_column = header.index('id')
+        wanted = None if track_id is None else int(track_id)
+        for values in reader:
+            if wanted is not None and int(float(values[id_column])) != wanted:
+                continue
+            yield _convert_row(header, values)
+
+def read_track_rows(csv_path, track_id, index=None):
+    """
+    Read all rows of one track.
+    Uses the track index to seek directly to the rows when available, otherwise streams the file once.
+    """
+    if index is None:
+        index = TrackIndex.load(csv_path)
+    if index is None:
+        return list(iter_tracking_rows(csv_path, track_id))
+
+    rows = []
+    with open(csv_path, 'rb') as f:
+        header = _read_header(f)
+        for offset in index.offsets(track_id):
+            f.seek(int(offset))
+            line = f.readline().decode('utf-8')
+            rows.append(_convert_row(header, next(csv.reader([line]))))
+    return rows
+
+def build_track_index(csv_path):
+    """Create the index sidecar for an existing tracking CSV in one streaming pass."""
+    builder = TrackIndexBuilder()
+    with open(csv_path, 'rb') as f:
+        header = _read_header(f)
+        frame_column, id_column = header.index('frame'), header.index('id')
+        offset = f.tell()
+        for line in iter(f.readline, b''):
+            values = next(csv.reader([line.decode('utf-8')]), None)
+            if values:
+                builder.add(float(values[id_column]), float(values[frame_column]), offset)
+            offset += len(line)
+    builder.save(csv_path)
+    return TrackIndex.load(csv_path)
@@ -0,0 +1,113 @@
+#Track lifecycle for main.py.
+#TrackRegistry knows which vehicles are in view: it records the first and last frame every track was detected in and
+#a running summary (mean speed, path length, width), and ends a track once it has not been detected for timeout
+#frames (frames the detector skipped count as seen for the tracks predicted on them). Ending a track fires the "track finished" callbacks with its summary, which free the per-track state of the
+#speed tracker and the online filter and write the vehicle's results, so nothing grows with the length of the video.
+
+import math
+
+SUMMARY_HEADER = ['id', 'first_frame', 'last_frame', 'detections', 'duration_s', 'mean_speed_kmh', 'path_length_m',
+                  'mean_real_width_m']
+
+class _TrackRecord:
+    __slots__ = ('first_frame', 'last_frame', 'last_seen', 'detections', 'speed_sum', 'speed_count', 'path_length', 'last_x',
+                 'last_y', 'width_sum', 'width_count')
+
+    def __init__(self, frame):
+        self.first_frame = frame
+        self.last_frame = frame    # last detection
+        self.last_seen = frame     # last detection or prediction, for the timeout
+        self.detections = 0
+        self.speed_sum = 0.0
+        self.speed_count = 0
+        self.path_length = 0.0
+        self.last_x = None
+        self.last_y = None
+        self.width_sum = 0.0
+        self.width_count = 0
+
+class TrackRegistry:
+    """
+    Active tracks and their running summaries.
+    :param timeout: a track ends after this many frames without a detection.
+    :param fps: frame rate used for the duration in the summaries.
+    :param on_finished: callbacks(track_id, summary) fired, in order, when a track ends; summary is a dict with the
+                        SUMMARY_HEADER keys.
+    """
+
+    def __init__(self, timeout=60, fps=30.0, on_finished=()):
+        self.timeout = timeout
+        self.fps = fps
+        self.callbacks = list(on_finished)
+        self.tracks = {}
+        self.finished = 0
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def update(self, frame, track_ids, world_coords, speeds, real_widths):
+        """Record the detections of one frame: ids (N,), world positions (N, 2), speeds (N,) and real widths (N,)."""
+        for track_id, (x, y), speed, real_width in zip(track_ids, world_coords, speeds, real_widths):
+            track_id = int(track_id)
+            track = self.tracks.get(track_id)
+            if track is None:
+                track = self.tracks[track_id] = _TrackRecord(frame)
+            track.last_frame = frame
+            track.last_seen = frame
+            track.detections += 1
+            if speed > 0:  # The first detections of a track have no speed yet
+                track.speed_sum += speed
+                track.speed_count += 1
+            if math.isfinite(x) and math.isfinite(y):
+                if track.last_x is not None:
+                    track.path_length += math.hypot(x - track.last_x, y - track.last_y)
+                track.last_x, track.last_y = x, y
+            if math.isfinite(real_width):
+                track.width_sum += real_width
+                track.width_count += 1
+
+    def touch(self, frame, track_ids):
+        """Mark tracks predicted on a frame without detection as seen; their summaries are unchanged."""
+        for track_id in track_ids:
+            track = self.tracks.get(int(track_id))
+            if track is not None:
+                track.last_seen = frame
+
+    def evict(self, frame):
+        """End the tracks not seen within the timeout; returns their summaries."""
+        stale = [track_id for track_id, track in self.tracks.items() if frame - track.last_seen > self.timeout]
+        return [self.finish(track_id) for track_id in stale]
+
+    def finish(self, track_id):
+        """End a track now, fire the callbacks and return its summary (None for an unknown track)."""
+        track = self.tracks.pop(track_id, None)
+        if track is None:
+            return None
+        summary = self.summary(track_id, track)
+        self.finished += 1
+        for callback in self.callbacks:
+            callback(track_id, summary)
+        return summary
+
+    def finish_all(self):
+        """End all remaining tracks (end of the video); returns their summaries."""
+        return [self.finish(track_id) for track_id in list(self.tracks)]
+
+    def summary(self, track_id, track=None):
+        track = track if track is not None else self.tracks[track_id]
+        return {
+            'id': track_id,
+            'first_frame': track.first_frame,
+            'last_frame': track.last_frame,
+            'detections': track.detections,
+            'duration_s': (track.last_frame - track.first_frame) / self.fps if self.fps > 0 else 0.0,
+            'mean_speed_kmh': track.speed_sum / track.speed_count if track.speed_count else float('nan'),
+            'path_length_m': track.path_length,
+            'mean_real_width_m': track.width_sum / track.width_count if track.width_count else float('nan'),
+        }
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __contains__(self, track_id):
+        return track_id in self.tracks
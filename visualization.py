@@ -1,4 +1,7 @@
 import csv
+import queue
+import threading
+
 import cv2
 import numpy as np
 from collections import defaultdict
@@ -18,38 +21,117 @@ def read_tracking_data(csv_file):
             tracking_data[int(track_id)].append((int(frame), int(x), int(y)))
     return tracking_data
 
-def create_visualization(tracking_data, output_file, frame_size=(1280, 720), duration=10):
-    colors = generate_colors(len(tracking_data))
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_file, fourcc, 30, frame_size)
-    
+class _BackgroundWriter:
+    """
+    Writes frames to a cv2.VideoWriter on a separate thread.
+    Frames are rendered into a small set of reusable buffers; a buffer goes back to the
+    free list once it has been written, which also bounds how far rendering can run ahead.
+    """
+
+    def __init__(self, writer, frame_shape, buffers=4):
+        self.writer = writer
+        self.free = queue.Queue()
+        for _ in range(buffers):
+            self.free.put(np.empty(frame_shape, dtype=np.uint8))
+        self.pending = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='video-writer')
+        self.thread.start()
+
+    def acquire(self):
+        return self.free.get()
+
+    def submit(self, buffer):
+        self.pending.put(buffer)
+
+    def _run(self):
+        while True:
+            buffer = self.pending.get()
+            if buffer is None:
+                break
+            try:
+                if self.error is None:
+                    self.writer.write(buffer)
+            except Exception as e:
+                self.error = e
+            self.free.put(buffer)
+
+    def close(self):
+        self.pending.put(None)
+        self.thread.join()
+        self.writer.release()
+        if self.error is not None:
+            raise self.error
+
+def create_visualization(tracking_data, output_file, frame_size=(1280, 720), duration=10, fps=30):
+    """
+    Render the trajectories of all tracks into a video.
+    Trails are drawn incrementally: a persistent canvas receives only the segments that end
+    in the current frame, and the moving markers and labels are drawn on a per-frame copy of it.
+    """
+    colors = [(int(c[0]*255), int(c[1]*255), int(c[2]*255)) for c in generate_colors(len(tracking_data))]
+    track_ids = list(tracking_data.keys())
+
+    # Frame-sorted arrays per track
+    track_frames = []
+    track_points = []
+    for track in tracking_data.values():
+        arr = np.array(track, dtype=np.int64).reshape(-1, 3)
+        arr = arr[np.argsort(arr[:, 0], kind='stable')]
+        track_frames.append(arr[:, 0])
+        track_points.append(arr[:, 1:3].astype(np.int32))
+
+    # All points of all tracks ordered by frame, so each frame only touches its new points
+    all_frames = np.concatenate(track_frames) if track_frames else np.empty(0, dtype=np.int64)
+    all_tracks = np.concatenate([np.full(len(f), i) for i, f in enumerate(track_frames)]) \
+        if track_frames else np.empty(0, dtype=np.int64)
+    order = np.argsort(all_frames, kind='stable')
+    event_frames = all_frames[order]
+    event_tracks = all_tracks[order]
+
     # Calculate max_frame correctly
-    max_frame = max(max(frame for frame, _, _ in track) for track in tracking_data.values())
-    
-    for frame in range(max_frame + 1):
-        img = np.zeros((frame_size[1], frame_size[0], 3), dtype=np.uint8)
-        
-        for (track_id, track), color in zip(tracking_data.items(), colors):
-            points = [point for point in track if point[0] <= frame]
-            if len(points) > 1:
-                cv2.polylines(img, [np.array([(x, y) for _, x, y in points])], False, 
-                              (int(color[0]*255), int(color[1]*255), int(color[2]*255)), 2)
-            
-            if points:
-                last_point = points[-1]
-                cv2.circle(img, (last_point[1], last_point[2]), 5, 
-                           (int(color[0]*255), int(color[1]*255), int(color[2]*255)), -1)
-                cv2.putText(img, f"ID: {track_id}", (last_point[1] + 10, last_point[2] - 10),
+    max_frame = int(event_frames[-1]) if len(event_frames) else 0
+
+    canvas = np.zeros((frame_size[1], frame_size[0], 3), dtype=np.uint8)  # accumulated trails
+    cursors = np.zeros(len(track_ids), dtype=np.int64)  # number of points of each track drawn so far
+    started = []  # tracks with at least one point, in order of appearance
+
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    writer = _BackgroundWriter(cv2.VideoWriter(output_file, fourcc, fps, frame_size), canvas.shape)
+
+    event = 0
+    try:
+        for frame in range(max_frame + 1):
+            # Extend the trails with the segments ending in this frame
+            while event < len(event_frames) and event_frames[event] <= frame:
+                t = event_tracks[event]
+                i = cursors[t]
+                if i == 0:
+                    started.append(t)
+                else:
+                    p0, p1 = track_points[t][i - 1], track_points[t][i]
+                    cv2.line(canvas, (int(p0[0]), int(p0[1])), (int(p1[0]), int(p1[1])), colors[t], 2)
+                cursors[t] = i + 1
+                event += 1
+
+            # Per-frame overlay: trails plus the current marker and label of every track
+            img = writer.acquire()
+            np.copyto(img, canvas)
+            for t in started:
+                x, y = track_points[t][cursors[t] - 1]
+                cv2.circle(img, (int(x), int(y)), 5, colors[t], -1)
+                cv2.putText(img, f"ID: {track_ids[t]}", (int(x) + 10, int(y) - 10),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        
-        cv2.putText(img, f"Frame: {frame}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-        
-        out.write(img)
-        
-        if frame % 30 == 0:  # Update progress every second
-            print(f"Processing frame {frame}/{max_frame}")
-    
-    out.release()
+
+            cv2.putText(img, f"Frame: {frame}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+
+            writer.submit(img)
+
+            if frame % 30 == 0:  # Update progress every second
+                print(f"Processing frame {frame}/{max_frame}")
+    finally:
+        writer.close()
+
     print(f"Visualization saved to {output_file}")
 
 if __name__ == "__main__":
@@ -1,20 +1,30 @@
 import cv2
+import numpy as np
 
 def draw_annotations(image, boxes, keypoints, track_ids, speeds):
-    for box, kps, track_id, speed in zip(boxes, keypoints, track_ids, speeds):
-        x, y, w, h = box
+    """
+    Draw boxes, labels and keypoints.
+    :param boxes: (N, 4) xywh boxes; keypoints: (N, K, 3) (x, y, conf), points with conf 0 are not drawn.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    # Pixel corners of all boxes at once
+    corners = np.column_stack((
+        boxes[:, 0] - boxes[:, 2] / 2, boxes[:, 1] - boxes[:, 3] / 2,
+        boxes[:, 0] + boxes[:, 2] / 2, boxes[:, 1] + boxes[:, 3] / 2,
+    )).astype(int).tolist()
+
+    for (x1, y1, x2, y2), track_id, speed in zip(corners, track_ids, speeds):
         # Draw bounding box
-        cv2.rectangle(image, (int(x - w/2), int(y - h/2)), (int(x + w/2), int(y + h/2)), (0, 255, 0), 2)
-        
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
         # Draw track ID and speed
         label = f"ID: {track_id}, Speed: {speed:.1f} km/h"
-        cv2.putText(image, label, (int(x - w/2), int(y - h/2 - 10)), 
+        cv2.putText(image, label, (x1, y1 - 10),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-        
-        # Draw keypoints
-        for kp in kps:
-            kp_x, kp_y, kp_conf = kp
-            if kp_conf > 0:
-                cv2.circle(image, (int(kp_x), int(kp_y)), 5, (255, 0, 0), -1)
-    
-    return image
\ No newline at end of file
+
+    # Draw keypoints
+    kps = np.asarray(keypoints, dtype=np.float64).reshape(-1, 3)
+    for kp_x, kp_y in kps[kps[:, 2] > 0, :2].astype(int).tolist():
+        cv2.circle(image, (kp_x, kp_y), 5, (255, 0, 0), -1)
+
+    return image